@@ -0,0 +1,85 @@
+"""Compare callback dispatch cost of telebot's filter scan with the namespace:action router.
+
+Both bots register N callback handlers and process callback queries for the last one
+registered, the worst case for the scan, where every earlier handler's filter runs first.
+
+    python benchmarks/bench_callbacks.py --handlers 10 100 1000 --updates 2000
+"""
+import argparse
+import time
+
+import telebot
+from telebot.types import Update
+
+from content_assistant_bot.api.router import callback_data, get_router
+
+TOKEN = "123:BENCH"
+
+
+def make_updates(n: int, data: str) -> list[Update]:
+    return [
+        Update.de_json({
+            "update_id": idx,
+            "callback_query": {
+                "id": str(idx),
+                "chat_instance": "1",
+                "data": data,
+                "from": {"id": 1, "is_bot": False, "first_name": "User"},
+                "message": {"message_id": 1, "date": 1, "chat": {"id": 1, "type": "private"}},
+            },
+        })
+        for idx in range(n)
+    ]
+
+
+def make_handler(idx: int, handled: list):
+    def handler(call):
+        handled.append(idx)
+    return handler
+
+
+def scan_bot(n_handlers: int, handled: list) -> telebot.TeleBot:
+    bot = telebot.TeleBot(TOKEN, threaded=False)
+    for idx in range(n_handlers):
+        bot.register_callback_query_handler(
+            make_handler(idx, handled),
+            # Equality: the substring filters the handlers used also match "_action_1" for "_action_10"
+            func=lambda call, idx=idx: call.data == f"_action_{idx}",
+        )
+    return bot
+
+
+def router_bot(n_handlers: int, handled: list) -> telebot.TeleBot:
+    bot = telebot.TeleBot(TOKEN, threaded=False)
+    router = get_router(bot)
+    for idx in range(n_handlers):
+        router.handler("bench", f"action_{idx}")(make_handler(idx, handled))
+    return bot
+
+
+def measure(bot: telebot.TeleBot, updates: list[Update]) -> float:
+    started = time.perf_counter()
+    bot.process_new_updates(updates)
+    return (time.perf_counter() - started) / len(updates)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handlers", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--updates", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'handlers':>8} {'scan us/update':>15} {'router us/update':>17}")
+    for n_handlers in args.handlers:
+        last = n_handlers - 1
+        handled = []
+        scan = measure(scan_bot(n_handlers, handled), make_updates(args.updates, f"_action_{last}"))
+        routed = measure(
+            router_bot(n_handlers, handled), make_updates(args.updates, callback_data("bench", f"action_{last}"))
+        )
+        assert handled == [last] * (2 * args.updates)
+        print(f"{n_handlers:>8} {scan * 1e6:>15.1f} {routed * 1e6:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
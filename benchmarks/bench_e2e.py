@@ -0,0 +1,364 @@
+"""End-to-end throughput of the whole bot, offline: fake Bot API, Instagram and LLM provider.
+
+Simulated users run the conversations of the bot through the real stack: the rate limit, user
+and state middlewares, the dispatcher lanes, the handlers, the task queue, the SQLite database,
+Excel exports and streamed LLM replies. Each step sends one update and waits until the fake Bot
+API receives the reply that ends it, e.g. the message with the "more ideas" button.
+
+Every flow runs with `--users` concurrent users, who pause `--think-time` seconds between steps
+as people reading a reply do, and reports:
+
+- updates/s: updates handled per second of the run
+- p50/p95/p99: seconds a user waited for the replies of the flow, the pauses excluded
+- statements/update: SQL statements executed per update
+- KiB/user: memory still held per user after the flow, measured in a second run under tracemalloc
+
+The results are compared with benchmarks/baselines.json, which also stores the settings they
+were measured with. With `--check` the stored settings are used and the script exits with
+status 1 if a metric is worse than its baseline by more than the tolerance.
+
+    python benchmarks/bench_e2e.py --users 20 --flows menu ideas account hashtag
+    python benchmarks/bench_e2e.py --check
+    python benchmarks/bench_e2e.py --save
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+# The bot module exits without a token
+os.environ.setdefault("BOT_TOKEN", "123:BENCH")
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from telebot import apihelper  # noqa: E402
+
+from content_assistant_bot.api.router import callback_data  # noqa: E402
+from content_assistant_bot.testing.fake_instagram import FakeInstagram, install_fake_instagram  # noqa: E402
+from content_assistant_bot.testing.fake_llm import install_fake_llm, make_fake_chat_model  # noqa: E402
+from content_assistant_bot.testing.fake_telegram import FakeBotAPI  # noqa: E402
+from content_assistant_bot.testing.updates import UpdateFactory  # noqa: E402
+
+BASELINES = Path(__file__).with_name("baselines.json")
+
+DEFAULT_SETTINGS = {
+    "users": 20,
+    "flows": ["menu", "ideas", "account", "hashtag"],
+    "api_latency": 0.005,
+    "instagram_latency": 0.2,
+    "llm_latency": 1.0,
+    "reels": 30,
+    "think_time": 0.5,
+    "timeout": 60.0,
+}
+
+# Share a metric may be worse than its baseline before the check fails
+TOLERANCES = {
+    "updates_per_second": 0.3,
+    "p50": 0.3,
+    "p95": 0.5,
+    "p99": 0.5,
+    "statements_per_update": 0.1,
+    "kib_per_user": 0.3,
+}
+HIGHER_IS_BETTER = {"updates_per_second"}
+
+
+class StatementCounter:
+    """Counts the SQL statements of every engine, the handlers create their own."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.lock = threading.Lock()
+        event.listen(Engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args) -> None:
+        with self.lock:
+            self.count += 1
+
+
+class FlowFailed(Exception):
+    pass
+
+
+class SimulatedUser:
+    def __init__(
+        self, user_id: int, bot, fake: FakeBotAPI, updates: UpdateFactory, think_time: float, timeout: float
+    ) -> None:
+        """ One user sending updates to the bot and waiting for its replies
+
+        Args:
+            user_id (int): User and private chat id
+            bot (TeleBot): Bot the updates are processed by
+            fake (FakeBotAPI): Bot API the replies arrive at
+            updates (UpdateFactory): Builds the updates
+            think_time (float): Seconds between a reply and the next update
+            timeout (float): Seconds a step may wait for its reply
+        """
+        self.id = user_id
+        self.bot = bot
+        self.fake = fake
+        self.updates = updates
+        self.think_time = think_time
+        self.timeout = timeout
+        self.sent = 0
+        self.waited = 0.0
+
+    def _send(self, update, until: Callable[[str, dict], bool], step: str) -> dict:
+        # The task that sent a reply may still be saving the conversation state, as it would when a person answers
+        if self.sent:
+            time.sleep(self.think_time)
+        start = len(self.fake.calls)
+        started = time.perf_counter()
+        self.bot.process_new_updates([update])
+        self.sent += 1
+        chat_id = str(self.id)
+        found = self.fake.wait_for(
+            lambda method, params: str(params.get("chat_id")) == chat_id and until(method, params),
+            start=start,
+            timeout=self.timeout,
+        )
+        self.waited += time.perf_counter() - started
+        if found is None:
+            raise FlowFailed(f"User {self.id}: no reply to {step} within {self.timeout:.0f} s")
+        return found[2]
+
+    def message(self, text: str, until: Callable[[str, dict], bool]) -> dict:
+        return self._send(self.updates.message(self.id, text), until, repr(text))
+
+    def press(self, data: str, until: Callable[[str, dict], bool], message_id: Optional[int] = None) -> dict:
+        return self._send(self.updates.callback(self.id, data, message_id), until, data)
+
+
+def replied(method: str, params: dict) -> bool:
+    return method in ("sendMessage", "editMessageText")
+
+
+def has_button(prefix: str) -> Callable[[str, dict], bool]:
+    return lambda method, params: any(data.startswith(prefix) for data in buttons(params))
+
+
+def buttons(params: dict) -> list[str]:
+    markup = params.get("reply_markup")
+    if not markup:
+        return []
+    keyboard = json.loads(markup) if isinstance(markup, str) else markup
+    return [button.get("callback_data", "") for row in keyboard.get("inline_keyboard", []) for button in row]
+
+
+def download_report(user: SimulatedUser, reply: dict) -> None:
+    [data] = [data for data in buttons(reply) if data.startswith(callback_data("files", "get"))]
+    user.press(data, until=lambda method, params: method == "sendDocument")
+
+
+def menu_flow(user: SimulatedUser) -> None:
+    """/start, then the main menu nine times: the middlewares and a handler per update, no background work."""
+    user.message("/start", until=has_button(callback_data("account", "start")))
+    for _ in range(9):
+        user.press(callback_data("menu", "open"), until=has_button(callback_data("account", "start")))
+
+
+def ideas_flow(user: SimulatedUser) -> None:
+    """A topic, its streamed ideas from the LLM and a second batch with "more ideas"."""
+    user.message("/idea", until=replied)
+    # A topic per user, so every request misses the LLM cache
+    user.message(f"Кофейня у дома номер {user.id}", until=has_button(callback_data("ideas", "more")))
+    user.press(callback_data("ideas", "more"), until=has_button(callback_data("ideas", "more")))
+
+
+def account_flow(user: SimulatedUser) -> None:
+    """An account checked and analysed on Instagram, then its Excel report downloaded."""
+    user.message("/account", until=replied)
+    user.message(f"author{user.id}", until=has_button(callback_data("account", "count")))
+    report = user.press(callback_data("account", "count", 5), until=has_button(callback_data("files", "get")))
+    download_report(user, report)
+
+
+def hashtag_flow(user: SimulatedUser) -> None:
+    """A hashtag's top reels from Instagram, then the Excel report downloaded."""
+    user.message("/topic", until=replied)
+    user.message(f"coffee{user.id}", until=has_button(callback_data("hashtag", "count")))
+    report = user.press(callback_data("hashtag", "count", 5), until=has_button(callback_data("files", "get")))
+    download_report(user, report)
+
+
+FLOWS = {"menu": menu_flow, "ideas": ideas_flow, "account": account_flow, "hashtag": hashtag_flow}
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+def run_users(flow: Callable, user_ids: range, bot, fake: FakeBotAPI, updates: UpdateFactory, settings: dict) -> dict:
+    """Run `flow` for all users at once, each in its own thread."""
+    durations, failures, sent = [], [], []
+    lock = threading.Lock()
+    ready = threading.Barrier(len(user_ids) + 1)
+
+    def simulate(user_id: int) -> None:
+        user = SimulatedUser(user_id, bot, fake, updates, settings["think_time"], settings["timeout"])
+        ready.wait()
+        try:
+            flow(user)
+        except FlowFailed as e:
+            with lock:
+                failures.append(str(e))
+        else:
+            with lock:
+                durations.append(user.waited)
+        with lock:
+            sent.append(user.sent)
+
+    threads = [threading.Thread(target=simulate, args=(user_id,), daemon=True) for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return {
+        "elapsed": time.perf_counter() - started, "durations": durations, "failures": failures, "updates": sum(sent),
+    }
+
+
+def run_flow(name: str, settings: dict, bot, fake: FakeBotAPI, statements: StatementCounter, first_user: int) -> dict:
+    users = settings["users"]
+    updates = UpdateFactory(first_update_id=first_user * 100)
+    flow = FLOWS[name]
+
+    counted = statements.count
+    run = run_users(flow, range(first_user, first_user + users), bot, fake, updates, settings)
+    statement_count = statements.count - counted
+
+    # The same flow for as many new users, holding what they leave behind under tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    memory_run = run_users(flow, range(first_user + users, first_user + 2 * users), bot, fake, updates, settings)
+    # Requests recorded by the fake are not the bot's memory
+    with fake.lock:
+        fake.calls.clear()
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    durations = run["durations"] or [float("nan")]
+    return {
+        "updates_per_second": round(run["updates"] / run["elapsed"], 2),
+        "p50": round(percentile(durations, 0.5), 3),
+        "p95": round(percentile(durations, 0.95), 3),
+        "p99": round(percentile(durations, 0.99), 3),
+        "statements_per_update": round(statement_count / max(run["updates"], 1), 2),
+        "kib_per_user": round(held / 1024 / users, 1),
+        "failures": run["failures"] + memory_run["failures"],
+    }
+
+
+def start_bot(settings: dict, fake: FakeBotAPI):
+    """Set up the bot as `setup_bot` does in production, against the fakes and a fresh SQLite database."""
+    from content_assistant_bot.db import database
+
+    database.DATABASE_URL = f"sqlite:///{os.path.abspath('bench.db')}"
+    database.migrate_schema()
+    apihelper.API_URL = fake.api_url
+    install_fake_instagram(FakeInstagram(latency=settings["instagram_latency"], reels=settings["reels"]))
+    install_fake_llm(make_fake_chat_model(latency=settings["llm_latency"]))
+
+    from content_assistant_bot.api import bot as bot_module
+
+    bot_module.setup_bot()
+    return bot_module.bot
+
+
+def compare(results: dict, baselines: dict) -> list[str]:
+    """Metrics worse than their baseline by more than the tolerance, and flows that failed."""
+    regressions = []
+    for name, metrics in results.items():
+        if metrics["failures"]:
+            regressions.append(f"{name}: {len(metrics['failures'])} users failed, e.g. {metrics['failures'][0]}")
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        for metric, tolerance in TOLERANCES.items():
+            value, expected = metrics[metric], baseline.get(metric)
+            if expected is None:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                worse = value < expected * (1 - tolerance)
+            else:
+                worse = value > expected * (1 + tolerance)
+            if worse:
+                regressions.append(f"{name}: {metric} {value} against a baseline of {expected} (±{tolerance:.0%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, help="Concurrent users per flow")
+    parser.add_argument("--flows", nargs="+", choices=list(FLOWS))
+    parser.add_argument("--api-latency", type=float, help="Seconds the fake Bot API takes per request")
+    parser.add_argument("--instagram-latency", type=float, help="Seconds every Instagram call takes")
+    parser.add_argument("--llm-latency", type=float, help="Seconds until the last chunk of a completion")
+    parser.add_argument("--reels", type=int, help="Reels per account or hashtag")
+    parser.add_argument("--think-time", type=float, help="Seconds a user pauses between a reply and the next step")
+    parser.add_argument("--timeout", type=float, help="Seconds a step may wait for its reply")
+    parser.add_argument("--check", action="store_true", help="Run with the baseline settings, fail on regressions")
+    parser.add_argument("--save", action="store_true", help="Store the results and settings as the new baselines")
+    args = parser.parse_args()
+
+    stored = json.loads(BASELINES.read_text()) if BASELINES.exists() else {"settings": {}, "results": {}}
+    settings = dict(DEFAULT_SETTINGS, **(stored["settings"] if args.check else {}))
+    for key in DEFAULT_SETTINGS:
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+    comparable = settings == dict(DEFAULT_SETTINGS, **stored["settings"])
+    if args.check and not comparable:
+        parser.error("--check runs with the stored settings, leave out the other options")
+
+    # Exports, traces and the database go to a directory removed afterwards
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+    with FakeBotAPI(latency=settings["api_latency"]) as fake:
+        bot = start_bot(settings, fake)
+        statements = StatementCounter()
+        results = {}
+        print(
+            f"{'flow':>8} {'updates/s':>10} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'stmts/update':>13} {'KiB/user':>9}"
+        )
+        for idx, name in enumerate(settings["flows"]):
+            results[name] = metrics = run_flow(name, settings, bot, fake, statements, first_user=(idx + 1) * 100_000)
+            baseline = stored["results"].get(name, {})
+            line = (
+                f"{name:>8} {metrics['updates_per_second']:>10.1f} {metrics['p50']:>7.2f} {metrics['p95']:>7.2f} "
+                f"{metrics['p99']:>7.2f} {metrics['statements_per_update']:>13.1f} {metrics['kib_per_user']:>9.1f}"
+            )
+            if baseline:
+                line += f"   baseline {baseline['updates_per_second']:.1f}/s, p95 {baseline['p95']:.2f} s"
+            print(line)
+    bot.update_dispatcher.stop()
+    os.chdir(Path(__file__).parent)
+    workdir.cleanup()
+
+    regressions = compare(results, stored["results"] if comparable else {})
+    if args.save:
+        for metrics in results.values():
+            metrics.pop("failures")
+        baselines = {"settings": settings, "results": results}
+        BASELINES.write_text(json.dumps(baselines, indent=2, ensure_ascii=False) + "\n")
+        print(f"Baselines saved to {BASELINES}")
+    if regressions:
+        print("\nREGRESSIONS:\n" + "\n".join(f"  {line}" for line in regressions), file=sys.stderr)
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Compare the cost of building a reply from OmegaConf nodes and from the compiled catalog.
+
+A reply reads the way the handlers do: a formatted result line, the four menu button
+labels and the footer, looked up by the user's language.
+
+    python benchmarks/bench_i18n.py --replies 20000
+"""
+import argparse
+import time
+
+from omegaconf import OmegaConf
+
+from content_assistant_bot.core.config import CONF_DIR, ConfigService
+
+
+def build_reply(strings, account, lang: str) -> list[str]:
+    options = strings.menu.options
+    return [
+        account.strings.result_ready[lang].format(n=10, nickname="instagram"),
+        options.analyze_account[lang],
+        options.hashtag_or_query_analysis[lang],
+        options.video_idea_generation[lang],
+        options.subscription[lang],
+        account.strings.final_message[lang].format(bot_name="content_assistant_bot"),
+    ]
+
+
+def measure(strings, account, replies: int) -> float:
+    started = time.perf_counter()
+    for _ in range(replies):
+        build_reply(strings, account, "ru")
+    return (time.perf_counter() - started) / replies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replies", type=int, default=20000)
+    args = parser.parse_args()
+
+    service = ConfigService(CONF_DIR)
+    cases = {
+        "omegaconf": (OmegaConf.load(CONF_DIR / "common.yaml"), OmegaConf.load(CONF_DIR / "analyze_account.yaml")),
+        "compiled": (service.get("common"), service.get("analyze_account")),
+        # What the handlers hold: module-level views that follow reloads
+        "view": (service.view("common"), service.view("analyze_account")),
+    }
+    reference = build_reply(*cases["omegaconf"], "ru")
+    print(f"{'catalog':<10} {'us/reply':>9}")
+    for name, (strings, account) in cases.items():
+        assert build_reply(strings, account, "ru") == reference
+        print(f"{name:<10} {measure(strings, account, args.replies) * 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare the size and encoding time of photos sent to the model.
+
+"png" is the previous encoding: lossless PNG at full resolution. The others run the
+`encode_image` pipeline on the bytes of a phone-sized JPEG, as downloaded from Telegram.
+
+    python benchmarks/bench_images.py --width 4032 --height 3024 --max-side 1024 --repeat 5
+"""
+import argparse
+import base64
+import io
+import random
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from content_assistant_bot.core.files import encode_image
+
+
+def make_photo(width: int, height: int) -> bytes:
+    """Photo-like JPEG: gradients, shapes and sensor noise, which is what makes real photos hard to compress."""
+    rng = random.Random(0)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(200):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randrange(20, max(21, width // 8))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+    image = image.filter(ImageFilter.GaussianBlur(3))
+    noise = Image.effect_noise((width, height), 20).convert("RGB")
+    image = Image.blend(image, noise, 0.15)
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=92)
+    return buffered.getvalue()
+
+
+def encode_png(data: bytes) -> bytes:
+    buffered = io.BytesIO()
+    Image.open(io.BytesIO(data)).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def measure(fn, repeat: int) -> tuple[bytes, float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--max-side", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    photo = make_photo(args.width, args.height)
+    print(f"input: {args.width}x{args.height} JPEG, {len(photo) / 1024:.0f} KiB")
+    print(f"{'encoding':<14} {'size':>8} {'base64 KiB':>11} {'ms':>8}")
+
+    cases = {"png": lambda: encode_png(photo)}
+    for image_format in ("JPEG", "WEBP"):
+        for quality in (70, 85):
+            cases[f"{image_format.lower()} q{quality}"] = (
+                lambda image_format=image_format, quality=quality:
+                encode_image(photo, args.max_side, image_format, quality).data
+            )
+
+    for name, fn in cases.items():
+        data, seconds = measure(fn, args.repeat)
+        size = Image.open(io.BytesIO(data)).size
+        print(
+            f"{name:<14} {size[0]:>4}x{size[1]:<4} {len(base64.b64encode(data)) / 1024:>10.0f} "
+            f"{seconds * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Measure the logging cost a handler thread pays per update: the old synchronous setup against the queue.
+
+Every update logs what the user middleware and a background task log: the user event with the
+message text, the task queued and the task finished. The old setup formats f-strings and writes
+in the handler thread, the queued one only interpolates the message and enqueues it, the listener
+thread writes JSON lines. The time to drain the queue is reported separately.
+
+Both write to a local file, and to a slow sink that blocks every write for `--sink-latency-ms`,
+as stderr does when the container's log collector falls behind.
+
+    python benchmarks/bench_logging.py --updates 20000 --threads 1 8
+"""
+import argparse
+import logging
+import queue
+import tempfile
+import threading
+import time
+from logging.handlers import QueueListener
+
+from content_assistant_bot.core.log import ContextQueueHandler, JsonFormatter, SamplingFilter, log_context, preview
+
+TEXT = "Какие идеи для рилс про кофейню в центре города? " * 4
+
+
+def old_update(logger: logging.Logger, idx: int) -> None:
+    logger.info(f"User event: user: 'user{idx}', message: '{TEXT}'")
+    logger.info(f"Task {idx} 'analyse' queued for user {idx}, queue depth 3")
+    logger.info(f"Task {idx} 'analyse' completed: waited {0.01:.2f} s, ran {1.5:.2f} s")
+
+
+def new_update(logger: logging.Logger, idx: int) -> None:
+    with log_context(update_id=idx, user_id=idx):
+        logger.info(
+            "User event: %s from '%s'", "message", f"user{idx}",
+            extra={"event": "user_event", "text": preview(TEXT), "text_length": len(TEXT)},
+        )
+        logger.info("Task %s '%s' queued for user %s, queue depth %s", idx, "analyse", idx, 3)
+        logger.info("Task %s '%s' %s: waited %.2f s, ran %.2f s", idx, "analyse", "completed", 0.01, 1.5)
+
+
+def measure(update, logger: logging.Logger, updates: int, threads: int) -> float:
+    per_thread = updates // threads
+
+    def run():
+        for idx in range(per_thread):
+            update(logger, idx)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (per_thread * threads)
+
+
+class SlowStream:
+    def __init__(self, stream, latency: float) -> None:
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text: str) -> None:
+        time.sleep(self.latency)
+        self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+def make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers = [handler]
+    return logger
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="Share of user events written")
+    parser.add_argument("--sink-latency-ms", type=float, default=0.2, help="Time every write to the slow sink blocks")
+    args = parser.parse_args()
+
+    print(f"{'sink':>5} {'threads':>7} {'sync us/update':>15} {'queued us/update':>17} {'drain us/update':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for sink, latency in (("file", 0), ("slow", args.sink_latency_ms / 1000)):
+            for threads in args.threads:
+                old_output = logging.FileHandler(f"{directory}/old.log")
+                old_output.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+                new_output = logging.FileHandler(f"{directory}/new.log")
+                new_output.setFormatter(JsonFormatter())
+                if latency:
+                    old_output.setStream(SlowStream(old_output.stream, latency))
+                    new_output.setStream(SlowStream(new_output.stream, latency))
+                records = queue.Queue(maxsize=args.updates * 3)
+                handler = ContextQueueHandler(records)
+                handler.addFilter(SamplingFilter({"user_event": args.sample_rate}))
+                listener = QueueListener(records, new_output)
+
+                sync = measure(old_update, make_logger("bench.old", old_output), args.updates, threads)
+                queued = measure(new_update, make_logger("bench.new", handler), args.updates, threads)
+                # The listener starts once the handlers finished, so its time is measured on its own
+                started = time.perf_counter()
+                listener.start()
+                listener.stop()
+                drain = (time.perf_counter() - started) / args.updates
+                print(f"{sink:>5} {threads:>7} {sync * 1e6:>15.2f} {queued * 1e6:>17.2f} {drain * 1e6:>16.2f}")
+                old_output.close()
+                new_output.close()
+
+
+if __name__ == "__main__":
+    main()
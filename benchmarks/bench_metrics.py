@@ -0,0 +1,53 @@
+"""Measure what instrumentation adds to a handler: a bare call against one timed by a histogram.
+
+Runs the calls from several threads at once, as the dispatcher lanes do, so contention on the
+histogram's lock is included.
+
+    python benchmarks/bench_metrics.py --calls 200000 --threads 1 8
+"""
+import argparse
+import threading
+import time
+
+from content_assistant_bot.core.metrics import Histogram
+
+
+def handler(message):
+    return message
+
+
+def measure(function, calls: int, threads: int) -> float:
+    per_thread = calls // threads
+
+    def run():
+        for idx in range(per_thread):
+            function(idx)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (per_thread * threads)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    latency = Histogram("bench_seconds", "Bench", ["handler", "status"])
+    timed = latency.timed("bench.handler")(handler)
+
+    print(f"{'threads':>7} {'bare us/call':>13} {'timed us/call':>14} {'overhead us':>12}")
+    for threads in args.threads:
+        bare = measure(handler, args.calls, threads)
+        instrumented = measure(timed, args.calls, threads)
+        print(f"{threads:>7} {bare * 1e6:>13.2f} {instrumented * 1e6:>14.2f} {(instrumented - bare) * 1e6:>12.2f}")
+    assert latency.count("bench.handler", "ok") == sum(args.calls // threads * threads for threads in args.threads)
+
+
+if __name__ == "__main__":
+    main()
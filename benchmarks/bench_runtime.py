@@ -0,0 +1,101 @@
+"""Compare how many concurrent users the threaded and the asyncio runtimes serve.
+
+Every simulated user sends one message. The handler waits on a slow "LLM call" and then
+replies through a local fake Bot API, so the numbers show how waiting work is scheduled
+rather than how fast Telegram is.
+
+    python benchmarks/bench_runtime.py --users 50 200 --llm-latency 1.0
+"""
+import argparse
+import asyncio
+import time
+
+import telebot
+from telebot import apihelper, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import Update
+
+from content_assistant_bot.testing.fake_telegram import FakeBotAPI
+
+TOKEN = "123:BENCH"
+
+
+def make_updates(n_users: int) -> list[Update]:
+    return [
+        Update.de_json({
+            "update_id": idx,
+            "message": {
+                "message_id": idx,
+                "date": 0,
+                "chat": {"id": idx, "type": "private"},
+                "from": {"id": idx, "is_bot": False, "first_name": "User"},
+                "text": "idea",
+            },
+        })
+        for idx in range(1, n_users + 1)
+    ]
+
+
+def wait_for_replies(fake: FakeBotAPI, n: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while len(fake.calls_to("sendMessage")) < n and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def bench_threaded(fake: FakeBotAPI, n_users: int, llm_latency: float, threads: int) -> float:
+    bot = telebot.TeleBot(TOKEN, threaded=True, num_threads=threads)
+
+    @bot.message_handler(func=lambda message: True)
+    def handler(message):
+        time.sleep(llm_latency)  # the worker thread is held while the provider answers
+        bot.send_message(message.chat.id, "ideas")
+
+    fake.calls.clear()
+    started = time.perf_counter()
+    bot.process_new_updates(make_updates(n_users))
+    wait_for_replies(fake, n_users, timeout=n_users * llm_latency + 30)
+    elapsed = time.perf_counter() - started
+    bot.worker_pool.close()
+    return elapsed
+
+
+def bench_asyncio(fake: FakeBotAPI, n_users: int, llm_latency: float) -> float:
+    async def run() -> float:
+        bot = AsyncTeleBot(TOKEN)
+
+        @bot.message_handler(func=lambda message: True)
+        async def handler(message):
+            await asyncio.sleep(llm_latency)  # only a suspended coroutine while waiting
+            await bot.send_message(message.chat.id, "ideas")
+
+        started = time.perf_counter()
+        await bot.process_new_updates(make_updates(n_users))
+        elapsed = time.perf_counter() - started
+        await bot.close_session()
+        return elapsed
+
+    fake.calls.clear()
+    return asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Simulated LLM wait, seconds")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="Simulated Bot API latency, seconds")
+    parser.add_argument("--threads", type=int, default=2, help="TeleBot worker threads (telebot's default)")
+    args = parser.parse_args()
+
+    with FakeBotAPI(latency=args.api_latency) as fake:
+        apihelper.API_URL = fake.api_url
+        asyncio_helper.API_URL = fake.api_url
+
+        print(f"{'users':>6} {'threaded s':>11} {'asyncio s':>10} {'threaded u/s':>13} {'asyncio u/s':>12}")
+        for n_users in args.users:
+            threaded = bench_threaded(fake, n_users, args.llm_latency, args.threads)
+            aio = bench_asyncio(fake, n_users, args.llm_latency)
+            print(f"{n_users:>6} {threaded:>11.2f} {aio:>10.2f} {n_users / threaded:>13.1f} {n_users / aio:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure how long importing the bot takes, and fail when it exceeds a budget.
+
+Each run imports the module in a fresh interpreter under `python -X importtime`, the
+best of `--repeat` runs is kept, and the packages with the most import time are listed.
+Heavy dependencies that are only needed by some requests must not be imported at startup.
+
+    python benchmarks/bench_startup.py --module content_assistant_bot.api.bot --budget-ms 1000
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+# Imported on first use: provider SDKs, Instagram, exports, config instantiation, the scheduler
+DEFERRED = (
+    "langchain_core", "langchain_openai", "langchain_fireworks",
+    "instagrapi", "pandas", "openpyxl", "hydra", "apscheduler",
+)
+
+
+def import_times(module: str) -> tuple[dict[str, int], list[str]]:
+    """Self import time in microseconds of every module imported by `module`, and the deferred ones among them."""
+    code = f"import sys, {module}; print(','.join(name for name in {DEFERRED!r} if name in sys.modules))"
+    env = {**os.environ, "BOT_TOKEN": os.environ.get("BOT_TOKEN", "123:BENCH")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(self_us)
+    loaded = result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ""
+    return times, [name for name in loaded.split(",") if name]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="content_assistant_bot.api.bot")
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    times, loaded = min(runs, key=lambda run: sum(run[0].values()))
+    total_ms = sum(times.values()) / 1000
+
+    packages = defaultdict(int)
+    for name, self_us in times.items():
+        packages[name.split(".")[0]] += self_us
+    print(f"{'package':<28} {'ms':>8}")
+    for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<28} {self_us / 1000:>8.1f}")
+    print(f"{args.module}: {total_ms:.0f} ms of imports, budget {args.budget_ms:.0f} ms")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: deferred modules imported at startup: {', '.join(loaded)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Bot runtime on AsyncTeleBot: one event loop, blocking libraries confined to bounded pools."""
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from telebot import asyncio_filters
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_storage import StateMemoryStorage
+
+from content_assistant_bot.api.aio.executors import shutdown_executors
+from content_assistant_bot.api.aio.handlers import account, admin, common, hashtag, ideas, menu
+from content_assistant_bot.api.aio.middlewares import (
+    RateLimitMiddleware,
+    StateMiddleware,
+    UserCallbackMiddleware,
+    UserMessageMiddleware,
+)
+from content_assistant_bot.api.handlers.admin import public_message
+from content_assistant_bot.api.handlers.common import cleanup_files
+from content_assistant_bot.api.metrics import instrument_bot, register_gauges
+from content_assistant_bot.api.outbound import install_gateway
+from content_assistant_bot.api.quota import purge_usage
+from content_assistant_bot.api.webhook import WebhookServer
+from content_assistant_bot.core.boot import BootSequence
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.scheduler import get_scheduler, shutdown_scheduler, start_scheduler
+from content_assistant_bot.core.tracing import configure_tracing
+
+logger = logging.getLogger(__name__)
+
+config = settings.view("config")
+
+
+def create_bot(token: str) -> AsyncTeleBot:
+    bot = AsyncTeleBot(token, state_storage=StateMemoryStorage())
+
+    # Handlers
+    menu.register_handlers(bot)
+    account.register_handlers(bot)
+    common.register_handlers(bot)
+    hashtag.register_handlers(bot)
+    admin.register_handlers(bot)
+    ideas.register_handlers(bot)
+
+    # Add custom filters
+    bot.add_custom_filter(asyncio_filters.StateFilter(bot))
+
+    # Middlewares
+    if config.rate_limit.enabled:
+        bot.setup_middleware(RateLimitMiddleware(bot))
+    bot.setup_middleware(UserMessageMiddleware())
+    bot.setup_middleware(UserCallbackMiddleware())
+    bot.setup_middleware(StateMiddleware(bot))
+
+    # Served at /metrics by the health server
+    instrument_bot(bot)
+    register_gauges(bot)
+    configure_tracing(config.tracing, config.name)
+    return bot
+
+
+async def main(token: str, boot: Optional[BootSequence] = None) -> None:
+    boot = boot or BootSequence()
+    logger.info("%s v%s (asyncio runtime)", config.name, config.version)
+    bot = create_bot(token)
+    # Edits to conf/*.yaml take effect without a restart
+    settings.watch()
+    # Covers the sync sends of broadcasts and scheduled jobs, the bot's own requests go through aiohttp
+    install_gateway(config.outbound)
+
+    # Scheduled jobs keep running in the scheduler's own thread pool
+    get_scheduler().add_job(
+        cleanup_files, "interval",
+        minutes=config.scheduler.tmp_cleanup_interval_minutes,
+        args=["./tmp"],
+        id="tmp_janitor",
+        replace_existing=True,
+    )
+    get_scheduler().add_job(purge_usage, "interval", hours=6, id="usage_janitor", replace_existing=True)
+    boot.run("broadcasts", public_message.resume_broadcasts)
+    boot.run("scheduler", start_scheduler)
+
+    me = await bot.get_me()
+    logger.info("Bot `%s` has started", me.username)
+    try:
+        if config.ingestion.mode == "webhook":
+            await serve_webhook(bot, boot)
+        else:
+            boot.mark_ready()
+            await bot.infinity_polling(timeout=190)
+    finally:
+        boot.mark_not_ready()
+        await bot.close_session()
+        shutdown_executors()
+        shutdown_scheduler()
+        settings.stop()
+
+
+async def serve_webhook(bot: AsyncTeleBot, boot: Optional[BootSequence] = None) -> None:
+    webhook_config = config.ingestion.webhook
+    secret_token = os.getenv("WEBHOOK_SECRET_TOKEN")
+    if not secret_token:
+        logger.error(msg="WEBHOOK_SECRET_TOKEN is not set, the webhook would accept updates from anyone.")
+        exit(1)
+    await bot.remove_webhook()
+    await bot.set_webhook(
+        url=webhook_config.url,
+        secret_token=secret_token,
+        max_connections=webhook_config.max_connections,
+        drop_pending_updates=webhook_config.drop_pending_updates,
+    )
+
+    # The server threads hand updates over to the event loop
+    loop = asyncio.get_running_loop()
+    server = WebhookServer(
+        lambda updates: asyncio.run_coroutine_threadsafe(bot.process_new_updates(updates), loop),
+        secret_token=secret_token,
+        host=webhook_config.host,
+        port=webhook_config.port,
+        path=webhook_config.path,
+        queue_size=webhook_config.queue_size,
+    )
+    with server:
+        if boot is not None:
+            boot.mark_ready()
+        await asyncio.Event().wait()
@@ -0,0 +1,39 @@
+"""Bounded thread pools for the blocking libraries used by the asyncio runtime."""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from content_assistant_bot.core.config import settings
+
+config = settings.view("config")
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """Return the pool for a dependency (`db`, `instagram`, `files`), sized from `asyncio.executors`."""
+    with _lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=config.asyncio.executors[name], thread_name_prefix=f"aio-{name}"
+            )
+        return _executors[name]
+
+
+async def run_blocking(pool: str, fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking call in the named pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    # In the caller's context, so the call's spans join the trace of the update
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(pool), functools.partial(context.run, fn, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    with _lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
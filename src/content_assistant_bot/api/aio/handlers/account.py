@@ -0,0 +1,166 @@
+import logging
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.states.asyncio.context import StateContext
+from telebot.types import CallbackQuery, InputMediaVideo, Message
+
+from content_assistant_bot.api.aio.executors import run_blocking
+from content_assistant_bot.api.aio.handlers.common import get_bot_user
+from content_assistant_bot.api.aio.tasks import AsyncTaskProgress, run_with_progress
+from content_assistant_bot.api.handlers.account import AnalyzeAccountStates, format_account_reel_response
+from content_assistant_bot.api.handlers.common import (
+    create_cancel_button,
+    create_keyboard_markup,
+    create_resource,
+    sanitize_instagram_input,
+)
+from content_assistant_bot.api.router import callback_data, get_router
+from content_assistant_bot.core import instagram
+from content_assistant_bot.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+strings = settings.view("common")
+config = settings.view("analyze_account")
+
+
+def register_handlers(bot: AsyncTeleBot):
+    router = get_router(bot)
+
+    @router.handler("account", "start")
+    async def analyze_account_callback(call: CallbackQuery, state: StateContext, user):
+        await state.set(AnalyzeAccountStates.waiting_for_nickname)
+        await bot.send_message(
+            call.from_user.id,
+            config.strings.enter_nickname[user.lang],
+            reply_markup=create_cancel_button(strings, user.lang)
+        )
+
+    @bot.message_handler(commands=["analyze_account", "account"])
+    async def analyze_account(message: Message, state: StateContext, user):
+        await state.set(AnalyzeAccountStates.waiting_for_nickname)
+        await bot.send_message(
+            message.from_user.id,
+            config.strings.enter_nickname[user.lang],
+            reply_markup=create_cancel_button(strings, user.lang)
+        )
+
+    @bot.message_handler(state=AnalyzeAccountStates.waiting_for_nickname)
+    async def get_instagram_input(message: Message, state: StateContext, user):
+        user_input = sanitize_instagram_input(message.text)
+        await state.add_data(user_input=user_input)
+
+        await run_with_progress(
+            bot,
+            message.chat.id,
+            user.id,
+            user.lang,
+            config.strings.received[user.lang],
+            check_account_task,
+            user,
+            user_input,
+            state,
+            limit_scope="instagram",
+            role=user.role,
+        )
+
+    async def check_account_task(progress: AsyncTaskProgress, user, user_input: str, state: StateContext):
+        exists = await run_blocking("instagram", instagram.get_instagram_client().user_exists, user_input)
+        if not exists:
+            await progress.update(config.strings.no_found[user.lang])
+            logger.info("Error fetching reels for account %s", user_input)
+            await state.delete()
+            return
+
+        keyboard = create_keyboard_markup(
+            ["5", "10", "30"], [callback_data("account", "count", n) for n in (5, 10, 30)], "horizontal"
+        )
+        await state.set(AnalyzeAccountStates.waiting_for_number_of_videos)
+        await progress.update(config.strings.ask_number_videos[user.lang], reply_markup=keyboard)
+
+    @router.handler("account", "count", state=AnalyzeAccountStates.waiting_for_number_of_videos)
+    async def get_number_of_videos(call: CallbackQuery, state: StateContext, user, args: list[str]):
+        number_of_videos = int(args[0])
+        async with state.data() as data:
+            input_text = data['user_input']
+
+        await run_with_progress(
+            bot,
+            call.message.chat.id,
+            user.id,
+            user.lang,
+            config.strings.received[user.lang],
+            analyze_account_task,
+            call.message.chat.id,
+            user,
+            input_text,
+            number_of_videos,
+            state,
+            # Each analysed video is an Instagram request
+            limit_scope="instagram",
+            limit_cost=number_of_videos,
+            role=user.role,
+        )
+
+    async def analyze_account_task(
+        progress: AsyncTaskProgress,
+        chat_id: int,
+        user,
+        input_text: str,
+        number_of_videos: int,
+        state: StateContext,
+    ):
+        response = await run_blocking("instagram", instagram.get_instagram_client().fetch_user_reels, input_text)
+        if response["status"] != 200:
+            if response["status"] == 403:
+                await progress.update(config.strings.private_account[user.lang])
+            else:
+                await progress.update(config.strings.error[user.lang])
+            await state.delete()
+            return
+
+        reels_data = response["data"]
+        reels_data.sort(key=lambda x: x["play_count"], reverse=True)
+        logger.info("Found %s reels for account %s", len(reels_data), input_text)
+
+        result_ready_msg = config.strings.result_ready[user.lang].format(n=number_of_videos, nickname=input_text)
+        await progress.update(result_ready_msg, parse_mode="HTML")
+
+        average_likes = sum([reel["likes"] for reel in reels_data]) / len(reels_data)
+        average_comments = sum([reel["comments"] for reel in reels_data]) / len(reels_data)
+        reel_response_items = [
+            format_account_reel_response(
+                idx + 1, reel, config.strings.results[user.lang], average_likes, average_comments
+            )
+            for idx, reel in enumerate(reels_data[:number_of_videos])
+        ]
+        data_list = [
+            {
+                "Url": reel["link"],
+                "Likes": reel["likes"],
+                "Comments": reel["comments"],
+                "Views": reel["play_count"],
+                "Post Date": reel["post_date"].strftime("%Y-%m-%d %H:%M:%S"),
+                "ER %": reel["er"] * 100,
+                "Owner": f'@{reel["owner"]}',
+                "Caption": reel["caption_text"]
+            }
+            for reel in reels_data
+        ]
+        filename = await run_blocking("files", create_resource, user.id, input_text, data_list)
+
+        me = await get_bot_user(bot)
+        footer = config.strings.final_message["ru"].format(bot_name=me.username)
+        response_message = '\n'.join(reel_response_items) + '\n' + footer
+        download_button = create_keyboard_markup(
+            [config.strings.download_report["ru"]], [callback_data("files", "get", filename)]
+        )
+        await bot.send_message(chat_id, response_message, parse_mode="HTML", reply_markup=download_button)
+
+        media_elements = [
+            InputMediaVideo(media=str(reel["video_url"]), caption=reel["title"]) for reel in reels_data[:3]
+        ]
+        if media_elements:
+            await bot.send_media_group(chat_id, media_elements)
+
+        await state.delete()
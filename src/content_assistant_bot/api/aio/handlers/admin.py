@@ -0,0 +1,246 @@
+"""Admin handlers for the asyncio runtime.
+
+The multi-step admin flows use the same FSM states as the threaded handlers.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+import pytz
+from telebot.async_telebot import AsyncTeleBot
+from telebot.states.asyncio.context import StateContext
+from telebot.types import CallbackQuery, Message
+
+from content_assistant_bot.api.aio.executors import run_blocking
+from content_assistant_bot.api.handlers.admin.about import format_config
+from content_assistant_bot.api.handlers.admin.grant_admin import GrantAdminStates
+from content_assistant_bot.api.handlers.admin.jobs import format_jobs
+from content_assistant_bot.api.handlers.admin.menu import create_admin_menu_markup
+from content_assistant_bot.api.handlers.admin.profiling import (
+    format_memory, parse_profile_args, profile_report, start_profile, stop_profile
+)
+from content_assistant_bot.api.handlers.admin.public_message import PublicMessageStates, schedule_broadcast
+from content_assistant_bot.api.handlers.admin.usage import format_usage
+from content_assistant_bot.api.handlers.common import create_cancel_button
+from content_assistant_bot.api.router import get_router
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.db import crud
+
+config = settings.view("config")
+strings = settings.view("common")
+
+timezone = pytz.timezone(config.timezone)
+
+logger = logging.getLogger(__name__)
+
+
+def export_tables(export_dir: str) -> list[str]:
+    os.makedirs(export_dir)
+    crud.export_all_tables(export_dir)
+    return [f"{export_dir}/{table}.csv" for table in ['messages', 'users']]
+
+
+def create_broadcast(user, media_type: str, text: str, photo: str, scheduled_datetime: datetime) -> int:
+    broadcast = crud.create_broadcast(
+        author_id=user.id,
+        author_lang=user.lang,
+        media_type=media_type,
+        text=text,
+        photo=photo,
+        scheduled_at=scheduled_datetime.astimezone(pytz.utc).replace(tzinfo=None),
+    )
+    schedule_broadcast(broadcast.id, scheduled_datetime)
+    return crud.count_users()
+
+
+def register_handlers(bot: AsyncTeleBot):
+    router = get_router(bot)
+    logger.info("Registering async admin handlers")
+
+    async def check_admin(user) -> bool:
+        if user.role != "admin":
+            await bot.send_message(user.id, strings.no_rights[user.lang])
+            return False
+        return True
+
+    @bot.message_handler(commands=["admin"])
+    async def admin_menu_command(message: Message, user):
+        if not await check_admin(user):
+            return
+        await bot.send_message(
+            message.from_user.id, strings.admin_menu.title[user.lang],
+            reply_markup=create_admin_menu_markup(strings, user.lang)
+        )
+
+    @router.handler("admin", "export_data")
+    async def export_data_handler(call: CallbackQuery, user):
+        if not await check_admin(user):
+            return
+
+        export_dir = f'./data/{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+        try:
+            filenames = await run_blocking("db", export_tables, export_dir)
+            for filename in filenames:
+                with open(filename, 'rb') as file:
+                    await bot.send_document(user.id, file)
+                os.remove(filename)
+        except Exception as e:
+            await bot.send_message(user.id, str(e))
+            logger.error("Error exporting data: %s", e)
+
+    @bot.message_handler(commands=["jobs"])
+    async def jobs_command(message: Message, user):
+        if not await check_admin(user):
+            return
+        await bot.send_message(message.from_user.id, format_jobs(user.lang))
+
+    @router.handler("admin", "jobs")
+    async def jobs_callback(call: CallbackQuery, user):
+        if not await check_admin(user):
+            return
+        await bot.send_message(call.from_user.id, format_jobs(user.lang))
+
+    @bot.message_handler(commands=["usage"])
+    async def usage_command(message: Message, user):
+        if not await check_admin(user):
+            return
+        args = message.text.split(maxsplit=1)
+        usage = await run_blocking("db", format_usage, user.lang, args[1] if len(args) > 1 else None)
+        await bot.send_message(message.from_user.id, usage)
+
+    @router.handler("admin", "usage")
+    async def usage_callback(call: CallbackQuery, user):
+        if not await check_admin(user):
+            return
+        await bot.send_message(call.from_user.id, await run_blocking("db", format_usage, user.lang))
+
+    @bot.message_handler(commands=["profile"])
+    async def profile_command(message: Message, user):
+        if not await check_admin(user):
+            return
+
+        loop = asyncio.get_running_loop()
+
+        async def send_profile(finished) -> None:
+            text, document = profile_report(finished)
+            await bot.send_message(user.id, text, parse_mode="Markdown")
+            await bot.send_document(user.id, document, caption=strings.profile_caption[user.lang])
+
+        seconds = parse_profile_args(message.text)
+        if seconds is None:
+            await bot.send_message(user.id, strings.profile_usage[user.lang])
+        elif seconds == "stop":
+            if not stop_profile():
+                await bot.send_message(user.id, strings.profile_not_running[user.lang])
+        # The profiler reports from its own thread, the sends run on this loop
+        elif start_profile(seconds, lambda finished: asyncio.run_coroutine_threadsafe(send_profile(finished), loop)):
+            await bot.send_message(user.id, strings.profile_started[user.lang].format(seconds=f"{seconds:g}"))
+        else:
+            await bot.send_message(user.id, strings.profile_running[user.lang])
+
+    @bot.message_handler(commands=["memory"])
+    async def memory_command(message: Message, user):
+        if not await check_admin(user):
+            return
+        args = message.text.split()[1:]
+        # Snapshots walk every allocation, off the event loop
+        text = await run_blocking("files", format_memory, user.lang, args[0] if args else None)
+        await bot.send_message(user.id, text, parse_mode="Markdown" if text.startswith("```") else None)
+
+    @router.handler("admin", "about")
+    async def about_handler(call: CallbackQuery, user):
+        if not await check_admin(user):
+            return
+        await bot.send_message(call.from_user.id, format_config(), parse_mode="Markdown")
+
+    # Public message
+    @router.handler("admin", "public_message")
+    async def public_message_handler(call: CallbackQuery, state: StateContext, user):
+        if not await check_admin(user):
+            return
+        await state.set(PublicMessageStates.waiting_for_datetime)
+        await bot.send_message(
+            user.id, strings.enter_datetime_prompt[user.lang].format(timezone=config.timezone),
+            reply_markup=create_cancel_button(strings, user.lang)
+        )
+
+    @bot.message_handler(state=PublicMessageStates.waiting_for_datetime)
+    async def get_datetime_input(message: Message, state: StateContext, user):
+        try:
+            user_datetime_obj = datetime.strptime(message.text, '%Y-%m-%d %H:%M')
+        except (TypeError, ValueError):
+            await bot.send_message(user.id, strings.invalid_datetime_format[user.lang])
+            await bot.send_message(
+                user.id, strings.enter_datetime_prompt[user.lang].format(timezone=config.timezone),
+                reply_markup=create_cancel_button(strings, user.lang)
+            )
+            return
+
+        user_datetime_localized = timezone.localize(user_datetime_obj)
+        if user_datetime_localized < datetime.now(timezone):
+            await bot.send_message(user.id, strings.past_datetime_error[user.lang])
+            await bot.send_message(
+                user.id, strings.enter_datetime_prompt[user.lang].format(timezone=config.timezone),
+                reply_markup=create_cancel_button(strings, user.lang)
+            )
+            return
+
+        await state.add_data(datetime=user_datetime_localized)
+        await state.set(PublicMessageStates.waiting_for_content)
+        await bot.send_message(
+            user.id, strings.record_message_prompt[user.lang], reply_markup=create_cancel_button(strings, user.lang)
+        )
+
+    @bot.message_handler(state=PublicMessageStates.waiting_for_content, content_types=['text', 'photo'])
+    async def get_message_content(message: Message, state: StateContext, user):
+        photo_file = None
+        if message.text:
+            user_message = message.text
+            media_type = 'text'
+        else:
+            photo_file = message.photo[-1].file_id
+            user_message = message.caption
+            media_type = 'photo'
+
+        async with state.data() as data:
+            scheduled_datetime = data['datetime']
+        await state.delete()
+
+        n_users = await run_blocking(
+            "db", create_broadcast, user, media_type, user_message, photo_file, scheduled_datetime
+        )
+        response = strings.message_scheduled_confirmation[user.lang].format(
+            n_users=n_users,
+            send_datetime=scheduled_datetime.strftime('%Y-%m-%d %H:%M'),
+            timezone=config.timezone
+        )
+        await bot.send_message(user.id, response)
+
+    # Grant admin
+    @router.handler("admin", "add_admin")
+    async def add_admin_handler(call: CallbackQuery, state: StateContext, user):
+        await state.set(GrantAdminStates.waiting_for_username)
+        await bot.send_message(user.id, strings.enter_username[user.lang])
+
+    @bot.message_handler(state=GrantAdminStates.waiting_for_username)
+    async def get_username(message: Message, state: StateContext, user):
+        await state.add_data(admin_username=message.text)
+        await state.set(GrantAdminStates.waiting_for_user_id)
+        await bot.send_message(
+            user.id, strings.enter_user_id[user.lang], reply_markup=create_cancel_button(strings, user.lang)
+        )
+
+    @bot.message_handler(state=GrantAdminStates.waiting_for_user_id)
+    async def get_user_id(message: Message, state: StateContext, user):
+        async with state.data() as data:
+            admin_username = data['admin_username']
+        await state.delete()
+
+        added_user = await run_blocking(
+            "db", crud.upsert_user, id=message.text, name=admin_username, role="admin"
+        )
+        await bot.send_message(
+            user.id, strings.add_admin_confirm[user.lang].format(
+                user_id=int(added_user.id), username=added_user.name)
+        )
@@ -0,0 +1,51 @@
+import logging
+import os
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.states.asyncio.context import StateContext
+from telebot.types import CallbackQuery, User
+
+from content_assistant_bot.api.aio.executors import run_blocking
+from content_assistant_bot.api.aio.tasks import user_tasks
+from content_assistant_bot.api.router import get_router
+from content_assistant_bot.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+strings = settings.view("common")
+
+
+async def get_bot_user(bot: AsyncTeleBot) -> User:
+    """The bot's own user, fetched once instead of with every result."""
+    if bot.user is None:
+        # Polling sets it the same way, webhook mode never does
+        bot._user = await bot.get_me()
+    return bot.user
+
+
+def read_file(file_path: str) -> bytes:
+    with open(file_path, "rb") as file:
+        return file.read()
+
+
+def register_handlers(bot: AsyncTeleBot):
+    router = get_router(bot)
+
+    @router.handler("files", "get")
+    async def get_resource(call: CallbackQuery, user, args: list[str]):
+        """Download resource from user's folder"""
+        filename = ":".join(args)
+        file_path = os.path.join("./tmp", str(user.id), filename)
+        logger.info("Requesting file: %s", file_path)
+        if os.path.exists(file_path):
+            content = await run_blocking("files", read_file, file_path)
+            await bot.send_document(user.id, content, visible_file_name=filename)
+        else:
+            await bot.answer_callback_query(call.id, strings.file_not_found[user.lang])
+
+    @router.handler("common", "cancel")
+    async def cancel_callback(call: CallbackQuery, state: StateContext):
+        """Cancel current operation"""
+        user_tasks.cancel_user(call.from_user.id)
+        await bot.send_message(call.message.chat.id, strings.cancelled["ru"])
+        await state.delete()
@@ -0,0 +1,166 @@
+import logging
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.states.asyncio.context import StateContext
+from telebot.types import CallbackQuery, InputMediaVideo, Message
+
+from content_assistant_bot.api.aio.executors import run_blocking
+from content_assistant_bot.api.aio.handlers.common import get_bot_user
+from content_assistant_bot.api.aio.tasks import AsyncTaskProgress, run_with_progress
+from content_assistant_bot.api.handlers.common import (
+    create_cancel_button,
+    create_keyboard_markup,
+    create_resource,
+    sanitize_instagram_input,
+)
+from content_assistant_bot.api.handlers.hashtag import AnalyzeHashtagStates, format_hashtag_reel_response
+from content_assistant_bot.api.router import callback_data, get_router
+from content_assistant_bot.core import instagram
+from content_assistant_bot.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+strings = settings.view("common")
+config = settings.view("analyze_hashtag")
+
+
+def register_handlers(bot: AsyncTeleBot):
+    router = get_router(bot)
+
+    @router.handler("hashtag", "start")
+    async def analyze_hashtag_callback(call: CallbackQuery, state: StateContext, user):
+        await state.set(AnalyzeHashtagStates.waiting_for_hashtag)
+        await bot.send_message(call.from_user.id, config.strings.enter_hashtag[user.lang])
+
+    @bot.message_handler(commands=["analyze_hashtag", "topic"])
+    async def analyze_hashtag(message: Message, state: StateContext, user):
+        await state.set(AnalyzeHashtagStates.waiting_for_hashtag)
+        await bot.send_message(
+            message.from_user.id,
+            config.strings.enter_hashtag[user.lang],
+            reply_markup=create_cancel_button(strings, user.lang)
+        )
+
+    @bot.message_handler(state=AnalyzeHashtagStates.waiting_for_hashtag)
+    async def get_instagram_input(message: Message, state: StateContext, user):
+        user_input = sanitize_instagram_input(message.text)
+        await state.add_data(user_input=user_input)
+
+        keyboard = create_keyboard_markup(
+            ["5", "10", "30"], [callback_data("hashtag", "count", n) for n in (5, 10, 30)], "horizontal"
+        )
+        await state.set(AnalyzeHashtagStates.waiting_for_number_of_videos)
+        await bot.send_message(message.chat.id, config.strings.ask_number_videos[user.lang], reply_markup=keyboard)
+
+    @router.handler("hashtag", "count", state=AnalyzeHashtagStates.waiting_for_number_of_videos)
+    async def get_number_of_videos(call: CallbackQuery, state: StateContext, user, args: list[str]):
+        number_of_videos = int(args[0])
+        async with state.data() as data:
+            input_text = data["user_input"]
+
+        await run_with_progress(
+            bot,
+            call.message.chat.id,
+            user.id,
+            user.lang,
+            config.strings.received[user.lang],
+            analyze_hashtag_task,
+            call.message.chat.id,
+            user,
+            input_text,
+            number_of_videos,
+            state,
+            # Each analysed video is an Instagram request
+            limit_scope="instagram",
+            limit_cost=number_of_videos,
+            role=user.role,
+        )
+
+    async def analyze_hashtag_task(
+        progress: AsyncTaskProgress,
+        chat_id: int,
+        user,
+        input_text: str,
+        number_of_videos: int,
+        state: StateContext,
+    ):
+        response = await run_blocking(
+            "instagram", instagram.get_instagram_client().fetch_hashtag_reels, input_text, estimate_view_count=False
+        )
+        if response["status"] != 200:
+            error_message = (
+                strings.error[user.lang]
+                if response["status"] != 404
+                else config.strings.no_found[user.lang]
+            )
+            await progress.update(error_message)
+            await state.delete()
+            return
+
+        await progress.update(
+            config.strings.result_ready[user.lang].format(n=number_of_videos, hashtag=input_text),
+            parse_mode="HTML",
+        )
+
+        reels_data = sorted(response["data"], key=lambda x: x["play_count"], reverse=True)
+        reel_response_items = [
+            format_hashtag_reel_response(idx + 1, reel, config.strings.results[user.lang])
+            for idx, reel in enumerate(reels_data[:number_of_videos])
+        ]
+        data_list = [
+            {
+                "Url": reel["link"],
+                "Likes": reel["likes"],
+                "Comments": reel["comments"],
+                "Views": reel["play_count"],
+                "Post Date": reel["post_date"].strftime("%Y-%m-%d %H:%M:%S"),
+                "ER %": reel["er"] * 100,
+                "Owner": f'@{reel["owner"]}',
+                "Caption": reel["caption_text"],
+            }
+            for reel in reels_data[:number_of_videos]
+        ]
+        filename = await run_blocking("files", create_resource, user.id, input_text, data_list)
+
+        me = await get_bot_user(bot)
+        footer = config.strings.final_message["ru"].format(bot_name=me.username)
+        response_message = '\n'.join(reel_response_items) + "\n" + footer
+        download_button = create_keyboard_markup(
+            [config.strings.download_report["ru"]], [callback_data("files", "get", filename)]
+        )
+        await bot.send_message(chat_id, response_message, parse_mode="HTML", reply_markup=download_button)
+
+        media_elements = [
+            InputMediaVideo(media=str(reel["video_url"]), caption=reel["title"]) for reel in reels_data[:3]
+        ]
+        if media_elements:
+            await bot.send_media_group(chat_id, media_elements)
+
+        await state.add_data(reels_data=reels_data, current_index=0)
+        await send_next_videos(chat_id, state, user)
+
+    async def send_next_videos(chat_id: int, state: StateContext, user):
+        async with state.data() as data:
+            reels_data = data["reels_data"]
+            current_index = data["current_index"]
+            batch_size = 3
+            next_index = current_index + batch_size
+            data["current_index"] = next_index
+
+        if current_index == 0:
+            keyboard = create_keyboard_markup(
+                [config.strings.show_next_videos[user.lang]], [callback_data("hashtag", "next")]
+            )
+            await bot.send_message(chat_id, config.strings.next_videos[user.lang], reply_markup=keyboard)
+        elif next_index < len(reels_data):
+            reel_response_items = [
+                format_hashtag_reel_response(current_index + idx + 1, reel, config.strings.results[user.lang])
+                for idx, reel in enumerate(reels_data[next_index:next_index + batch_size])
+            ]
+            await bot.send_message(chat_id, '\n'.join(reel_response_items), parse_mode="HTML")
+        else:
+            await state.delete()
+
+    @router.handler("hashtag", "next", state=AnalyzeHashtagStates.waiting_for_number_of_videos)
+    async def show_next_videos(call: CallbackQuery, state: StateContext, user):
+        await send_next_videos(call.message.chat.id, state, user)
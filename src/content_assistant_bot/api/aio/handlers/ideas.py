@@ -0,0 +1,236 @@
+import logging
+from typing import Optional
+
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+from telebot.states.asyncio.context import StateContext
+
+from content_assistant_bot.api.aio.streaming import AsyncStreamingMessage
+from content_assistant_bot.api.aio.tasks import AsyncTaskProgress, run_with_progress
+from content_assistant_bot.api.handlers.common import create_cancel_button, create_keyboard_markup
+from content_assistant_bot.api.aio.executors import run_blocking
+from content_assistant_bot.api.handlers.ideas import (
+    IdeasStates,
+    count_completion_tokens,
+    get_history_compactor,
+    get_llm,
+    llm_cache,
+)
+from content_assistant_bot.api.quota import charge_usage
+from content_assistant_bot.api.router import callback_data, get_router
+from content_assistant_bot.api.schemas import Message
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.files import EncodedImage, encode_image, image_cache, select_photo_size
+from content_assistant_bot.core.llm_cache import make_cache_key, normalize_query
+
+logger = logging.getLogger(__name__)
+
+config = settings.view("ideas")
+strings = settings.view("common")
+
+
+def create_more_ideas_markup() -> types.InlineKeyboardMarkup:
+    return create_keyboard_markup(
+        [config.strings.more_ideas.ru, config.strings.main_menu.ru],
+        [callback_data("ideas", "more"), callback_data("menu", "open")]
+    )
+
+
+async def get_photo(bot: AsyncTeleBot, file_id: str) -> EncodedImage:
+    """Asynchronous `handlers.ideas.get_photo`, encoding on the files pool."""
+    key = (file_id, config.images.max_side, config.images.format, config.images.quality)
+    image = image_cache.get(key)
+    if image is None:
+        data = await bot.download_file((await bot.get_file(file_id)).file_path)
+        image = await run_blocking(
+            "files", encode_image, data, config.images.max_side, config.images.format, config.images.quality
+        )
+        image_cache.put(key, image)
+    return image
+
+
+def register_handlers(bot: AsyncTeleBot):
+    router = get_router(bot)
+
+    @router.handler("ideas", "start")
+    async def generate_ideas_callback(call: types.CallbackQuery, state: StateContext, user):
+        await state.set(IdeasStates.waiting_for_query)
+        await bot.send_message(
+            call.from_user.id,
+            config.strings.enter_query[user.lang],
+            reply_markup=create_cancel_button(strings, user.lang)
+        )
+
+    @bot.message_handler(commands=["_generate_ideas", "idea"])
+    async def generate_ideas(message: types.Message, state: StateContext, user):
+        await state.set(IdeasStates.waiting_for_query)
+        await bot.send_message(
+            message.from_user.id,
+            config.strings.enter_query[user.lang],
+            reply_markup=create_keyboard_markup(["Меню"], [callback_data("menu", "open")])
+        )
+
+    @bot.message_handler(state=IdeasStates.waiting_for_query, content_types=['text'])
+    async def get_user_query(message: types.Message, state: StateContext, user):
+        chat_history = [Message(content=message.text[:30000], role="user")]
+        await run_with_progress(
+            bot,
+            message.chat.id,
+            message.from_user.id,
+            "ru",
+            config.strings.received.ru,
+            generate_ideas_task,
+            message.chat.id,
+            chat_history,
+            state,
+            limit_scope="llm",
+            role=user.role,
+        )
+
+    @bot.message_handler(state=IdeasStates.waiting_for_query, content_types=['photo'])
+    async def get_user_photo(message: types.Message, state: StateContext, user):
+        photo = select_photo_size(message.photo, config.images.max_side)
+        chat_history = [Message(content=(message.caption or config.strings.photo_query.ru)[:30000], role="user")]
+        await run_with_progress(
+            bot,
+            message.chat.id,
+            message.from_user.id,
+            "ru",
+            config.strings.received.ru,
+            generate_ideas_task,
+            message.chat.id,
+            chat_history,
+            state,
+            photo.file_id,
+            limit_scope="llm",
+            role=user.role,
+        )
+
+    async def generate_ideas_task(
+        progress: AsyncTaskProgress,
+        chat_id: int,
+        chat_history: list[Message],
+        state: StateContext,
+        image_file_id: Optional[str] = None,
+    ):
+        seen_variants = []
+        image = await get_photo(bot, image_file_id) if image_file_id else None
+        chat_history = await send_llm_response(
+            bot, chat_id, chat_history, state, image=image, reply_markup=create_more_ideas_markup(),
+            progress=progress, cache_query=chat_history[0].content if image is None else None,
+            seen_variants=seen_variants,
+        )
+        await state.add_data(chat_history=chat_history, seen_variants=seen_variants, image_file_id=image_file_id)
+        await state.set(IdeasStates.waiting_for_more_ideas)
+
+    @router.handler("ideas", "more", state=IdeasStates.waiting_for_more_ideas)
+    async def generate_more_ideas(call: types.CallbackQuery, state: StateContext, user):
+        async with state.data() as data:
+            chat_history = data.get('chat_history', [])
+            seen_variants = data.get('seen_variants', [])
+            image_file_id = data.get('image_file_id')
+        chat_history.append(Message(content=config.strings.more_ideas.ru, role="user"))
+
+        await run_with_progress(
+            bot,
+            call.message.chat.id,
+            call.from_user.id,
+            "ru",
+            config.strings.received.ru,
+            generate_more_ideas_task,
+            call.message.chat.id,
+            chat_history,
+            seen_variants,
+            state,
+            image_file_id,
+            limit_scope="llm",
+            role=user.role,
+        )
+
+    async def generate_more_ideas_task(
+        progress: AsyncTaskProgress,
+        chat_id: int,
+        chat_history: list[Message],
+        seen_variants: list[int],
+        state: StateContext,
+        image_file_id: Optional[str] = None,
+    ):
+        image = await get_photo(bot, image_file_id) if image_file_id else None
+        chat_history = await send_llm_response(
+            bot, chat_id, chat_history, state, image=image, reply_markup=create_more_ideas_markup(),
+            progress=progress, cache_query=chat_history[0].content if image is None else None,
+            seen_variants=seen_variants,
+        )
+        await state.add_data(chat_history=chat_history, seen_variants=seen_variants)
+
+
+async def send_llm_response(
+    bot: AsyncTeleBot,
+    user_id: int,
+    chat_history: list[Message],
+    state: StateContext,
+    image: Optional[EncodedImage] = None,
+    reply_markup=None,
+    progress: Optional[AsyncTaskProgress] = None,
+    cache_query: Optional[str] = None,
+    seen_variants: Optional[list[int]] = None,
+) -> list[Message]:
+    llm = get_llm()
+
+    cache_key = None
+    if cache_query is not None and config.cache.enabled:
+        cache_key = make_cache_key(cache_query, llm.config, lemmatize=config.cache.lemmatize)
+        cached = await run_blocking("db", llm_cache.get, cache_key, exclude=seen_variants or ())
+        if cached is not None:
+            if progress is not None:
+                await progress.update(cached.response, reply_markup=reply_markup, parse_mode="Markdown")
+            else:
+                await bot.send_message(user_id, cached.response, reply_markup=reply_markup, parse_mode="Markdown")
+            if seen_variants is not None:
+                seen_variants.append(cached.id)
+            return chat_history + [Message(role="assistant", content=cached.response)]
+
+    try:
+        chat_history = await get_history_compactor(llm).acompact(
+            chat_history,
+            lambda messages, max_tokens: llm.asummarize(messages, config.history.summary_prompt, max_tokens),
+        )
+
+        if llm.config.stream:
+            streaming = AsyncStreamingMessage(
+                bot, user_id,
+                message_id=progress.message_id if progress is not None else None,
+                edit_interval=config.streaming.edit_interval_seconds,
+                progress_markup=create_cancel_button(strings, "ru"),
+            )
+            await streaming.consume(await llm.arun(chat_history, image=image))
+            response_content = await streaming.finish(reply_markup=reply_markup, parse_mode="Markdown")
+        else:
+            response = await llm.arun(chat_history, image=image)
+            response_content = response.response_content
+            if progress is not None:
+                await progress.update(response_content, reply_markup=reply_markup, parse_mode="Markdown")
+            else:
+                await bot.send_message(user_id, response_content, reply_markup=reply_markup, parse_mode="Markdown")
+        await run_blocking(
+            "db", charge_usage, user_id, "llm_tokens", count_completion_tokens(llm, chat_history, response_content)
+        )
+
+        # Simple check: if response is too short
+        if len(response_content) < 2000:
+            await bot.send_message(user_id, config.strings.no_found.ru, reply_markup=reply_markup)
+            await state.set(IdeasStates.waiting_for_query)
+        else:
+            chat_history = chat_history + [Message(role="assistant", content=response_content)]
+            if cache_key is not None:
+                entry = await run_blocking(
+                    "db", llm_cache.put,
+                    cache_key, normalize_query(cache_query, config.cache.lemmatize), response_content,
+                )
+                if entry is not None and seen_variants is not None:
+                    seen_variants.append(entry.id)
+    except Exception as e:
+        logger.error("Error generating LLM response: %s", e)
+        await bot.send_message(user_id, config.strings.error.ru, reply_markup=reply_markup)
+        await state.set(IdeasStates.waiting_for_query)
+    return chat_history
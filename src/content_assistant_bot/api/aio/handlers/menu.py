@@ -0,0 +1,34 @@
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import CallbackQuery, Message
+
+from content_assistant_bot.api.handlers.menu import create_main_menu_markup
+from content_assistant_bot.api.router import get_router
+from content_assistant_bot.core.config import settings
+
+strings = settings.view("common")
+
+
+def register_handlers(bot: AsyncTeleBot):
+    router = get_router(bot)
+
+    @bot.message_handler(commands=["start"])
+    async def start_command(message: Message, data: dict):
+        await bot.send_message(
+            message.chat.id, strings.start["ru"],
+            reply_markup=create_main_menu_markup(strings.menu.options, "ru"),
+            parse_mode="HTML"
+        )
+
+    @bot.message_handler(commands=["menu"])
+    async def menu_menu_command(message: Message, data: dict):
+        await bot.send_message(
+            message.chat.id, strings.menu.title["ru"],
+            reply_markup=create_main_menu_markup(strings.menu.options, "ru")
+        )
+
+    @router.handler("menu", "open")
+    async def menu_menu_callback(call: CallbackQuery):
+        await bot.send_message(
+            call.message.chat.id, strings.menu.title["ru"],
+            reply_markup=create_main_menu_markup(strings.menu.options, "ru")
+        )
@@ -0,0 +1,103 @@
+"""Asynchronous ports of the bot middlewares."""
+import logging
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_handler_backends import BaseMiddleware, CancelUpdate
+from telebot.states.asyncio.context import StateContext
+from telebot.types import CallbackQuery, Message, User
+from telebot.util import update_types
+
+from content_assistant_bot.api.aio.executors import run_blocking
+from content_assistant_bot.api.middlewares.user import bind_update, log_user_event, trace_attributes
+from content_assistant_bot.api.rate_limit import check_rate_limit_async, rate_limited_text
+from content_assistant_bot.core.log import bind, unbind
+from content_assistant_bot.core.tracing import finish_trace, start_trace
+from content_assistant_bot.db import crud
+
+logger = logging.getLogger(__name__)
+
+
+def register_user_event(from_user: User, text: str):
+    """Upsert the user and log the event in one trip to the database pool."""
+    user = crud.upsert_user(
+        id=from_user.id,
+        name=from_user.username,
+        first_name=from_user.first_name,
+        last_name=from_user.last_name
+    )
+    crud.add_message(username=from_user.username, text=text)
+    return user
+
+
+class RateLimitMiddleware(BaseMiddleware):
+    def __init__(self, bot: AsyncTeleBot, scope: str = "ui") -> None:
+        """ Middleware charging every message and button press to the user's navigation allowance
+        Args:
+            bot (AsyncTeleBot): AsyncTeleBot instance
+            scope (str): Rate limit scope of the updates
+        """
+        self.bot = bot
+        self.scope = scope
+        self.update_types = ['message', 'callback_query']
+
+    async def pre_process(self, update, data: dict):
+        wait = await check_rate_limit_async(self.scope, update.from_user.id)
+        if wait == 0:
+            return
+        text = rate_limited_text(update.from_user.language_code, wait)
+        if isinstance(update, CallbackQuery):
+            await self.bot.answer_callback_query(update.id, text)
+        else:
+            await self.bot.send_message(update.chat.id, text)
+        return CancelUpdate()
+
+    async def post_process(self, update, data, exception):
+        pass
+
+
+class UserMessageMiddleware(BaseMiddleware):
+    def __init__(self) -> None:
+        self.update_types = ['message']
+
+    async def pre_process(self, message: Message, data: dict):
+        start_trace("update.message", **trace_attributes(message))
+        data["log_context"] = bind(**bind_update(message))
+        user = await run_blocking("db", register_user_event, message.from_user, message.text)
+        log_user_event(message, message.text)
+        data['user'] = user
+
+    async def post_process(self, message, data, exception):
+        finish_trace(exception)
+        unbind(data.pop("log_context", None))
+
+
+class UserCallbackMiddleware(BaseMiddleware):
+    def __init__(self) -> None:
+        self.update_types = ['callback_query']
+
+    async def pre_process(self, callback_query: CallbackQuery, data: dict):
+        start_trace("update.callback_query", **trace_attributes(callback_query))
+        data["log_context"] = bind(**bind_update(callback_query))
+        user = await run_blocking("db", register_user_event, callback_query.from_user, callback_query.data)
+        log_user_event(callback_query, callback_query.data)
+        data['user'] = user
+
+    async def post_process(self, callback_query, data, exception):
+        finish_trace(exception)
+        unbind(data.pop("log_context", None))
+
+
+class StateMiddleware(BaseMiddleware):
+    # telebot's asyncio StateMiddleware hands out the synchronous StateContext, so provide the async one
+    def __init__(self, bot: AsyncTeleBot) -> None:
+        self.update_sensitive = False
+        self.update_types = update_types
+        self.bot = bot
+
+    async def pre_process(self, message, data: dict):
+        state_context = StateContext(message, self.bot)
+        data["state_context"] = state_context
+        data["state"] = state_context
+
+    async def post_process(self, message, data, exception):
+        pass
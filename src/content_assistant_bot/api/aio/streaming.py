@@ -0,0 +1,73 @@
+"""Asynchronous `StreamingMessage` for the asyncio runtime."""
+import asyncio
+import logging
+from typing import AsyncIterable, Optional
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+
+from content_assistant_bot.api.streaming import StreamingMessage, get_chunk_text, get_retry_after, split_text
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStreamingMessage(StreamingMessage):
+    """Same throttling and splitting as `StreamingMessage`, with awaitable Bot API calls."""
+
+    bot: AsyncTeleBot
+
+    async def append(self, chunk: str) -> None:
+        self.text += chunk
+        if self.text.strip() and self.clock() >= self.next_edit_at:
+            await self.flush()
+
+    async def consume(self, chunks: AsyncIterable) -> str:
+        async for chunk in chunks:
+            await self.append(get_chunk_text(chunk))
+        return self.text
+
+    async def flush(self) -> None:
+        try:
+            await self._render(split_text(self.text, self.limit), reply_markup=self.progress_markup)
+        except ApiTelegramException as e:
+            retry_after = get_retry_after(e)
+            if retry_after is None:
+                raise
+            self.next_edit_at = self.clock() + retry_after
+            return
+        self.next_edit_at = self.clock() + self.edit_interval
+
+    async def finish(self, reply_markup=None, parse_mode: Optional[str] = "Markdown") -> str:
+        parts = split_text(self.text, self.limit) if self.text.strip() else []
+        for attempt in range(3):
+            try:
+                await self._render(parts, reply_markup=reply_markup, parse_mode=parse_mode, final=True)
+                break
+            except ApiTelegramException as e:
+                retry_after = get_retry_after(e)
+                if retry_after is not None:
+                    await asyncio.sleep(retry_after)
+                elif parse_mode and "can't parse entities" in e.description:
+                    logger.warning("Streamed message is not valid %s, sending as plain text", parse_mode)
+                    parse_mode = None
+                else:
+                    raise
+        return self.text
+
+    async def _render(self, parts: list[str], reply_markup=None, parse_mode=None, final: bool = False) -> None:
+        for idx, part in enumerate(parts):
+            markup = reply_markup if idx == len(parts) - 1 else None
+            if idx >= len(self.message_ids):
+                message = await self.bot.send_message(self.chat_id, part, reply_markup=markup, parse_mode=parse_mode)
+                self.message_ids.append(message.message_id)
+                self.rendered.append(part)
+            elif final or self.rendered[idx] != part:
+                try:
+                    await self.bot.edit_message_text(
+                        part, chat_id=self.chat_id, message_id=self.message_ids[idx],
+                        reply_markup=markup, parse_mode=parse_mode,
+                    )
+                except ApiTelegramException as e:
+                    if "message is not modified" not in e.description:
+                        raise
+                self.rendered[idx] = part
@@ -0,0 +1,149 @@
+"""Per-user tracking of long-running coroutines, with progress messages and cancellation."""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+
+from content_assistant_bot.api.aio.executors import run_blocking
+from content_assistant_bot.api.handlers.common import create_cancel_button
+from content_assistant_bot.api.quota import charge_task, check_quota, quota_exceeded_text
+from content_assistant_bot.api.rate_limit import check_rate_limit_async, rate_limited_text
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.tracing import activate, start_span
+
+config = settings.view("config")
+strings = settings.view("common")
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTaskProgress:
+    def __init__(self, bot: AsyncTeleBot, chat_id: int, message_id: int) -> None:
+        """ Progress message of a running coroutine, edited in place
+        Args:
+            bot (AsyncTeleBot): AsyncTeleBot instance
+            chat_id (int): Chat of the progress message
+            message_id (int): Id of the progress message
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+    async def update(self, text: str, **kwargs) -> None:
+        """Asynchronous `TaskProgress.update`."""
+        try:
+            await self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id, **kwargs)
+        except ApiTelegramException as e:
+            if "message is not modified" in e.description:
+                return
+            if kwargs.get("parse_mode") and "can't parse entities" in e.description:
+                logger.warning(
+                    "Progress message %s is not valid %s, sending as plain text", self.message_id, kwargs["parse_mode"]
+                )
+                await self.update(text, **dict(kwargs, parse_mode=None))
+                return
+            raise
+
+
+class UserTasks:
+    def __init__(self, max_per_user: int = 1) -> None:
+        """ Registry of running coroutines per user
+        Args:
+            max_per_user (int): Concurrent tasks allowed per user
+        """
+        self.max_per_user = max_per_user
+        self.tasks: dict[int, set[asyncio.Task]] = {}
+
+    def spawn(self, user_id: int, coro: Awaitable, name: Optional[str] = None) -> Optional[asyncio.Task]:
+        active = self.tasks.setdefault(user_id, set())
+        if len(active) >= self.max_per_user:
+            coro.close()
+            return None
+        # The span keeps the update's trace open until the task is done
+        span = start_span(f"task.{name or 'coroutine'}", user_id=user_id)
+        if span is not None:
+            coro = self._in_span(coro, span)
+        task = asyncio.create_task(coro, name=name)
+        active.add(task)
+        task.add_done_callback(lambda done: self._forget(user_id, done))
+        if span is not None:
+            task.add_done_callback(lambda done: span.end(None if done.cancelled() else done.exception()))
+        return task
+
+    @staticmethod
+    async def _in_span(coro: Awaitable, span):
+        with activate(span):
+            return await coro
+
+    def cancel_user(self, user_id: int) -> int:
+        tasks = list(self.tasks.get(user_id, ()))
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def metrics(self) -> dict[str, int]:
+        return {"running": sum(len(tasks) for tasks in self.tasks.values()), "users": len(self.tasks)}
+
+    def _forget(self, user_id: int, task: asyncio.Task) -> None:
+        active = self.tasks.get(user_id)
+        if active is not None:
+            active.discard(task)
+            if not active:
+                del self.tasks[user_id]
+
+
+user_tasks = UserTasks(max_per_user=config.asyncio.max_tasks_per_user)
+
+
+async def run_with_progress(
+    bot: AsyncTeleBot,
+    chat_id: int,
+    user_id: int,
+    lang: str,
+    progress_text: str,
+    fn: Callable[..., Awaitable],
+    *args,
+    limit_scope: Optional[str] = None,
+    limit_cost: float = 1,
+    role: Optional[str] = None,
+    **kwargs,
+) -> Optional[asyncio.Task]:
+    """Post a progress message with a cancel button and run `fn(progress, *args, **kwargs)` as a task.
+
+    Unlike the threaded runtime, cancelling interrupts the coroutine at its current `await`.
+    With `limit_scope`, the work is first charged `limit_cost` to the user's rate limit of that scope
+    and checked against the budget behind it, which users of `role` "admin" do not have.
+    """
+    if limit_scope is not None:
+        wait = await check_rate_limit_async(limit_scope, user_id, limit_cost)
+        if wait > 0:
+            await bot.send_message(chat_id, rate_limited_text(lang, wait))
+            return None
+        exhausted = await run_blocking("db", check_quota, user_id, role, limit_scope, limit_cost)
+        if exhausted is not None:
+            await bot.send_message(chat_id, quota_exceeded_text(lang, exhausted))
+            return None
+    message = await bot.send_message(chat_id, progress_text, reply_markup=create_cancel_button(strings, lang))
+    progress = AsyncTaskProgress(bot, chat_id, message.message_id)
+
+    async def run() -> None:
+        try:
+            await fn(progress, *args, **kwargs)
+        except asyncio.CancelledError:
+            logger.info("Task '%s' of user %s cancelled", fn.__name__, user_id)
+            raise
+        except Exception as e:
+            logger.exception("Task '%s' of user %s failed: %s", fn.__name__, user_id, e)
+            try:
+                await progress.update(strings.error[lang])
+            except ApiTelegramException as e:
+                logger.warning("Failed to report the error on progress message %s: %s", progress.message_id, e)
+
+    task = user_tasks.spawn(user_id, run(), name=fn.__name__)
+    if task is None:
+        await progress.update(strings.task_busy[lang])
+    elif limit_scope is not None:
+        await run_blocking("db", charge_task, user_id, limit_scope, limit_cost)
+    return task
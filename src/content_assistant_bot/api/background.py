@@ -0,0 +1,122 @@
+"""Run slow handler work on the task queue and report progress by editing one message."""
+import logging
+from typing import Callable, Optional
+
+from telebot.apihelper import ApiTelegramException
+
+from content_assistant_bot.api.quota import charge_task, check_quota, quota_exceeded_text, task_weight
+from content_assistant_bot.api.rate_limit import check_rate_limit, rate_limited_text
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.tasks import Task, TaskCancelled, TaskQueue, TaskRejected
+
+config = settings.view("config")
+strings = settings.view("common")
+
+logger = logging.getLogger(__name__)
+
+task_queue = TaskQueue(
+    workers=config.tasks.workers,
+    max_queue_size=config.tasks.max_queue_size,
+    max_per_user=config.tasks.max_per_user,
+)
+
+
+class TaskProgress:
+    def __init__(self, bot, chat_id: int, message_id: int) -> None:
+        """ Progress message of a background task, edited in place
+        Args:
+            bot (TeleBot): TeleBot instance
+            chat_id (int): Chat of the progress message
+            message_id (int): Id of the progress message
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+    def update(self, text: str, **kwargs) -> None:
+        """Edit the progress message, raising the API errors other than an unchanged text.
+
+        Text Telegram cannot parse in `parse_mode` is sent as plain text, as `StreamingMessage` does.
+        """
+        try:
+            self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id, **kwargs)
+        except ApiTelegramException as e:
+            # Editing to the same text is not an error worth reporting
+            if "message is not modified" in e.description:
+                return
+            if kwargs.get("parse_mode") and "can't parse entities" in e.description:
+                logger.warning(
+                    "Progress message %s is not valid %s, sending as plain text", self.message_id, kwargs["parse_mode"]
+                )
+                self.update(text, **dict(kwargs, parse_mode=None))
+                return
+            raise
+
+    def delete(self) -> None:
+        try:
+            self.bot.delete_message(self.chat_id, self.message_id)
+        except ApiTelegramException as e:
+            logger.warning("Failed to delete progress message %s: %s", self.message_id, e)
+
+
+def run_in_background(
+    bot,
+    chat_id: int,
+    user_id: int,
+    lang: str,
+    progress_text: str,
+    fn: Callable,
+    *args,
+    name: Optional[str] = None,
+    limit_scope: Optional[str] = None,
+    limit_cost: float = 1,
+    role: Optional[str] = None,
+    **kwargs,
+) -> Optional[Task]:
+    """Post a progress message with a cancel button and queue `fn(task, progress, *args, **kwargs)`.
+
+    With `limit_scope`, the work is first charged `limit_cost` to the user's rate limit of that scope
+    and checked against the budget behind it. `role` is the middleware-resolved `User.role`: it
+    sets the user's weight in the queue and exempts admins from budgets.
+
+    Returns:
+        Task: The queued task, or None if the user is rate limited, out of budget, or the user or the queue
+            is at capacity
+    """
+    from content_assistant_bot.api.handlers.common import create_cancel_button
+
+    if limit_scope is not None:
+        wait = check_rate_limit(limit_scope, user_id, limit_cost)
+        if wait > 0:
+            bot.send_message(chat_id, rate_limited_text(lang, wait))
+            return None
+        exhausted = check_quota(user_id, role, limit_scope, limit_cost)
+        if exhausted is not None:
+            bot.send_message(chat_id, quota_exceeded_text(lang, exhausted))
+            return None
+
+    message = bot.send_message(chat_id, progress_text, reply_markup=create_cancel_button(strings, lang))
+    progress = TaskProgress(bot, chat_id, message.message_id)
+
+    def run(task: Task) -> None:
+        try:
+            fn(task, progress, *args, **kwargs)
+        except TaskCancelled:
+            raise
+        except Exception:
+            try:
+                progress.update(strings.error[lang])
+            except ApiTelegramException as e:
+                logger.warning("Failed to report the error on progress message %s: %s", progress.message_id, e)
+            raise
+
+    try:
+        task = task_queue.submit(
+            user_id, run, name=name or getattr(fn, "__name__", None), weight=task_weight(role), cost=limit_cost
+        )
+    except TaskRejected as e:
+        progress.update(strings.task_busy[lang] if e.reason == "user_limit" else strings.task_queue_full[lang])
+        return None
+    if limit_scope is not None:
+        charge_task(user_id, limit_scope, limit_cost)
+    return task
@@ -1,55 +1,165 @@
 import logging
 import logging.config
 import os
+from typing import Optional
 
 import telebot
 from dotenv import find_dotenv, load_dotenv
-from omegaconf import OmegaConf
 from telebot import custom_filters
 from telebot.states.sync.middleware import StateMiddleware
 from telebot.storage.memory_storage import StateMemoryStorage
 
+from content_assistant_bot.api.cluster import Cluster, install_router
+from content_assistant_bot.api.dispatcher import install_dispatcher
 from content_assistant_bot.api.handlers import account, admin, common, hashtag, ideas, menu
-from content_assistant_bot.api.middlewares.antiflood import AntifloodMiddleware
+from content_assistant_bot.api.handlers.admin import public_message
+from content_assistant_bot.api.handlers.common import cleanup_files
+from content_assistant_bot.api.metrics import instrument_bot, register_gauges
+from content_assistant_bot.api.middlewares.rate_limit import RateLimitMiddleware
 from content_assistant_bot.api.middlewares.user import UserCallbackMiddleware, UserMessageMiddleware
+from content_assistant_bot.api.outbound import install_gateway
+from content_assistant_bot.api.quota import purge_usage
+from content_assistant_bot.api.storage import DatabaseStateStorage
+from content_assistant_bot.api.webhook import WebhookServer, set_webhook
+from content_assistant_bot.core.boot import BootSequence
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.scheduler import get_scheduler, shutdown_scheduler, start_scheduler
+from content_assistant_bot.core.tracing import configure_tracing
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-config = OmegaConf.load("./src/content_assistant_bot/conf/config.yaml")
+config = settings.view("config")
 
 load_dotenv(find_dotenv(usecwd=True))  # Load environment variables from .env file
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")
 
 if BOT_TOKEN is None:
     logger.error(msg="BOT_TOKEN is not set in the environment variables.")
     exit(1)
 
-state_storage = StateMemoryStorage()
-bot = telebot.TeleBot(BOT_TOKEN, use_class_middlewares=True, state_storage=state_storage)
-
-def start_bot():
-    logger.info(f"{config.name} v{config.version}")
+# Shared storage lets any worker process continue a conversation
+state_storage = DatabaseStateStorage() if config.state_storage == "database" else StateMemoryStorage()
+# With the dispatcher on, handlers run on its per-chat lanes instead of telebot's worker pool
+bot = telebot.TeleBot(
+    BOT_TOKEN, use_class_middlewares=True, state_storage=state_storage, threaded=not config.dispatcher.enabled
+)
 
+def setup_bot():
+    """Register handlers, filters and middlewares on the process's bot."""
     # Handlers
     menu.register_handlers(bot)
     account.register_handlers(bot)
     common.register_handlers(bot)
     hashtag.register_handlers(bot)
     admin.register_handlers(bot)
-    menu.register_handlers(bot)
     ideas.register_handlers(bot)
 
     # Add custom filters
     bot.add_custom_filter(custom_filters.StateFilter(bot))
 
     # Middlewares
-    if config.antiflood.enabled:
-        bot.setup_middleware(AntifloodMiddleware(bot, config.antiflood.time_window_seconds))
+    # Before the user middlewares, so rejected updates cost no database writes
+    if config.rate_limit.enabled:
+        bot.setup_middleware(RateLimitMiddleware(bot))
     bot.setup_middleware(UserMessageMiddleware())
     bot.setup_middleware(UserCallbackMiddleware())
     bot.setup_middleware(StateMiddleware(bot))
 
-    logger.info(msg=f"Bot `{str(bot.get_me().username)}` has started")
-    bot.infinity_polling(timeout=190)
+    # Updates of one chat are handled in order, different chats in parallel
+    if config.dispatcher.enabled:
+        install_dispatcher(bot, lanes=config.dispatcher.lanes, queue_size=config.dispatcher.queue_size)
+
+    # Served at /metrics by the health server
+    instrument_bot(bot)
+    register_gauges(bot)
+    configure_tracing(config.tracing, config.name)
+
+
+def warm_up_identity():
+    """Fetch and cache the bot's own user, which also checks the token and the connection to Telegram."""
+    return bot.user
+
+
+def start_bot(boot: Optional[BootSequence] = None):
+    boot = boot or BootSequence()
+    logger.info("%s v%s", config.name, config.version)
+    # Edits to conf/*.yaml take effect without a restart
+    settings.watch()
+    # In cluster mode this process sends broadcasts and every worker sends replies, each gets a share of the rate
+    install_gateway(config.outbound, processes=config.cluster.workers + 1)
+
+    # Background jobs: all of them run in the shared, persistent scheduler
+    scheduler = get_scheduler()
+    scheduler.add_job(
+        cleanup_files, "interval",
+        minutes=config.scheduler.tmp_cleanup_interval_minutes,
+        args=["./tmp"],
+        id="tmp_janitor",
+        replace_existing=True,
+    )
+    # Usage records older than every budget window
+    scheduler.add_job(purge_usage, "interval", hours=6, id="usage_janitor", replace_existing=True)
+
+    cluster = None
+    if config.cluster.workers > 0:
+        # This process only receives updates, the workers handle them
+        if config.state_storage != "database":
+            logger.warning("Cluster mode with in-memory state: conversations are lost when workers change")
+        cluster = Cluster(config.cluster.workers, config.cluster.replicas, config.cluster.queue_size).start()
+        install_router(bot, cluster.router)
+        logger.info("Routing updates to %s bot workers", config.cluster.workers)
+    else:
+        boot.run("handlers", setup_bot)
+
+    # Pick up broadcasts interrupted by a restart
+    boot.run("broadcasts", public_message.resume_broadcasts)
+    poll_seconds = config.cluster.scheduler_poll_seconds if cluster else None
+    boot.run("scheduler", lambda: start_scheduler(poll_seconds=poll_seconds))
+
+    logger.info("Bot `%s` has started", warm_up_identity().username)
+    try:
+        if config.ingestion.mode == "webhook":
+            start_webhook(boot)
+        else:
+            boot.mark_ready()
+            bot.infinity_polling(timeout=190)
+    finally:
+        boot.mark_not_ready()
+        if cluster is not None:
+            cluster.stop()
+        shutdown_scheduler()
+        settings.stop()
+
+
+def start_webhook(boot: Optional[BootSequence] = None):
+    if not WEBHOOK_SECRET_TOKEN:
+        logger.error(msg="WEBHOOK_SECRET_TOKEN is not set, the webhook would accept updates from anyone.")
+        exit(1)
+    webhook_config = config.ingestion.webhook
+    set_webhook(bot, webhook_config, WEBHOOK_SECRET_TOKEN)
+    server = WebhookServer(
+        bot.process_new_updates,
+        secret_token=WEBHOOK_SECRET_TOKEN,
+        host=webhook_config.host,
+        port=webhook_config.port,
+        path=webhook_config.path,
+        queue_size=webhook_config.queue_size,
+    )
+    server.start()
+    if boot is not None:
+        boot.mark_ready()
+    try:
+        server.threads[-1].join()
+    finally:
+        server.stop()
+
+
+def start_async_bot(boot: Optional[BootSequence] = None):
+    # Imported here so the threaded runtime does not pull in aiohttp
+    import asyncio
+
+    from content_assistant_bot.api.aio.bot import main
+
+    asyncio.run(main(BOT_TOKEN, boot))
 
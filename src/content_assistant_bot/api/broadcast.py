@@ -0,0 +1,212 @@
+"""Rate-limited, resumable delivery of admin broadcasts."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from requests.exceptions import RequestException
+from telebot.apihelper import ApiTelegramException
+
+from content_assistant_bot.api import outbound
+from content_assistant_bot.api.outbound import Priority, outbound_priority
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.rate_limit import TokenBucket
+from content_assistant_bot.db import crud
+from content_assistant_bot.db.models import Broadcast
+
+config = settings.view("config")
+strings = settings.view("common")
+
+logger = logging.getLogger(__name__)
+
+
+def send_broadcast_message(bot, chat_id: int, media_type: str, text: Optional[str] = None, photo: Optional[str] = None):
+    if media_type == "photo":
+        return bot.send_photo(chat_id=chat_id, photo=photo, caption=text, disable_notification=False)
+    return bot.send_message(chat_id=chat_id, text=text)
+
+
+class BroadcastProgress:
+    def __init__(self, broadcast_id: int, counts: dict[str, int]) -> None:
+        """ Delivery counters of a single broadcast run
+        Args:
+            broadcast_id (int): Broadcast id
+            counts (dict): Delivery status counts persisted before this run
+        """
+        self.broadcast_id = broadcast_id
+        self.sent = counts.get("sent", 0)
+        self.failed = counts.get("failed", 0)
+        self.pending = counts.get("pending", 0)
+        self.sent_this_run = 0
+        self.started_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return self.sent + self.failed + self.pending
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def rate(self) -> float:
+        return self.sent_this_run / self.elapsed if self.elapsed > 0 else 0.0
+
+    def record(self, status: str) -> None:
+        with self.lock:
+            self.pending -= 1
+            if status == "sent":
+                self.sent += 1
+                self.sent_this_run += 1
+            else:
+                self.failed += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "broadcast_id": self.broadcast_id,
+            "sent": self.sent,
+            "failed": self.failed,
+            "pending": self.pending,
+            "total": self.total,
+            "rate": self.rate,
+            "elapsed": self.elapsed,
+        }
+
+
+class BroadcastSender:
+    def __init__(
+        self,
+        bot,
+        rate_per_second: float = 25,
+        workers: int = 4,
+        chunk_size: int = 500,
+        max_retries: int = 5,
+        progress_interval_seconds: float = 5,
+    ) -> None:
+        """ Deliver a broadcast to every recipient without exceeding Telegram limits
+
+        Recipients are materialised into `broadcast_deliveries` in chunks and every delivery
+        outcome is persisted, so running the same broadcast again resumes where it stopped.
+        With the outbound gateway installed, it alone paces the sends and retries 429 answers.
+
+        Args:
+            bot (TeleBot): TeleBot instance
+            rate_per_second (float): Global send rate without the gateway, Telegram allows about 30 messages per second
+            workers (int): Number of concurrent senders sharing the rate limit
+            chunk_size (int): Number of recipients read from the database at once
+            max_retries (int): Attempts per recipient after network errors, and after 429 without the gateway
+            progress_interval_seconds (float): How often the admin progress message is edited
+        """
+        self.bot = bot
+        # Two independent limiters would throttle the broadcast twice and multiply the flood retries
+        self.bucket = TokenBucket(rate=rate_per_second) if outbound.gateway is None else None
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.progress_interval_seconds = progress_interval_seconds
+
+    def run(self, broadcast_id: int) -> Optional[dict]:
+        broadcast = crud.get_broadcast(broadcast_id)
+        if broadcast is None:
+            logger.warning("Broadcast %s not found", broadcast_id)
+            return None
+        if broadcast.status == "done":
+            logger.info("Broadcast %s is already finished", broadcast_id)
+            return None
+
+        if broadcast.status == "scheduled":
+            self._add_recipients(broadcast)
+            crud.update_broadcast(broadcast_id, status="sending")
+        else:
+            logger.info("Resuming broadcast %s", broadcast_id)
+
+        progress = BroadcastProgress(broadcast_id, crud.count_deliveries(broadcast_id))
+        progress_message = self._report(broadcast, progress)
+        last_report = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="broadcast") as executor:
+            after_id = None
+            while True:
+                user_ids = crud.get_pending_recipients(broadcast_id, self.chunk_size, after_id)
+                if not user_ids:
+                    break
+                results = executor.map(lambda uid: self._deliver(broadcast, uid), user_ids)
+                for user_id, (status, error) in zip(user_ids, results):
+                    crud.set_delivery_status(broadcast_id, user_id, status, error)
+                    progress.record(status)
+                    if time.monotonic() - last_report >= self.progress_interval_seconds:
+                        progress_message = self._report(broadcast, progress, progress_message)
+                        last_report = time.monotonic()
+                after_id = user_ids[-1]
+
+        crud.update_broadcast(broadcast_id, status="done", finished_at=datetime.now())
+        self._report(broadcast, progress, progress_message, finished=True)
+        logger.info("Broadcast %s finished: %s", broadcast_id, progress.as_dict())
+        return progress.as_dict()
+
+    def _add_recipients(self, broadcast: Broadcast) -> None:
+        # Continue after the last materialised recipient if a previous run crashed midway
+        after_id = crud.get_last_recipient_id(broadcast.id)
+        for user_ids in crud.iter_user_ids(self.chunk_size, after_id=after_id):
+            crud.add_broadcast_recipients(broadcast.id, user_ids)
+
+    def _deliver(self, broadcast: Broadcast, user_id: int) -> tuple[str, Optional[str]]:
+        error = None
+        for _ in range(self.max_retries + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            try:
+                # Replies to users waiting on the bot go out first
+                with outbound_priority(Priority.BROADCAST):
+                    send_broadcast_message(self.bot, user_id, broadcast.media_type, broadcast.text, broadcast.photo)
+                return "sent", None
+            except ApiTelegramException as e:
+                # Blocked the bot, deactivated, chat not found: retrying will not help.
+                # A 429 past the gateway has been retried there already
+                if e.error_code != 429 or self.bucket is None:
+                    return "failed", e.description
+                retry_after = e.result_json.get("parameters", {}).get("retry_after", 1)
+                logger.warning("Broadcast %s: flood limit hit, retrying after %s s", broadcast.id, retry_after)
+                self.bucket.pause(retry_after)
+                error = e.description
+            except RequestException as e:
+                logger.warning("Broadcast %s: network error for user %s: %s", broadcast.id, user_id, e)
+                time.sleep(1)
+                error = str(e)
+        return "failed", error
+
+    def _report(self, broadcast: Broadcast, progress: BroadcastProgress, message=None, finished: bool = False):
+        template = strings.broadcast_finished if finished else strings.broadcast_progress
+        text = template[broadcast.author_lang].format(**progress.as_dict())
+        if self.bucket is not None:
+            self.bucket.acquire()
+        try:
+            if message is None:
+                return self.bot.send_message(broadcast.author_id, text)
+            self.bot.edit_message_text(text, chat_id=message.chat.id, message_id=message.message_id)
+        except ApiTelegramException as e:
+            logger.warning("Broadcast %s: failed to report progress: %s", broadcast.id, e)
+        return message
+
+
+def run_broadcast(bot, broadcast_id: int) -> Optional[dict]:
+    """Scheduler entry point: deliver one broadcast campaign."""
+    sender = BroadcastSender(
+        bot,
+        rate_per_second=config.broadcast.rate_per_second,
+        workers=config.broadcast.workers,
+        chunk_size=config.broadcast.chunk_size,
+        max_retries=config.broadcast.max_retries,
+        progress_interval_seconds=config.broadcast.progress_interval_seconds,
+    )
+    return sender.run(broadcast_id)
+
+
+def broadcast_job(broadcast_id: int) -> Optional[dict]:
+    """Persistent scheduler job: only the broadcast id is stored, the bot is resolved at run time."""
+    from content_assistant_bot.api.bot import bot
+
+    return run_broadcast(bot, broadcast_id)
@@ -0,0 +1,158 @@
+"""Multi-process mode: a front process receives updates and shards them by chat onto bot workers."""
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import queue
+from typing import Callable, Hashable, Iterable, Optional
+
+from telebot.types import Update
+
+from content_assistant_bot.api.dispatcher import get_update_chat_id
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    # Stable across processes and restarts, unlike the builtin hash() of strings
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes: Iterable[Hashable] = (), replicas: int = 64) -> None:
+        """ Consistent hash ring: adding or removing a node only moves the keys of that node
+        Args:
+            nodes (Iterable): Initial nodes
+            replicas (int): Virtual points per node, more points spread keys more evenly
+        """
+        self.replicas = replicas
+        self.points: list[int] = []
+        self.owners: dict[int, Hashable] = {}
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node: Hashable) -> None:
+        for replica in range(self.replicas):
+            point = _hash(f"{node}#{replica}")
+            self.owners[point] = node
+            bisect.insort(self.points, point)
+
+    def remove_node(self, node: Hashable) -> None:
+        for replica in range(self.replicas):
+            point = _hash(f"{node}#{replica}")
+            del self.owners[point]
+            self.points.remove(point)
+
+    def node_for(self, key) -> Hashable:
+        if not self.points:
+            raise ValueError("Hash ring has no nodes")
+        idx = bisect.bisect(self.points, _hash(str(key))) % len(self.points)
+        return self.owners[self.points[idx]]
+
+
+class ClusterRouter:
+    def __init__(self, queues: list, replicas: int = 64) -> None:
+        """ Route updates to worker queues, the same chat always to the same worker
+        Args:
+            queues (list): One inbound queue per worker
+            replicas (int): Virtual points per worker on the hash ring
+        """
+        self.queues = queues
+        self.ring = HashRing(range(len(queues)), replicas=replicas)
+
+    def worker_for(self, update: Update) -> int:
+        return self.ring.node_for(get_update_chat_id(update))
+
+    def route(self, updates: list[Update]) -> None:
+        for update in updates:
+            self.queues[self.worker_for(update)].put(update)
+
+
+def serve_updates(updates: queue.Queue, process_updates: Callable[[list[Update]], None], max_batch_size: int = 100):
+    """Feed updates from an inbound queue to `process_updates` until a `None` arrives."""
+    while True:
+        batch = [updates.get()]
+        while len(batch) < max_batch_size:
+            try:
+                batch.append(updates.get_nowait())
+            except queue.Empty:
+                break
+        stop = None in batch
+        batch = [update for update in batch if update is not None]
+        if batch:
+            try:
+                process_updates(batch)
+            except Exception as e:
+                logger.exception("Error processing updates: %s", e)
+        if stop:
+            return
+
+
+def _worker_main(worker_id: int, updates: multiprocessing.Queue) -> None:
+    # Imported in the child: it builds its own bot, database engines and thread pools
+    from content_assistant_bot.api import bot as bot_module
+    from content_assistant_bot.api.outbound import install_gateway
+    from content_assistant_bot.core.config import settings
+    from content_assistant_bot.core.log import configure_logging
+    from content_assistant_bot.core.scheduler import shutdown_scheduler, start_scheduler
+
+    configure_logging(settings.get("config").logging)
+    logger.info("Bot worker %s started", worker_id)
+    bot_module.setup_bot()
+    settings.watch()
+    install_gateway(settings.get("config").outbound, processes=settings.get("config").cluster.workers + 1)
+    # Jobs added here (e.g. broadcasts) are stored for the front process to run
+    start_scheduler(paused=True)
+    try:
+        serve_updates(updates, bot_module.bot.process_new_updates)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_scheduler(wait=False)
+        settings.stop()
+        logger.info("Bot worker %s stopped", worker_id)
+
+
+class Cluster:
+    def __init__(self, workers: int, replicas: int = 64, queue_size: int = 1000) -> None:
+        """ Bot worker processes behind a consistent-hash router
+        Args:
+            workers (int): Number of worker processes
+            replicas (int): Virtual points per worker on the hash ring
+            queue_size (int): Updates buffered per worker before routing blocks
+        """
+        self.context = multiprocessing.get_context("spawn")
+        self.queues = [self.context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.router = ClusterRouter(self.queues, replicas=replicas)
+        self.processes: list = []
+
+    def start(self) -> "Cluster":
+        for worker_id, updates in enumerate(self.queues):
+            process = self.context.Process(
+                target=_worker_main, args=(worker_id, updates), name=f"bot-worker-{worker_id}", daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+        return self
+
+    def stop(self, timeout: Optional[float] = 30) -> None:
+        """Let the workers finish the routed updates, then stop them."""
+        for updates in self.queues:
+            updates.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+
+
+def install_router(bot, router: ClusterRouter) -> None:
+    """Send the updates received by `bot` (polling or webhook) to the workers instead of its handlers."""
+
+    def process_new_updates(updates: list[Update]) -> None:
+        # Polling asks for updates after `last_update_id`, advance it before the workers catch up
+        if updates:
+            bot.last_update_id = max(bot.last_update_id, max(update.update_id for update in updates))
+        router.route(updates)
+
+    bot.process_new_updates = process_new_updates
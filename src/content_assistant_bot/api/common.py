@@ -3,7 +3,6 @@ import os
 
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
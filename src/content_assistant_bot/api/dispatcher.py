@@ -0,0 +1,122 @@
+"""Shard incoming updates by chat onto worker lanes: ordered per chat, parallel across chats."""
+import logging
+import queue
+import threading
+from typing import Callable, Optional
+
+from telebot.types import Update
+
+from content_assistant_bot.core.log import log_context
+
+logger = logging.getLogger(__name__)
+
+
+def get_update_chat_id(update: Update) -> Optional[int]:
+    """Return the chat (or, failing that, the user) an update belongs to."""
+    for message in (
+        update.message,
+        update.edited_message,
+        update.channel_post,
+        update.edited_channel_post,
+        update.business_message,
+        update.edited_business_message,
+        update.message_reaction,
+        update.message_reaction_count,
+    ):
+        if message is not None:
+            return message.chat.id
+    if update.callback_query is not None:
+        if update.callback_query.message is not None:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+    for event in (update.my_chat_member, update.chat_member, update.chat_join_request):
+        if event is not None:
+            return event.chat.id
+    for event in (
+        update.inline_query,
+        update.chosen_inline_result,
+        update.shipping_query,
+        update.pre_checkout_query,
+        update.poll_answer,
+    ):
+        if event is not None:
+            user = getattr(event, "from_user", None) or getattr(event, "user", None)
+            if user is not None:
+                return user.id
+    return None
+
+
+class UpdateDispatcher:
+    def __init__(self, process_updates: Callable[[list[Update]], None], lanes: int = 8, queue_size: int = 100) -> None:
+        """ Dispatch updates of one chat to the same lane, so they are handled in order
+
+        Args:
+            process_updates (Callable): Handles a list of updates, e.g. `TeleBot.process_new_updates`
+            lanes (int): Number of worker lanes, i.e. chats processed in parallel
+            queue_size (int): Updates buffered per lane; when full, dispatching blocks and applies backpressure
+        """
+        self.process_updates = process_updates
+        self.lanes = [queue.Queue(maxsize=queue_size) for _ in range(lanes)]
+        self.threads: list[threading.Thread] = []
+        self.lock = threading.Lock()
+
+    def start(self) -> "UpdateDispatcher":
+        with self.lock:
+            if not self.threads:
+                for idx, lane in enumerate(self.lanes):
+                    thread = threading.Thread(target=self._work, args=(lane,), name=f"lane-{idx}", daemon=True)
+                    thread.start()
+                    self.threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        """Finish the queued updates and stop the lanes."""
+        with self.lock:
+            for lane in self.lanes:
+                lane.put(None)
+            for thread in self.threads:
+                thread.join()
+            self.threads = []
+
+    def lane_for(self, chat_id: Optional[int]) -> int:
+        return hash(chat_id) % len(self.lanes)
+
+    def dispatch(self, updates: list[Update]) -> None:
+        self.start()
+        for update in updates:
+            self.lanes[self.lane_for(get_update_chat_id(update))].put(update)
+
+    def queue_depths(self) -> list[int]:
+        return [lane.qsize() for lane in self.lanes]
+
+    def _work(self, lane: queue.Queue) -> None:
+        while True:
+            update = lane.get()
+            try:
+                if update is None:
+                    return
+                with log_context(update_id=update.update_id):
+                    self.process_updates([update])
+            except Exception as e:
+                logger.exception("Error processing update %s: %s", update.update_id, e)
+            finally:
+                lane.task_done()
+
+
+def install_dispatcher(bot, lanes: int = 8, queue_size: int = 100) -> UpdateDispatcher:
+    """Route `bot.process_new_updates` through per-chat lanes.
+
+    The bot must be created with `threaded=False`, so handlers run inline on the lane threads
+    instead of being handed to telebot's unordered worker pool.
+    """
+    dispatcher = UpdateDispatcher(bot.process_new_updates, lanes=lanes, queue_size=queue_size)
+
+    def process_new_updates(updates: list[Update]) -> None:
+        # Polling asks for updates after `last_update_id`, advance it before the lanes catch up
+        if updates:
+            bot.last_update_id = max(bot.last_update_id, max(update.update_id for update in updates))
+        dispatcher.dispatch(updates)
+
+    bot.process_new_updates = process_new_updates
+    bot.update_dispatcher = dispatcher
+    return dispatcher.start()
@@ -1,35 +1,26 @@
 import logging
-import os
 
-from dotenv import find_dotenv, load_dotenv
-from omegaconf import OmegaConf
 from telebot.states import State, StatesGroup
 from telebot.states.sync.context import StateContext
 from telebot.types import CallbackQuery, InputMediaVideo, Message
 
+from content_assistant_bot.api.background import TaskProgress, run_in_background
 from content_assistant_bot.api.handlers.common import (
     create_cancel_button,
     create_keyboard_markup,
     create_resource,
     sanitize_instagram_input,
 )
+from content_assistant_bot.api.router import callback_data, get_router
 from content_assistant_bot.core import instagram
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.tasks import Task
 from content_assistant_bot.db.crud import get_user
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-strings = OmegaConf.load("./src/content_assistant_bot/conf/common.yaml")
-config = OmegaConf.load("./src/content_assistant_bot/conf/analyze_account.yaml")
-
-load_dotenv(find_dotenv(usecwd=True))
-INSTAGRAM_USERNAME = os.getenv("INSTAGRAM_USERNAME")
-INSTAGRAM_PASSWORD = os.getenv("INSTAGRAM_PASSWORD")
-
-if not INSTAGRAM_USERNAME or not INSTAGRAM_PASSWORD:
-    raise ValueError("Instagram credentials not found in environment variables")
-
-instagram_client = instagram.InstagramWrapper(INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD)
+strings = settings.view("common")
+config = settings.view("analyze_account")
 
 # Define States
 class AnalyzeAccountStates(StatesGroup):
@@ -71,7 +62,9 @@ def format_account_reel_response(
 
 # Handlers
 def register_handlers(bot):
-    @bot.callback_query_handler(func=lambda call: "_analyze_account" in call.data)
+    router = get_router(bot)
+
+    @router.handler("account", "start")
     def analyze_account(call: CallbackQuery, state: StateContext):
         user = get_user(username=call.from_user.username)
         state.set(AnalyzeAccountStates.waiting_for_nickname)
@@ -94,51 +87,88 @@ def register_handlers(bot):
         )
 
     @bot.message_handler(state=AnalyzeAccountStates.waiting_for_nickname)
-    def get_instagram_input(message: Message, state: StateContext):
-        user = get_user(username=message.from_user.username)
+    def get_instagram_input(message: Message, state: StateContext, user):
         user_input = sanitize_instagram_input(message.text)
 
         # Save user input in state data
         state.add_data(user_input=user_input)
 
-        bot.send_message(message.chat.id, config.strings.received[user.lang])
+        # Instagram lookups are slow: check the account on the task queue
+        run_in_background(
+            bot,
+            message.chat.id,
+            user.id,
+            user.lang,
+            config.strings.received[user.lang],
+            check_account_task,
+            user,
+            user_input,
+            state,
+            limit_scope="instagram",
+            role=user.role,
+        )
 
-        if not instagram_client.user_exists(user_input):
-            bot.send_message(message.chat.id, config.strings.no_found[user.lang])
-            logger.info(f"Error fetching reels for account {user_input}")
+    def check_account_task(task: Task, progress: TaskProgress, user, user_input: str, state: StateContext):
+        exists = instagram.get_instagram_client().user_exists(user_input)
+        task.check_cancelled()
+        if not exists:
+            progress.update(config.strings.no_found[user.lang])
+            logger.info("Error fetching reels for account %s", user_input)
             state.delete()
             return
 
-        keyboard = create_keyboard_markup(["5", "10", "30"], ["5", "10", "30"], "horizontal")
-        state.set(AnalyzeAccountStates.waiting_for_number_of_videos)
-        bot.send_message(
-            message.chat.id,
-            config.strings.ask_number_videos[user.lang],
-            reply_markup=keyboard
+        keyboard = create_keyboard_markup(
+            ["5", "10", "30"], [callback_data("account", "count", n) for n in (5, 10, 30)], "horizontal"
         )
+        state.set(AnalyzeAccountStates.waiting_for_number_of_videos)
+        progress.update(config.strings.ask_number_videos[user.lang], reply_markup=keyboard)
 
-    @bot.callback_query_handler(
-        func=lambda call: call.data in ["5", "10", "30"],
-        state=AnalyzeAccountStates.waiting_for_number_of_videos
-    )
-    def get_number_of_videos(call: CallbackQuery, state: StateContext):
-        user = get_user(username=call.from_user.username)
-        number_of_videos = int(call.data)
+    @router.handler("account", "count", state=AnalyzeAccountStates.waiting_for_number_of_videos)
+    def get_number_of_videos(call: CallbackQuery, state: StateContext, user, args: list[str]):
+        number_of_videos = int(args[0])
 
         # Retrieve user input from state data
         with state.data() as data:
             input_text = data['user_input']
 
-        response = instagram_client.fetch_user_reels(input_text)
+        run_in_background(
+            bot,
+            call.message.chat.id,
+            user.id,
+            user.lang,
+            config.strings.received[user.lang],
+            analyze_account_task,
+            call.message.chat.id,
+            user,
+            input_text,
+            number_of_videos,
+            state,
+            # Each analysed video is an Instagram request
+            limit_scope="instagram",
+            limit_cost=number_of_videos,
+            role=user.role,
+        )
+
+    def analyze_account_task(
+        task: Task,
+        progress: TaskProgress,
+        chat_id: int,
+        user,
+        input_text: str,
+        number_of_videos: int,
+        state: StateContext,
+    ):
+        response = instagram.get_instagram_client().fetch_user_reels(input_text)
+        task.check_cancelled()
 
         if response["status"] == 200:
             reels_data = response["data"]
             reels_data.sort(key=lambda x: x["play_count"], reverse=True)
 
-            logger.info(f"Found {len(reels_data)} reels for account {input_text}")
+            logger.info("Found %s reels for account %s", len(reels_data), input_text)
 
             result_ready_msg = config.strings.result_ready[user.lang].format(n=number_of_videos, nickname=input_text)
-            bot.send_message(call.message.chat.id, result_ready_msg, parse_mode="HTML")
+            progress.update(result_ready_msg, parse_mode="HTML")
 
             response_template = config.strings.results[user.lang]
 
@@ -175,15 +205,15 @@ def register_handlers(bot):
             filename = create_resource(user.id, input_text, data_list)
 
             # Send response and download button
-            footer = config.strings.final_message["ru"].format(bot_name=bot.get_me().username)
+            footer = config.strings.final_message["ru"].format(bot_name=bot.user.username)
             response_message = '\n'.join(reel_response_items) + '\n' + footer
 
             download_button = create_keyboard_markup(
                 [config.strings.download_report["ru"]],
-                [f"GET {filename}"],
+                [callback_data("files", "get", filename)],
             )
             bot.send_message(
-                call.message.chat.id,
+                chat_id,
                 response_message,
                 parse_mode="HTML",
                 reply_markup=download_button
@@ -197,7 +227,7 @@ def register_handlers(bot):
                 )
             if media_elements:
                 bot.send_media_group(
-                    call.message.chat.id,
+                    chat_id,
                     media_elements
                 )
 
@@ -205,7 +235,7 @@ def register_handlers(bot):
 
         else:
             if response["status"] == 403:
-                bot.send_message(call.message.chat.id, config.strings.private_account[user.lang])
+                progress.update(config.strings.private_account[user.lang])
             else:
-                bot.send_message(call.message.chat.id, config.strings.error[user.lang])
+                progress.update(config.strings.error[user.lang])
             state.delete()
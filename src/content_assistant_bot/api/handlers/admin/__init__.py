@@ -1,8 +1,14 @@
-from content_assistant_bot.api.handlers.admin import db, grant_admin, menu, public_message
+from content_assistant_bot.api.handlers.admin import (
+    about, db, grant_admin, jobs, menu, profiling, public_message, usage
+)
 
 
 def register_handlers(bot):
+    about.register_handlers(bot)
     db.register_handlers(bot)
     grant_admin.register_handlers(bot)
+    jobs.register_handlers(bot)
     menu.register_handlers(bot)
+    profiling.register_handlers(bot)
     public_message.register_handlers(bot)
+    usage.register_handlers(bot)
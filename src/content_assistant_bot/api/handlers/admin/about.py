@@ -1,14 +1,32 @@
 """Handler to show information about the bot's configuration."""
+import logging
+
 from omegaconf import OmegaConf
 
-config = OmegaConf.load("./src/real_estate_telegram_bot/conf/config.yaml")
+from content_assistant_bot.api.router import get_router
+from content_assistant_bot.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+strings = settings.view("common")
+
+
+def format_config() -> str:
+    """The running configuration, as of the last reload, in a Markdown code block."""
+    config_str = OmegaConf.to_yaml(settings.raw("config"))
+    return f"```yaml\n{config_str}\n```"
+
 
 def register_handlers(bot):
-    @bot.callback_query_handler(func=lambda call: call.data == "_about")
-    def about_handler(call):
-        user_id = call.from_user.id
+    router = get_router(bot)
+    logger.info("Registering admin about handlers")
 
-        config_str = OmegaConf.to_yaml(config)
+    @router.handler("admin", "about")
+    def about_handler(call, data):
+        user = data["user"]
+        if user.role != "admin":
+            bot.send_message(call.from_user.id, strings.no_rights[user.lang])
+            return
 
         # Send config
-        bot.send_message(user_id, f"```yaml\n{config_str}\n```", parse_mode="Markdown")
+        bot.send_message(call.from_user.id, format_config(), parse_mode="Markdown")
@@ -3,20 +3,21 @@ import logging.config
 import os
 from datetime import datetime
 
-from omegaconf import OmegaConf
 
+from content_assistant_bot.api.router import get_router
+from content_assistant_bot.core.config import settings
 from content_assistant_bot.db import crud
 
-config = OmegaConf.load("./src/content_assistant_bot/conf/config.yaml")
-strings = OmegaConf.load("./src/content_assistant_bot/conf/common.yaml")
+config = settings.view("config")
+strings = settings.view("common")
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 def register_handlers(bot):
+    router = get_router(bot)
     logger.info("Registering admin database handler")
-    @bot.callback_query_handler(func=lambda call: call.data == "_export_data")
+    @router.handler("admin", "export_data")
     def export_data_handler(call, data):
         user = data["user"]
 
@@ -39,4 +40,4 @@ def register_handlers(bot):
                 os.remove(filename)
         except Exception as e:
             bot.send_message(user.id, str(e))
-            logger.error(f"Error exporting data: {e}")
+            logger.error("Error exporting data: %s", e)
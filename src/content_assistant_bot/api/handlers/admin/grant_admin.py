@@ -4,45 +4,41 @@ import os
 from datetime import datetime
 
 import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
-from omegaconf import OmegaConf
+from telebot.states import State, StatesGroup
+from telebot.states.sync.context import StateContext
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 
+from content_assistant_bot.api.handlers.common import create_cancel_button
+from content_assistant_bot.api.router import callback_data, get_router
+from content_assistant_bot.core.config import settings
 from content_assistant_bot.db import crud
 
-config = OmegaConf.load("./src/content_assistant_bot/conf/config.yaml")
-strings = OmegaConf.load("./src/content_assistant_bot/conf/common.yaml")
+config = settings.view("config")
+strings = settings.view("common")
 
 # Define Paris timezone
 timezone = pytz.timezone(config.timezone)
 
-# Initialize the scheduler
-scheduler = BackgroundScheduler()
 
-# Dictionary to store user data during message scheduling
-user_data = {}
+class GrantAdminStates(StatesGroup):
+    waiting_for_username = State()
+    waiting_for_user_id = State()
+
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 def create_admin_menu_markup(strings, lang) -> InlineKeyboardMarkup:
     menu_markup = InlineKeyboardMarkup(row_width=1)
     menu_markup.add(
-        InlineKeyboardButton(strings.admin_menu.send_message[lang], callback_data="_public_message"),
-        InlineKeyboardButton(strings.admin_menu.add_admin[lang], callback_data="_add_admin"),
-        InlineKeyboardButton(strings.admin_menu.export_data[lang], callback_data="_export_data"),
+        InlineKeyboardButton(
+            strings.admin_menu.send_message[lang], callback_data=callback_data("admin", "public_message")
+        ),
+        InlineKeyboardButton(strings.admin_menu.add_admin[lang], callback_data=callback_data("admin", "add_admin")),
+        InlineKeyboardButton(strings.admin_menu.export_data[lang], callback_data=callback_data("admin", "export_data")),
     )
     return menu_markup
 
-def create_cancel_button(strings, lang):
-    cancel_button = InlineKeyboardMarkup(row_width=1)
-    cancel_button.add(
-        InlineKeyboardButton(strings.cancel[lang], callback_data="_cancel"),
-    )
-    return cancel_button
-
-
 # Function to send a scheduled message
 def send_scheduled_message(bot, chat_id, message_text):
     bot.send_message(chat_id, message_text)
@@ -50,27 +46,31 @@ def send_scheduled_message(bot, chat_id, message_text):
 
 # React to any text if not command
 def register_handlers(bot):
+    router = get_router(bot)
     logger.info("Registering grant admin handlers")
-    @bot.callback_query_handler(func=lambda call: call.data == "_add_admin")
-    def add_admin_handler(call, data):
-        user = data["user"]
+    @router.handler("admin", "add_admin")
+    def add_admin_handler(call, state: StateContext, user):
         # to complete
-        sent_message = bot.send_message(user.id, strings.enter_username[user.lang])
+        state.set(GrantAdminStates.waiting_for_username)
+        bot.send_message(user.id, strings.enter_username[user.lang])
 
-        # Move to the next step: receiving the custom message
-        bot.register_next_step_handler(sent_message, get_username, bot, user)
-
-    def get_username(message, bot, user):
+    @bot.message_handler(state=GrantAdminStates.waiting_for_username)
+    def get_username(message, state: StateContext, user):
         admin_username = message.text
 
         # Send prompt to enter user id
-        sent_message = bot.send_message(user.id, strings.enter_user_id[user.lang], reply_markup=create_cancel_button(strings, user.lang))
-
-        # Move to the next step: receiving the custom message
-        bot.register_next_step_handler(sent_message, get_user_id, bot, user, admin_username)
+        state.add_data(admin_username=admin_username)
+        state.set(GrantAdminStates.waiting_for_user_id)
+        bot.send_message(
+            user.id, strings.enter_user_id[user.lang], reply_markup=create_cancel_button(strings, user.lang)
+        )
 
-    def get_user_id(message, bot, user, admin_username):
+    @bot.message_handler(state=GrantAdminStates.waiting_for_user_id)
+    def get_user_id(message, state: StateContext, user):
         admin_user_id = message.text
+        with state.data() as data:
+            admin_username = data['admin_username']
+        state.delete()
 
         added_user = crud.upsert_user(id=admin_user_id, name=admin_username, role="admin")
 
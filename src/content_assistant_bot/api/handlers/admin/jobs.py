@@ -0,0 +1,53 @@
+"""Handler to list jobs pending in the application scheduler."""
+import logging
+
+from telebot.types import Message
+
+from content_assistant_bot.api import outbound, rate_limit
+from content_assistant_bot.api.background import task_queue
+from content_assistant_bot.api.router import get_router
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.scheduler import get_scheduler
+
+strings = settings.view("common")
+
+logger = logging.getLogger(__name__)
+
+
+def format_jobs(lang: str) -> str:
+    jobs = get_scheduler().get_jobs()
+    lines = [strings.jobs_title[lang].format(n=len(jobs))] if jobs else [strings.no_jobs[lang]]
+    for job in jobs:
+        next_run = job.next_run_time.strftime("%Y-%m-%d %H:%M:%S") if job.next_run_time else "-"
+        lines.append(f"{job.id}: {job.name}, {job.trigger}, next run {next_run}")
+
+    # Depth of the queue for slow Instagram and LLM work
+    lines.append(strings.task_queue_stats[lang].format(**task_queue.metrics()))
+    if rate_limit.limiter is not None:
+        for scope, metrics in rate_limit.limiter.metrics().items():
+            lines.append(strings.rate_limit_stats[lang].format(scope=scope, **metrics))
+    if outbound.gateway is not None:
+        for priority, metrics in outbound.gateway.metrics().items():
+            lines.append(strings.outbound_stats[lang].format(priority=priority, **metrics))
+    return "\n".join(lines)
+
+
+def register_handlers(bot):
+    router = get_router(bot)
+    logger.info("Registering admin jobs handlers")
+
+    @bot.message_handler(commands=["jobs"])
+    def jobs_command(message: Message, data: dict):
+        user = data["user"]
+        if user.role != "admin":
+            bot.send_message(message.from_user.id, strings.no_rights[user.lang])
+            return
+        bot.send_message(message.from_user.id, format_jobs(user.lang))
+
+    @router.handler("admin", "jobs")
+    def jobs_callback(call, data):
+        user = data["user"]
+        if user.role != "admin":
+            bot.send_message(call.from_user.id, strings.no_rights[user.lang])
+            return
+        bot.send_message(call.from_user.id, format_jobs(user.lang))
@@ -4,35 +4,32 @@ import os
 from datetime import datetime
 
 import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
-from omegaconf import OmegaConf
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 
+from content_assistant_bot.api.router import callback_data
+from content_assistant_bot.core.config import settings
 from content_assistant_bot.db import crud
 
-config = OmegaConf.load("./src/content_assistant_bot/conf/config.yaml")
-strings = OmegaConf.load("./src/content_assistant_bot/conf/common.yaml")
+config = settings.view("config")
+strings = settings.view("common")
 
 # Define Paris timezone
 timezone = pytz.timezone(config.timezone)
 
-# Initialize the scheduler
-scheduler = BackgroundScheduler()
-
-# Dictionary to store user data during message scheduling
-user_data = {}
-
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 def create_admin_menu_markup(strings, lang) -> InlineKeyboardMarkup:
     menu_markup = InlineKeyboardMarkup(row_width=1)
     menu_markup.add(
-        InlineKeyboardButton(strings.admin_menu.send_message[lang], callback_data="_public_message"),
-        InlineKeyboardButton(strings.admin_menu.add_admin[lang], callback_data="_add_admin"),
-        InlineKeyboardButton(strings.admin_menu.export_data[lang], callback_data="_export_data"),
-        InlineKeyboardButton(strings.admin_menu.about[lang], callback_data="_about"),
+        InlineKeyboardButton(
+            strings.admin_menu.send_message[lang], callback_data=callback_data("admin", "public_message")
+        ),
+        InlineKeyboardButton(strings.admin_menu.add_admin[lang], callback_data=callback_data("admin", "add_admin")),
+        InlineKeyboardButton(strings.admin_menu.export_data[lang], callback_data=callback_data("admin", "export_data")),
+        InlineKeyboardButton(strings.admin_menu.about[lang], callback_data=callback_data("admin", "about")),
+        InlineKeyboardButton(strings.admin_menu.jobs[lang], callback_data=callback_data("admin", "jobs")),
+        InlineKeyboardButton(strings.admin_menu.usage[lang], callback_data=callback_data("admin", "usage")),
     )
     return menu_markup
 
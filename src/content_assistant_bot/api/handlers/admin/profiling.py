@@ -0,0 +1,119 @@
+"""Admin commands profiling the CPU and memory of the running process, without a redeploy."""
+import io
+import logging
+from datetime import datetime
+from typing import Callable, Optional, Union
+
+from telebot.types import InputFile, Message
+
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.metrics import REGISTRY, GaugeCallback
+from content_assistant_bot.core.profiling import MemoryProfiler, SamplingProfiler
+from content_assistant_bot.core.scheduler import get_scheduler
+
+config = settings.view("config")
+strings = settings.view("common")
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects longer messages
+MAX_MESSAGE_LENGTH = 4096
+
+profiler: Optional[SamplingProfiler] = None
+memory = MemoryProfiler(frames=config.profiling.tracemalloc_frames)
+
+
+def parse_profile_args(text: str) -> Union[str, float, None]:
+    """"stop", the seconds to profile for, or None if the arguments are invalid."""
+    args = text.split()[1:]
+    if not args:
+        return float(config.profiling.default_seconds)
+    if args[0] == "stop":
+        return "stop"
+    try:
+        seconds = float(args[0])
+    except ValueError:
+        return None
+    return min(seconds, config.profiling.max_seconds) if seconds > 0 else None
+
+
+def start_profile(seconds: float, on_done: Callable[[SamplingProfiler], None]) -> bool:
+    """Start sampling the process, False if a profile is already running."""
+    global profiler
+    if profiler is not None and profiler.running:
+        return False
+    profiler = SamplingProfiler(interval=config.profiling.sample_interval_ms / 1000)
+    profiler.start(seconds, on_done)
+    logger.info("CPU profile started for %.0f s", seconds)
+    return True
+
+
+def stop_profile() -> bool:
+    if profiler is None or not profiler.running:
+        return False
+    profiler.stop()
+    return True
+
+
+def profile_report(finished: SamplingProfiler) -> tuple[str, InputFile]:
+    """Top functions as text, and the collapsed stacks as a file for a flame graph."""
+    text = f"```\n{finished.format_top(config.profiling.top)[:MAX_MESSAGE_LENGTH - 8]}\n```"
+    filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.folded.txt"
+    return text, InputFile(io.BytesIO(finished.folded().encode()), file_name=filename)
+
+
+def format_memory(lang: str, action: Optional[str] = None) -> str:
+    """Run `/memory [start|stop]`: without an action, the growth since the previous snapshot."""
+    if action == "start":
+        memory.start()
+        return strings.memory_started[lang]
+    if action == "stop":
+        memory.stop()
+        return strings.memory_stopped[lang]
+    if not memory.tracing:
+        return strings.memory_not_started[lang]
+
+    lines = [memory.diff(config.profiling.top), "", "Containers:"]
+    # Sizes of the process's state storage, rate limit buckets and queues
+    for metric in REGISTRY.metrics():
+        if isinstance(metric, GaugeCallback):
+            lines += [line for line in metric.collect() if not line.startswith("#")]
+    lines.append(f"scheduler_jobs {len(get_scheduler().get_jobs())}")
+    return "```\n" + "\n".join(lines)[:MAX_MESSAGE_LENGTH - 8] + "\n```"
+
+
+def register_handlers(bot):
+    logger.info("Registering admin profiling handlers")
+
+    def send_profile(chat_id: int, lang: str, finished: SamplingProfiler) -> None:
+        text, document = profile_report(finished)
+        bot.send_message(chat_id, text, parse_mode="Markdown")
+        bot.send_document(chat_id, document, caption=strings.profile_caption[lang])
+
+    @bot.message_handler(commands=["profile"])
+    def profile_command(message: Message, data: dict):
+        user = data["user"]
+        if user.role != "admin":
+            bot.send_message(message.from_user.id, strings.no_rights[user.lang])
+            return
+
+        seconds = parse_profile_args(message.text)
+        if seconds is None:
+            bot.send_message(message.from_user.id, strings.profile_usage[user.lang])
+        elif seconds == "stop":
+            if not stop_profile():
+                bot.send_message(message.from_user.id, strings.profile_not_running[user.lang])
+        elif start_profile(seconds, lambda finished, lang=user.lang: send_profile(message.chat.id, lang, finished)):
+            bot.send_message(message.from_user.id, strings.profile_started[user.lang].format(seconds=f"{seconds:g}"))
+        else:
+            bot.send_message(message.from_user.id, strings.profile_running[user.lang])
+
+    @bot.message_handler(commands=["memory"])
+    def memory_command(message: Message, data: dict):
+        user = data["user"]
+        if user.role != "admin":
+            bot.send_message(message.from_user.id, strings.no_rights[user.lang])
+            return
+        args = message.text.split()[1:]
+        text = format_memory(user.lang, args[0] if args else None)
+        bot.send_message(message.from_user.id, text, parse_mode="Markdown" if text.startswith("```") else None)
@@ -4,99 +4,108 @@ import os
 from datetime import datetime
 
 import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
-from omegaconf import OmegaConf
+from telebot.states import State, StatesGroup
+from telebot.states.sync.context import StateContext
 
+from content_assistant_bot.api.broadcast import broadcast_job
 from content_assistant_bot.api.handlers.common import create_cancel_button
+from content_assistant_bot.api.router import get_router
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.scheduler import get_scheduler
 from content_assistant_bot.db import crud
 
-config = OmegaConf.load("./src/content_assistant_bot/conf/config.yaml")
-strings = OmegaConf.load("./src/content_assistant_bot/conf/common.yaml")
+config = settings.view("config")
+strings = settings.view("common")
 
 # Define Paris timezone
 timezone = pytz.timezone(config.timezone)
 
-# Initialize the scheduler
-scheduler = BackgroundScheduler()
 
-# Dictionary to store user data during message scheduling
-user_data = {}
+class PublicMessageStates(StatesGroup):
+    waiting_for_datetime = State()
+    waiting_for_content = State()
+
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-# Function to send a scheduled message
-def send_scheduled_message(bot, user_id, media_type, message_text: str = None, message_photo: str = None):
-    if media_type == 'text':
-        bot.send_message(chat_id=user_id, text=message_text)
-    elif media_type == 'photo':
-        # Fetch the photo by file ID
-        if message_text:
-            bot.send_photo(chat_id=user_id, caption=message_text, photo=message_photo, disable_notification=False)
-        else:
-            bot.send_photo(chat_id=user_id, photo=message_photo, disable_notification=False)
+def schedule_broadcast(broadcast_id: int, run_date: datetime):
+    """Schedule a single job that delivers the whole broadcast campaign."""
+    get_scheduler().add_job(
+        broadcast_job, 'date',
+        run_date=run_date,
+        args=[broadcast_id],
+        id=f"broadcast_{broadcast_id}",
+        replace_existing=True,
+    )
+
+
+def resume_broadcasts():
+    """Reschedule broadcasts that were not finished before the last shutdown."""
+    now = datetime.now(pytz.utc)
+    for broadcast in crud.get_unfinished_broadcasts():
+        run_date = max(pytz.utc.localize(broadcast.scheduled_at), now)
+        schedule_broadcast(broadcast.id, run_date)
+        logger.info("Broadcast %s (%s) rescheduled for %s", broadcast.id, broadcast.status, run_date)
 
 
 # React to any text if not command
 def register_handlers(bot):
+    router = get_router(bot)
     logger.info("Registering public message handlers")
-    @bot.callback_query_handler(func=lambda call: call.data == "_public_message")
-    def query_handler(call, data):
-        user = data["user"]
-
+    @router.handler("admin", "public_message")
+    def query_handler(call, state: StateContext, user):
         if user.role != "admin":
             # Inform that the user does not have admin rights
             bot.send_message(user.id, strings.no_rights[user.lang])
             return
 
         # Ask user to provide the date and time
-        sent_message = bot.send_message(
+        state.set(PublicMessageStates.waiting_for_datetime)
+        bot.send_message(
             user.id, strings.enter_datetime_prompt[user.lang].format(timezone=config.timezone),
             reply_markup=create_cancel_button(strings, user.lang)
         )
-        # Move to the next step: receiving the datetime input
-        bot.register_next_step_handler(sent_message, get_datetime_input, bot, user)
 
     # Handler to capture the datetime input from the user
-    def get_datetime_input(message, bot, user):
+    @bot.message_handler(state=PublicMessageStates.waiting_for_datetime)
+    def get_datetime_input(message, state: StateContext, user):
         user_input = message.text
         try:
             # Parse the user's input into a datetime object
             user_datetime_obj = datetime.strptime(user_input, '%Y-%m-%d %H:%M')
-            user_datetime_localized = timezone.localize(user_datetime_obj)
-
-            # Check that date is not at the past
-            if user_datetime_localized < datetime.now(timezone):
-                bot.send_message(user.id, strings.past_datetime_error[user.lang])
-
-                # Prompt the user again
-                sent_message = bot.send_message(
-                    user.id, strings.enter_datetime_prompt[user.lang].format(timezone=config.timezone),
-                    reply_markup=create_cancel_button(strings, user.lang)
-                )
-                bot.register_next_step_handler(sent_message, get_datetime_input, bot, user)
-                return
-
-            # Store the datetime and move to the next step (waiting for the message content)
-            user_data[user.id] = {'datetime': user_datetime_localized}
-            sent_message = bot.send_message(user.id, strings.record_message_prompt[user.lang], reply_markup=create_cancel_button(strings, user.lang))
-
-            # Move to the next step: receiving the custom message
-            bot.register_next_step_handler(sent_message, get_message_content, bot, user)
-
-        except ValueError:
-            # Handle invalid date format
-            sent_message = bot.send_message(user.id, strings.invalid_datetime_format[user.lang])
+        except (TypeError, ValueError):
+            # Handle invalid date format and prompt the user again
+            bot.send_message(user.id, strings.invalid_datetime_format[user.lang])
+            bot.send_message(
+                user.id, strings.enter_datetime_prompt[user.lang].format(timezone=config.timezone),
+                reply_markup=create_cancel_button(strings, user.lang)
+            )
+            return
+
+        user_datetime_localized = timezone.localize(user_datetime_obj)
+
+        # Check that date is not at the past
+        if user_datetime_localized < datetime.now(timezone):
+            bot.send_message(user.id, strings.past_datetime_error[user.lang])
+
             # Prompt the user again
-            sent_message = bot.send_message(
+            bot.send_message(
                 user.id, strings.enter_datetime_prompt[user.lang].format(timezone=config.timezone),
                 reply_markup=create_cancel_button(strings, user.lang)
             )
-            bot.register_next_step_handler(sent_message, get_datetime_input, bot, user)
+            return
+
+        # Store the datetime and move to the next step (waiting for the message content)
+        state.add_data(datetime=user_datetime_localized)
+        state.set(PublicMessageStates.waiting_for_content)
+        bot.send_message(
+            user.id, strings.record_message_prompt[user.lang], reply_markup=create_cancel_button(strings, user.lang)
+        )
 
     # Handler to capture the custom message from the user
-    def get_message_content(message, bot, user):
+    @bot.message_handler(state=PublicMessageStates.waiting_for_content, content_types=['text', 'photo'])
+    def get_message_content(message, state: StateContext, user):
         user_message = None
         photo_file = None
         if message.text:
@@ -109,29 +118,27 @@ def register_handlers(bot):
             media_type = 'photo'
 
         # Retrieve the previously stored datetime
-        scheduled_datetime = user_data[user.id]['datetime']
-
-        # Schedule the message for the specified datetime
-        target_users = crud.get_users()
-        for target_user in target_users:
-            scheduler.add_job(
-                send_scheduled_message, 'date',
-                run_date=scheduled_datetime, 
-                args=[bot, target_user.id, media_type, user_message, photo_file]
-            )
-
+        with state.data() as data:
+            scheduled_datetime = data['datetime']
+
+        # Clear the state to avoid confusion
+        state.delete()
+
+        # Schedule one job for the whole campaign, recipients are resolved at send time
+        broadcast = crud.create_broadcast(
+            author_id=user.id,
+            author_lang=user.lang,
+            media_type=media_type,
+            text=user_message,
+            photo=photo_file,
+            scheduled_at=scheduled_datetime.astimezone(pytz.utc).replace(tzinfo=None),
+        )
+        schedule_broadcast(broadcast.id, scheduled_datetime)
 
         # Inform the user that the message has been scheduled
         response = strings.message_scheduled_confirmation[user.lang].format(
-            n_users = len(target_users),
+            n_users = crud.count_users(),
             send_datetime = scheduled_datetime.strftime('%Y-%m-%d %H:%M'),
             timezone = config.timezone
         )
         bot.send_message(user.id, response)
-
-        # Clear the user data to avoid confusion
-        del user_data[user.id]
-
-
-# Start the scheduler
-scheduler.start()
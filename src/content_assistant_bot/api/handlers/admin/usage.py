@@ -0,0 +1,73 @@
+"""Handler to inspect how much of their budgets users have spent."""
+import logging
+from typing import Optional
+
+from telebot.types import Message
+
+from content_assistant_bot.api.quota import quotas
+from content_assistant_bot.api.router import get_router
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.db import crud
+
+strings = settings.view("common")
+
+logger = logging.getLogger(__name__)
+
+TOP_USERS = 10
+
+
+def format_usage(lang: str, username: Optional[str] = None) -> str:
+    """Top spenders of each budget today, or every budget of one user."""
+    if quotas is None:
+        return strings.usage_disabled[lang]
+    if username:
+        user = crud.get_user(username.lstrip("@"))
+        if user is None:
+            return strings.usage_unknown_user[lang].format(name=username)
+        lines = [f"{user.name} ({user.id}, {user.role})"]
+        for resource, budget in quotas.budgets.items():
+            used = quotas.usage(user.id, resource)
+            lines.append(strings.usage_user[lang].format(
+                resource=resource,
+                daily=used["daily"],
+                daily_limit=budget.daily,
+                rolling=used["rolling"],
+                rolling_limit=budget.rolling,
+                hours=f"{budget.rolling_window.total_seconds() / 3600:g}",
+            ))
+        return "\n".join(lines)
+
+    lines = [strings.usage_title[lang].format(n=TOP_USERS)]
+    for resource, budget in quotas.budgets.items():
+        lines.append("")
+        lines.append(strings.usage_budget[lang].format(
+            resource=resource,
+            daily=budget.daily,
+            rolling=budget.rolling,
+            hours=f"{budget.rolling_window.total_seconds() / 3600:g}",
+        ))
+        for user_id, name, amount in quotas.top_users(resource, TOP_USERS):
+            lines.append(f"{name or user_id}: {amount}")
+    return "\n".join(lines)
+
+
+def register_handlers(bot):
+    router = get_router(bot)
+    logger.info("Registering admin usage handlers")
+
+    @bot.message_handler(commands=["usage"])
+    def usage_command(message: Message, data: dict):
+        user = data["user"]
+        if user.role != "admin":
+            bot.send_message(message.from_user.id, strings.no_rights[user.lang])
+            return
+        args = message.text.split(maxsplit=1)
+        bot.send_message(message.from_user.id, format_usage(user.lang, args[1] if len(args) > 1 else None))
+
+    @router.handler("admin", "usage")
+    def usage_callback(call, data):
+        user = data["user"]
+        if user.role != "admin":
+            bot.send_message(call.from_user.id, strings.no_rights[user.lang])
+            return
+        bot.send_message(call.from_user.id, format_usage(user.lang))
@@ -3,20 +3,23 @@ import os
 import re
 from datetime import datetime, timedelta
 
-import pandas as pd
-from omegaconf import OmegaConf
 from telebot.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from telebot.states.sync.context import StateContext
 
+from content_assistant_bot.api.background import task_queue
+from content_assistant_bot.api.router import MAX_CALLBACK_DATA_BYTES, callback_data, get_router
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.tracing import span
 from content_assistant_bot.core.utils import format_excel_file
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # load config from config.common.yaml
-config = OmegaConf.load("./src/content_assistant_bot/conf/config.yaml")
-strings = OmegaConf.load("./src/content_assistant_bot/conf/common.yaml")
+config = settings.view("config")
+strings = settings.view("common")
+
+# Report names travel in the download button's callback data: `files:get:<timestamp>_<name>_ig.xlsx`
+MAX_REPORT_NAME_BYTES = MAX_CALLBACK_DATA_BYTES - len(callback_data("files", "get", "YYYY-mm-dd_HH-MM__ig.xlsx"))
 
 
 def is_command(message):
@@ -43,15 +46,21 @@ def create_resource(user_id: int, name: str, data_list: list[dict]) -> str:
 
     # Sanitize name for filename
     sanitized_name = re.sub(r'[\/:*?"<>| ]', '_', name)[:15]
+    # Cut by bytes as well, 15 Cyrillic letters would not fit in the callback data
+    sanitized_name = sanitized_name.encode()[:MAX_REPORT_NAME_BYTES].decode(errors="ignore")
 
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
     filename = f"{timestamp}_{sanitized_name}_ig.xlsx"
     filepath = os.path.join(user_dir, filename)
 
+    # pandas takes longer to import than the rest of the bot, only exports need it
+    import pandas as pd
+
     # Create and save Excel file
-    df = pd.DataFrame(data_list)
-    df.to_excel(filepath, index=False)
-    format_excel_file(filepath)
+    with span("excel.write", rows=len(data_list)):
+        df = pd.DataFrame(data_list)
+        df.to_excel(filepath, index=False)
+        format_excel_file(filepath)
 
     return filename
 
@@ -65,13 +74,13 @@ def cleanup_files(user_dir: str, retention_period: int = 2):
             file_creation_time = datetime.fromtimestamp(os.path.getctime(file_path))
             if now - file_creation_time > timedelta(days=retention_period):
                 os.remove(file_path)
-                logger.info(f"Deleted old file: {file_path}")
+                logger.info("Deleted old file: %s", file_path)
 
 
 def create_cancel_button(strings, lang):
     cancel_button = InlineKeyboardMarkup(row_width=1)
     cancel_button.add(
-        InlineKeyboardButton(strings.cancel[lang], callback_data="CANCEL"),
+        InlineKeyboardButton(strings.cancel[lang], callback_data=callback_data("common", "cancel")),
     )
     return cancel_button
 
@@ -93,23 +102,24 @@ def create_keyboard_markup(
 
 
 def register_handlers(bot):
+    router = get_router(bot)
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith("GET"))
-    def get_resource(call: CallbackQuery, data):
+    @router.handler("files", "get")
+    def get_resource(call: CallbackQuery, user, args: list[str]):
         """Download resource from user's folder"""
-        user = data["user"]
-        filename = call.data.split(" ")[1]
+        # The file name may contain the separator, the arguments are joined back
+        filename = ":".join(args)
         file_path = os.path.join("./tmp", str(user.id), filename)
-        logger.info(f"Requesting file: {file_path}")
+        logger.info("Requesting file: %s", file_path)
         if os.path.exists(file_path):
             with open(file_path, 'rb') as file:
                 bot.send_document(user.id, file, visible_file_name=filename)
         else:
             bot.answer_callback_query(call.id, strings.file_not_found[user.lang])
 
-    @bot.callback_query_handler(func=lambda call: call.data == "CANCEL")
+    @router.handler("common", "cancel")
     def cancel_callback(call: CallbackQuery, state: StateContext):
         """Cancel current operation"""
+        task_queue.cancel_user(call.from_user.id)
         bot.send_message(call.message.chat.id, strings.cancelled["ru"])
-        bot.clear_step_handler_by_chat_id(chat_id=call.message.chat.id)
         state.delete()
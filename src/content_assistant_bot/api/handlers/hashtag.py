@@ -1,38 +1,28 @@
 import logging
-import os
 
-from dotenv import find_dotenv, load_dotenv
-from omegaconf import OmegaConf
 from telebot.states import State, StatesGroup
 from telebot.states.sync.context import StateContext
 from telebot.types import CallbackQuery, InputMediaVideo, Message
 
+from content_assistant_bot.api.background import TaskProgress, run_in_background
 from content_assistant_bot.api.handlers.common import (
     create_cancel_button,
     create_keyboard_markup,
     create_resource,
     sanitize_instagram_input,
 )
+from content_assistant_bot.api.router import callback_data, get_router
 from content_assistant_bot.core import instagram
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.tasks import Task
 from content_assistant_bot.db.crud import get_user
 
 # Logging Configuration
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
 # Load Configurations
-strings = OmegaConf.load("./src/content_assistant_bot/conf/common.yaml")
-config = OmegaConf.load("./src/content_assistant_bot/conf/analyze_hashtag.yaml")
-
-# Instagram Credentials
-load_dotenv(find_dotenv(usecwd=True))
-INSTAGRAM_USERNAME = os.getenv("INSTAGRAM_USERNAME")
-INSTAGRAM_PASSWORD = os.getenv("INSTAGRAM_PASSWORD")
-
-if not INSTAGRAM_USERNAME or not INSTAGRAM_PASSWORD:
-    raise ValueError("Instagram credentials not found in environment variables")
-
-instagram_client = instagram.InstagramWrapper(INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD)
+strings = settings.view("common")
+config = settings.view("analyze_hashtag")
 
 
 # Define States
@@ -54,10 +44,10 @@ def format_hashtag_reel_response(idx: int, reel: dict[str, str], template: str)
 
 # Handlers
 def register_handlers(bot):
+    router = get_router(bot)
+
     # Start command handler
-    @bot.callback_query_handler(
-        func=lambda call: "_analyze_hashtag" in call.data
-    )
+    @router.handler("hashtag", "start")
     def analyze_hashtag(call: CallbackQuery, state: StateContext):
         user = get_user(username=call.from_user.username)
         state.set(AnalyzeHashtagStates.waiting_for_hashtag)
@@ -90,7 +80,7 @@ def register_handlers(bot):
 
         keyboard = create_keyboard_markup(
             ["5", "10", "30"],
-            ["5", "10", "30"],
+            [callback_data("hashtag", "count", n) for n in (5, 10, 30)],
             "horizontal",
         )
         state.set(AnalyzeHashtagStates.waiting_for_number_of_videos)
@@ -101,38 +91,57 @@ def register_handlers(bot):
         )
 
     # Handler for number of videos selection
-    @bot.callback_query_handler(
-        func=lambda call: call.data in ["5", "10", "30"],
-        state=AnalyzeHashtagStates.waiting_for_number_of_videos,
-    )
-    def get_number_of_videos(call: CallbackQuery, state: StateContext):
-        user = get_user(username=call.from_user.username)
-        number_of_videos = int(call.data)
+    @router.handler("hashtag", "count", state=AnalyzeHashtagStates.waiting_for_number_of_videos)
+    def get_number_of_videos(call: CallbackQuery, state: StateContext, user, args: list[str]):
+        number_of_videos = int(args[0])
 
         # Retrieve user input from state data
         with state.data() as data:
             input_text = data["user_input"]
 
-        bot.send_message(
+        # Instagram requests take a while: run them on the task queue, not on the update thread
+        run_in_background(
+            bot,
             call.message.chat.id,
+            user.id,
+            user.lang,
             config.strings.received[user.lang],
+            analyze_hashtag_task,
+            call.message.chat.id,
+            user,
+            input_text,
+            number_of_videos,
+            state,
+            # Each analysed video is an Instagram request
+            limit_scope="instagram",
+            limit_cost=number_of_videos,
+            role=user.role,
         )
 
-        response = instagram_client.fetch_hashtag_reels(
+    def analyze_hashtag_task(
+        task: Task,
+        progress: TaskProgress,
+        chat_id: int,
+        user,
+        input_text: str,
+        number_of_videos: int,
+        state: StateContext,
+    ):
+        response = instagram.get_instagram_client().fetch_hashtag_reels(
             input_text, estimate_view_count=False
         )
+        task.check_cancelled()
         if response["status"] != 200:
             error_message = (
                 strings.error[user.lang]
                 if response["status"] != 404
-                else strings.no_found[user.lang]
+                else config.strings.no_found[user.lang]
             )
-            bot.send_message(call.message.chat.id, error_message)
+            progress.update(error_message)
             state.delete()
             return
 
-        bot.send_message(
-            call.message.chat.id,
+        progress.update(
             config.strings.result_ready[user.lang].format(
                 n=number_of_videos, hashtag=input_text
             ),
@@ -170,18 +179,18 @@ def register_handlers(bot):
         ]
 
         # Generate unique filename and directory
-        filename = create_resource(user.id, data["user_input"], data_list)
+        filename = create_resource(user.id, input_text, data_list)
 
         # Send response and download button
-        footer = config.strings.final_message["ru"].format(bot_name=bot.get_me().username)
+        footer = config.strings.final_message["ru"].format(bot_name=bot.user.username)
         response_message = '\n'.join(reel_response_items) + "\n" + footer
 
         download_button = create_keyboard_markup(
             [config.strings.download_report["ru"]],
-            [f"GET {filename}"],
+            [callback_data("files", "get", filename)],
         )
         bot.send_message(
-            call.message.chat.id,
+            chat_id,
             response_message,
             parse_mode="HTML",
             reply_markup=download_button
@@ -195,7 +204,7 @@ def register_handlers(bot):
             )
         if media_elements:
             bot.send_media_group(
-                call.message.chat.id,
+                chat_id,
                 media_elements
             )
 
@@ -206,7 +215,7 @@ def register_handlers(bot):
         )
 
         # Send initial set of videos
-        send_next_videos(call.message.chat.id, state, user)
+        send_next_videos(chat_id, state, user)
 
     # Function to send next 3 videos
     def send_next_videos(chat_id: int, state: StateContext, user):
@@ -227,7 +236,7 @@ def register_handlers(bot):
             # Show 'Show next 3 videos' button
             keyboard = create_keyboard_markup(
                 [config.strings.show_next_videos[user.lang]],
-                ["SHOW_NEXT_VIDEOS"],
+                [callback_data("hashtag", "next")],
             )
             bot.send_message(chat_id, config.strings.next_videos[user.lang], reply_markup=keyboard)
 
@@ -254,10 +263,7 @@ def register_handlers(bot):
             state.delete()
 
     # Handler for 'Show next 3 videos' button
-    @bot.callback_query_handler(
-        func=lambda call: call.data == "SHOW_NEXT_VIDEOS",
-        state=AnalyzeHashtagStates.waiting_for_number_of_videos,
-    )
+    @router.handler("hashtag", "next", state=AnalyzeHashtagStates.waiting_for_number_of_videos)
     def show_next_videos(call: CallbackQuery, state: StateContext):
         user = get_user(username=call.from_user.username)
         send_next_videos(call.message.chat.id, state, user)
@@ -1,23 +1,91 @@
 import logging
+import threading
+from typing import Optional
 
-from hydra.utils import instantiate
-from omegaconf import OmegaConf
-from PIL import Image
+from telebot import TeleBot
 from telebot import types
 from telebot.states import State, StatesGroup
 from telebot.states.sync.context import StateContext
 
+from content_assistant_bot.api.background import TaskProgress, run_in_background
 from content_assistant_bot.api.handlers.common import create_cancel_button, create_keyboard_markup
+from content_assistant_bot.api.quota import charge_usage
+from content_assistant_bot.api.router import callback_data, get_router
 from content_assistant_bot.api.schemas import Message
+from content_assistant_bot.api.streaming import StreamingMessage
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.files import EncodedImage, encode_image, image_cache, select_photo_size
+from content_assistant_bot.core.history import HistoryCompactor
 from content_assistant_bot.core.llm import LLM
+from content_assistant_bot.core.llm_cache import LLMCache, make_cache_key, normalize_query
+from content_assistant_bot.core.log import preview
+from content_assistant_bot.core.routing import create_router
+from content_assistant_bot.core.tasks import Task, TaskCancelled
+from content_assistant_bot.core.tokens import get_token_counter
 from content_assistant_bot.db import crud
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # load config from config.common.yaml
-config = OmegaConf.load("./src/content_assistant_bot/conf/ideas.yaml")
+config = settings.view("ideas")
+strings = settings.view("common")
+
+# Ideas for the same niche are served from the database instead of a new completion
+llm_cache = LLMCache(
+    ttl_seconds=config.cache.ttl_hours * 3600,
+    max_entries=config.cache.max_entries,
+    max_variants=config.cache.max_variants,
+)
+
+_llm: Optional[LLM] = None
+_llm_source: Optional[tuple] = None
+_llm_lock = threading.Lock()
+
+
+def get_llm() -> LLM:
+    """Return the shared ideas LLM, built again only when the `llm` or `routing` section of ideas.yaml changes."""
+    global _llm, _llm_source
+    raw = settings.raw("ideas")
+    # A change to any file reloads every snapshot, so the sections are compared by value: editing
+    # another file keeps the router with its latency statistics and open circuit breakers
+    source = (raw["llm"], raw.get("routing"))
+    with _llm_lock:
+        if _llm is None or source != _llm_source:
+            # hydra is only needed here, importing it at startup costs a few hundred milliseconds
+            from hydra.utils import instantiate
+
+            model_config = instantiate(raw["llm"])
+            # The previous router is not closed: requests still running in it may hedge or fail over,
+            # its executor shuts down once they finish and it is collected
+            _llm = LLM(model_config, router=create_router(model_config, settings.get("ideas").get("routing")))
+            _llm_source = source
+            logger.info("Loaded ideas model config: %s/%s", _llm.config.provider, _llm.config.model_name)
+        return _llm
+
+def get_history_compactor(llm: LLM) -> HistoryCompactor:
+    """Token budget of the ideas conversation, counted with the tokenizer of the configured model."""
+    return HistoryCompactor(
+        max_tokens=config.history.max_tokens,
+        digest_tokens=config.history.digest_tokens,
+        count=get_token_counter(llm.config.provider, llm.config.model_name),
+        digest_prefix=config.history.digest_prefix,
+    )
+
+def count_completion_tokens(llm: LLM, chat_history: list[Message], response_content: str) -> int:
+    """Tokens of a completion's prompt and response, charged to the user's LLM budget."""
+    count = get_token_counter(llm.config.provider, llm.config.model_name)
+    return sum(count(message.content) for message in chat_history) + count(response_content)
+
+def get_photo(bot: TeleBot, file_id: str) -> EncodedImage:
+    """Download a Telegram photo and encode it for the model, once per file_id and settings."""
+    key = (file_id, config.images.max_side, config.images.format, config.images.quality)
+    image = image_cache.get(key)
+    if image is None:
+        data = bot.download_file(bot.get_file(file_id).file_path)
+        image = encode_image(data, config.images.max_side, config.images.format, config.images.quality)
+        image_cache.put(key, image)
+        logger.info("Encoded photo %s: %s -> %s bytes, %s", file_id, len(data), len(image.data), image.size)
+    return image
 
 # Define States
 class IdeasStates(StatesGroup):
@@ -26,15 +94,16 @@ class IdeasStates(StatesGroup):
 
 # Handlers
 def register_handlers(bot):
+    router = get_router(bot)
 
-    @bot.callback_query_handler(func=lambda call: "_generate_ideas" in call.data)
+    @router.handler("ideas", "start")
     def generate_ideas(call: types.CallbackQuery, state: StateContext):
         user = crud.get_user(username=call.from_user.username)
         state.set(IdeasStates.waiting_for_query)
         bot.send_message(
             call.from_user.id,
             config.strings.enter_query[user.lang],
-            reply_markup=create_cancel_button(config.strings, user.lang)
+            reply_markup=create_cancel_button(strings, user.lang)
         )
 
     @bot.message_handler(
@@ -46,11 +115,11 @@ def register_handlers(bot):
         bot.send_message(
             call.from_user.id,
             config.strings.enter_query[user.lang],
-            reply_markup=create_keyboard_markup(["Меню"], ["_menu"])
+            reply_markup=create_keyboard_markup(["Меню"], [callback_data("menu", "open")])
         )
 
     @bot.message_handler(state=IdeasStates.waiting_for_query, content_types=['text'])
-    def get_user_query(message: types.Message, state: StateContext):
+    def get_user_query(message: types.Message, state: StateContext, user):
         user_id = message.chat.id
         user_message = message.text
 
@@ -66,25 +135,87 @@ def register_handlers(bot):
         # Send LLM response
         more_ideas_button = create_keyboard_markup(
             [config.strings.more_ideas.ru, config.strings.main_menu.ru],
-            ["_generate_more_ideas", "_menu"]
+            [callback_data("ideas", "more"), callback_data("menu", "open")]
+        )
+
+        # The completion takes tens of seconds: generate it on the task queue
+        run_in_background(
+            bot,
+            user_id,
+            message.from_user.id,
+            "ru",
+            config.strings.received.ru,
+            generate_ideas_task,
+            user_id,
+            chat_history,
+            state,
+            more_ideas_button,
+            limit_scope="llm",
+            role=user.role,
+        )
+
+    @bot.message_handler(state=IdeasStates.waiting_for_query, content_types=['photo'])
+    def get_user_photo(message: types.Message, state: StateContext, user):
+        user_id = message.chat.id
+        # Telegram keeps several sizes of a photo, the smallest one that is large enough is downloaded
+        photo = select_photo_size(message.photo, config.images.max_side)
+        chat_history = [
+            Message(
+                content=(message.caption or config.strings.photo_query.ru)[:30000],
+                role="user"
+            )
+        ]
+        more_ideas_button = create_keyboard_markup(
+            [config.strings.more_ideas.ru, config.strings.main_menu.ru],
+            [callback_data("ideas", "more"), callback_data("menu", "open")]
+        )
+        run_in_background(
+            bot,
+            user_id,
+            message.from_user.id,
+            "ru",
+            config.strings.received.ru,
+            generate_ideas_task,
+            user_id,
+            chat_history,
+            state,
+            more_ideas_button,
+            photo.file_id,
+            limit_scope="llm",
+            role=user.role,
         )
 
+    def generate_ideas_task(
+        task: Task,
+        progress: TaskProgress,
+        user_id: int,
+        chat_history: list[Message],
+        state: StateContext,
+        reply_markup: types.InlineKeyboardMarkup,
+        image_file_id: Optional[str] = None,
+    ):
+        seen_variants = []
+        # Ideas for a photo are not looked up in the cache, their query is the image
+        image = get_photo(bot, image_file_id) if image_file_id else None
         chat_history = send_llm_response(
-            bot, user_id, chat_history, state, reply_markup=more_ideas_button
+            bot, user_id, chat_history, state, image=image, reply_markup=reply_markup, task=task, progress=progress,
+            cache_query=chat_history[0].content if image is None else None, seen_variants=seen_variants,
         )
 
         # Store chat_history in state
-        state.add_data(chat_history=chat_history)
+        state.add_data(chat_history=chat_history, seen_variants=seen_variants, image_file_id=image_file_id)
 
         state.set(IdeasStates.waiting_for_more_ideas)
 
-    @bot.callback_query_handler(func=lambda call: call.data == "_generate_more_ideas", state=IdeasStates.waiting_for_more_ideas)
-    def generate_more_ideas(call: types.CallbackQuery, state: StateContext):
+    @router.handler("ideas", "more", state=IdeasStates.waiting_for_more_ideas)
+    def generate_more_ideas(call: types.CallbackQuery, state: StateContext, user):
         user_id = call.from_user.id
 
         # Retrieve chat_history from state
         with state.data() as data:
             chat_history = data.get('chat_history', [])
+            seen_variants = data.get('seen_variants', [])
+            image_file_id = data.get('image_file_id')
 
         # Add the request for more ideas to the chat history
         chat_history.append(
@@ -97,40 +228,115 @@ def register_handlers(bot):
         # Send LLM response
         more_ideas_button = create_keyboard_markup(
             [config.strings.more_ideas.ru, config.strings.main_menu.ru],
-            ["_generate_more_ideas", "_menu"]
+            [callback_data("ideas", "more"), callback_data("menu", "open")]
+        )
+
+        run_in_background(
+            bot,
+            call.message.chat.id,
+            user_id,
+            "ru",
+            config.strings.received.ru,
+            generate_more_ideas_task,
+            call.message.chat.id,
+            chat_history,
+            seen_variants,
+            state,
+            more_ideas_button,
+            image_file_id,
+            limit_scope="llm",
+            role=user.role,
         )
 
+    def generate_more_ideas_task(
+        task: Task,
+        progress: TaskProgress,
+        chat_id: int,
+        chat_history: list[Message],
+        seen_variants: list[int],
+        state: StateContext,
+        reply_markup: types.InlineKeyboardMarkup,
+        image_file_id: Optional[str] = None,
+    ):
+        # The photo comes from the image cache, it was encoded for the first request
+        image = get_photo(bot, image_file_id) if image_file_id else None
+        # Another cached variant of the first query counts as more ideas too
         chat_history = send_llm_response(
-            bot, user_id, chat_history, state, reply_markup=more_ideas_button
+            bot, chat_id, chat_history, state, image=image, reply_markup=reply_markup, task=task, progress=progress,
+            cache_query=chat_history[0].content if image is None else None, seen_variants=seen_variants,
         )
 
         # Update chat_history in state
-        state.add_data(chat_history=chat_history)
+        state.add_data(chat_history=chat_history, seen_variants=seen_variants)
 
 def send_llm_response(
     bot,
     user_id: int,
     chat_history: list[Message],
     state: StateContext,
-    image: Image = None,
-    reply_markup=None
+    image: Optional[EncodedImage] = None,
+    reply_markup=None,
+    task: Optional[Task] = None,
+    progress: Optional[TaskProgress] = None,
+    cache_query: Optional[str] = None,
+    seen_variants: Optional[list[int]] = None,
 ) -> list[Message]:
 
-    # Load configurations
-    model_config = instantiate(config.llm)
+    # Shared LLM: the model config and provider client are reused across requests
+    llm = get_llm()
 
-    # Initialize the LLM model
-    llm = LLM(model_config)
+    # Serve a cached variant the user has not seen yet
+    cache_key = None
+    if cache_query is not None and config.cache.enabled:
+        cache_key = make_cache_key(cache_query, llm.config, lemmatize=config.cache.lemmatize)
+        cached = llm_cache.get(cache_key, exclude=seen_variants or ())
+        if cached is not None:
+            logger.info("Ideas served from cache (variant %s)", cached.id, extra={"text": preview(cache_query)})
+            if progress is not None:
+                progress.update(cached.response, reply_markup=reply_markup, parse_mode="Markdown")
+            else:
+                bot.send_message(user_id, cached.response, reply_markup=reply_markup, parse_mode="Markdown")
+            if seen_variants is not None:
+                seen_variants.append(cached.id)
+            return chat_history + [Message(role="assistant", content=cached.response)]
 
     # Generate and send the final response
     try:
-        response = llm.run(chat_history, image=image)
-        bot.send_message(
-            user_id, response.response_content,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+        # Every "more ideas" adds a reply: fold the older ones into a digest to keep the prompt bounded
+        chat_history = get_history_compactor(llm).compact(
+            chat_history,
+            lambda messages, max_tokens: llm.summarize(messages, config.history.summary_prompt, max_tokens),
         )
-        response_content = response.response_content
+        if task is not None:
+            task.check_cancelled()
+
+        if llm.config.stream:
+            # Show the ideas as they are generated instead of after the whole completion
+            streaming = StreamingMessage(
+                bot, user_id,
+                message_id=progress.message_id if progress is not None else None,
+                edit_interval=config.streaming.edit_interval_seconds,
+                progress_markup=create_cancel_button(strings, "ru"),
+            )
+            streaming.consume(
+                llm.run(chat_history, image=image),
+                on_chunk=task.check_cancelled if task is not None else None,
+            )
+            response_content = streaming.finish(reply_markup=reply_markup, parse_mode="Markdown")
+        else:
+            response = llm.run(chat_history, image=image)
+            if task is not None:
+                task.check_cancelled()
+            if progress is not None:
+                progress.update(response.response_content, reply_markup=reply_markup, parse_mode="Markdown")
+            else:
+                bot.send_message(
+                    user_id, response.response_content,
+                    reply_markup=reply_markup,
+                    parse_mode="Markdown"
+                )
+            response_content = response.response_content
+        charge_usage(user_id, "llm_tokens", count_completion_tokens(llm, chat_history, response_content))
 
         # Simple check: if response is too short
         if len(response_content) < 2000:
@@ -140,8 +346,19 @@ def send_llm_response(
                 reply_markup=reply_markup
             )
             state.set(IdeasStates.waiting_for_query)
+        else:
+            # The model sees its earlier ideas when asked for more
+            chat_history = chat_history + [Message(role="assistant", content=response_content)]
+            if cache_key is not None:
+                entry = llm_cache.put(
+                    cache_key, normalize_query(cache_query, config.cache.lemmatize), response_content
+                )
+                if entry is not None and seen_variants is not None:
+                    seen_variants.append(entry.id)
+    except TaskCancelled:
+        raise
     except Exception as e:
-        logger.error(f"Error generating LLM response: {e}")
+        logger.error("Error generating LLM response: %s", e)
         bot.send_message(
             user_id, config.strings.error.ru,
             reply_markup=reply_markup
@@ -1,27 +1,29 @@
 from ast import parse
 import logging.config
 
-from omegaconf import OmegaConf
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 
-logging.basicConfig(level=logging.INFO)
+from content_assistant_bot.api.router import callback_data, get_router
+from content_assistant_bot.core.config import settings
+
 logger = logging.getLogger(__name__)
 
-strings = OmegaConf.load("./src/content_assistant_bot/conf/common.yaml")
+strings = settings.view("common")
 
 
 def create_main_menu_markup(options: dict, lang: str = "en"):
     menu_markup = InlineKeyboardMarkup(row_width=1)
     menu_markup.add(
-        InlineKeyboardButton(options.analyze_account[lang], callback_data="_analyze_account"),
-        InlineKeyboardButton(options.hashtag_or_query_analysis[lang], callback_data="_analyze_hashtag"),
-        InlineKeyboardButton(options.video_idea_generation[lang], callback_data="_generate_ideas"),
-        #InlineKeyboardButton(options.subscription[lang], callback_data="_subscription")
+        InlineKeyboardButton(options.analyze_account[lang], callback_data=callback_data("account", "start")),
+        InlineKeyboardButton(options.hashtag_or_query_analysis[lang], callback_data=callback_data("hashtag", "start")),
+        InlineKeyboardButton(options.video_idea_generation[lang], callback_data=callback_data("ideas", "start")),
+        #InlineKeyboardButton(options.subscription[lang], callback_data=callback_data("subscription", "start"))
     )
     return menu_markup
 
 
 def register_handlers(bot):
+    router = get_router(bot)
 
     @bot.message_handler(commands=["start"])
     def start_command(message: Message, data: dict):
@@ -38,9 +40,8 @@ def register_handlers(bot):
             reply_markup=create_main_menu_markup(strings.menu.options, "ru")
         )
 
-    @bot.callback_query_handler(func=lambda call: call.data == "_menu")
+    @router.handler("menu", "open")
     def menu_menu_callback(call):
-        bot.clear_step_handler_by_chat_id(chat_id=call.message.chat.id)
         bot.send_message(
             call.message.chat.id, strings.menu.title["ru"],
             reply_markup=create_main_menu_markup(strings.menu.options, "ru")
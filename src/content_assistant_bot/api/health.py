@@ -0,0 +1,84 @@
+"""Liveness, readiness and metrics endpoints for orchestrators, load balancers and Prometheus."""
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Union
+
+from content_assistant_bot.core.boot import BootSequence
+from content_assistant_bot.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class HealthServer:
+    def __init__(self, boot: BootSequence, host: str = "0.0.0.0", port: int = 8080) -> None:
+        """ HTTP server answering `/healthz` while the process runs, `/readyz` once the bot can answer,
+        and `/metrics` with the process's metrics in the Prometheus text format
+
+        Args:
+            boot (BootSequence): Boot sequence whose readiness is reported
+            host (str): Interface to bind
+            port (int): Port to bind, 0 picks a free one
+        """
+        self.boot = boot
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "HealthServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="health-server", daemon=True)
+        self.thread.start()
+        logger.info("Health server listening on %s", self.url)
+        return self
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.thread = None
+
+    def __enter__(self) -> "HealthServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def handle(self, path: str) -> tuple[int, Union[dict, str]]:
+        """Status code and body of a health check request, text bodies are metrics."""
+        if path == "/metrics":
+            return 200, REGISTRY.render()
+        if path == "/healthz":
+            return 200, {"status": "alive"}
+        if path == "/readyz":
+            status = self.boot.status()
+            return (200 if status["ready"] else 503), status
+        return 404, {"status": "not found"}
+
+    def _make_handler(self):
+        health = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = health.handle(self.path)
+                if isinstance(body, str):
+                    payload, content_type = body.encode(), "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    payload, content_type = json.dumps(body).encode(), "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
@@ -0,0 +1,116 @@
+"""Handler, middleware and Telegram request metrics of a bot, and gauges of its queues and state storage."""
+import functools
+import inspect
+
+from telebot import apihelper
+
+from content_assistant_bot.api import outbound
+from content_assistant_bot.api.rate_limit import limiter
+from content_assistant_bot.api.storage import DatabaseStateStorage
+from content_assistant_bot.core.metrics import gauge_callback, histogram
+from content_assistant_bot.core.rate_limit import MemoryBucketStore
+from content_assistant_bot.core.tracing import span, traced
+from content_assistant_bot.db import crud
+
+handler_seconds = histogram("bot_handler_seconds", "Duration of update and callback handlers", ["handler", "status"])
+middleware_seconds = histogram(
+    "bot_middleware_seconds", "Duration of middleware stages", ["middleware", "stage", "status"]
+)
+
+
+def handler_name(function) -> str:
+    return f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+
+
+def instrument_bot(bot) -> None:
+    """Time every handler, callback route and middleware stage of `bot` after they are all registered,
+    and record the handlers as spans of the update's trace."""
+    for attr, handlers in vars(bot).items():
+        if not attr.endswith("_handlers") or not isinstance(handlers, list):
+            continue
+        for handler in handlers:
+            function = handler["function"]
+            name = handler_name(function)
+            handler["function"] = traced(f"handler.{name}")(handler_seconds.timed(name)(function))
+
+    router = getattr(bot, "callback_router", None)
+    if router is not None:
+        for (namespace, action), routes in router.routes.items():
+            for route in routes:
+                name = f"{namespace}:{action}"
+                route.function = traced(f"handler.{name}")(handler_seconds.timed(name)(route.function))
+
+    for middleware in getattr(bot, "middlewares", None) or []:
+        name = type(middleware).__name__
+        for stage in ("pre_process", "post_process"):
+            setattr(middleware, stage, middleware_seconds.timed(name, stage)(getattr(middleware, stage)))
+
+    if inspect.iscoroutinefunction(bot.process_new_updates):
+        _time_async_requests()
+    elif apihelper.CUSTOM_REQUEST_SENDER is None:
+        # With the outbound gateway off nothing else sees the requests
+        apihelper.CUSTOM_REQUEST_SENDER = _timed_request
+
+
+def _timed_request(method: str, url: str, **kwargs):
+    method_name = url.rsplit("/", 1)[-1]
+    with span(f"telegram.{method_name}"), outbound.request_seconds.time(method_name):
+        return apihelper._get_req_session().request(method, url, **kwargs)
+
+
+def _time_async_requests() -> None:
+    # Imported here so the threaded runtime does not pull in aiohttp
+    from telebot import asyncio_helper
+
+    process_request = asyncio_helper._process_request
+    if getattr(process_request, "__wrapped__", None) is not None:
+        return
+
+    # Every AsyncTeleBot API call goes through this module function, looked up when called
+    @functools.wraps(process_request)
+    async def timed_process_request(token, url, *args, **kwargs):
+        with span(f"telegram.{url}"), outbound.request_seconds.time(url):
+            return await process_request(token, url, *args, **kwargs)
+
+    asyncio_helper._process_request = timed_process_request
+
+
+def register_gauges(bot) -> None:
+    """Queue depths and state storage size of this process, read when `/metrics` is scraped."""
+    # Imported here so the asyncio runtime does not start the task queue's threads, and the other way round
+    if inspect.iscoroutinefunction(bot.process_new_updates):
+        from content_assistant_bot.api.aio.tasks import user_tasks
+
+        gauge_callback("bot_tasks_running", "Background tasks running", lambda: user_tasks.metrics()["running"])
+    else:
+        from content_assistant_bot.api.background import task_queue
+
+        gauge_callback(
+            "bot_tasks_queued", "Background tasks waiting for a worker", lambda: task_queue.metrics()["queued"]
+        )
+        gauge_callback("bot_tasks_running", "Background tasks running", lambda: task_queue.metrics()["running"])
+
+    dispatcher = getattr(bot, "update_dispatcher", None)
+    if dispatcher is not None:
+        gauge_callback(
+            "bot_dispatcher_queued", "Updates waiting per dispatcher lane",
+            lambda: {(str(lane),): depth for lane, depth in enumerate(dispatcher.queue_depths())},
+            ["lane"],
+        )
+
+    gauge_callback(
+        "bot_outbound_waiting", "Sends waiting for the outbound gateway per priority",
+        lambda: {
+            (priority,): stats["waiting"] for priority, stats in outbound.gateway.metrics().items()
+        } if outbound.gateway is not None else {},
+        ["priority"],
+    )
+
+    storage = bot.current_states
+    if isinstance(storage, DatabaseStateStorage):
+        gauge_callback("bot_fsm_states", "Conversations with a state or data", crud.count_chat_states)
+    elif hasattr(storage, "data"):
+        gauge_callback("bot_fsm_states", "Conversations with a state or data", lambda: len(storage.data))
+
+    if limiter is not None and isinstance(limiter.store, MemoryBucketStore):
+        gauge_callback("bot_rate_limit_buckets", "Rate limit buckets kept in memory", lambda: len(limiter.store))
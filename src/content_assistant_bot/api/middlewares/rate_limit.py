@@ -0,0 +1,36 @@
+from telebot import TeleBot
+from telebot.handler_backends import BaseMiddleware, CancelUpdate
+from telebot.types import CallbackQuery
+
+from content_assistant_bot.api.rate_limit import check_rate_limit, rate_limited_text
+
+
+class RateLimitMiddleware(BaseMiddleware):
+    def __init__(self, bot: TeleBot, scope: str = "ui") -> None:
+        """ Middleware charging every message and button press to the user's navigation allowance
+
+        Expensive work is charged separately when it is started, see `run_in_background`.
+
+        Args:
+            bot (TeleBot): TeleBot instance
+            scope (str): Rate limit scope of the updates
+        """
+        self.bot = bot
+        self.scope = scope
+        # Always specify update types, otherwise middlewares won't work
+        self.update_types = ['message', 'callback_query']
+
+    def pre_process(self, update, data):
+        wait = check_rate_limit(self.scope, update.from_user.id)
+        if wait == 0:
+            return
+        text = rate_limited_text(update.from_user.language_code, wait)
+        if isinstance(update, CallbackQuery):
+            # Stops the button's loading indicator as well
+            self.bot.answer_callback_query(update.id, text)
+        else:
+            self.bot.send_message(update.chat.id, text)
+        return CancelUpdate()
+
+    def post_process(self, update, data, exception):
+        pass
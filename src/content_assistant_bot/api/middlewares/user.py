@@ -1,19 +1,53 @@
-from ast import Call
 import logging
 from typing import Optional
 from telebot.handler_backends import BaseMiddleware
 from telebot.types import Message, CallbackQuery
 
+from content_assistant_bot.api.router import parse_callback_data
+from content_assistant_bot.core.log import bind, preview, unbind
+from content_assistant_bot.core.tracing import finish_trace, start_trace
 from content_assistant_bot.db import crud
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+
+
+def trace_attributes(update) -> dict:
+    """Who sent the update and what it asks for, without the text users typed."""
+    attributes = {"user_id": update.from_user.id}
+    if isinstance(update, CallbackQuery):
+        namespace, action, _ = parse_callback_data(update.data or "")
+        attributes["callback"] = f"{namespace}:{action}"
+    else:
+        attributes["chat_id"] = update.chat.id
+        if update.text and update.text.startswith("/"):
+            attributes["command"] = update.text.split()[0]
+        else:
+            attributes["content_type"] = update.content_type
+    return attributes
+
+
+def log_user_event(update, text: str) -> None:
+    """Log the update at INFO, sampled as `user_event`, with the user's text redacted to a short preview."""
+    kind = "callback" if isinstance(update, CallbackQuery) else "message"
+    logger.info(
+        "User event: %s from '%s'", kind, update.from_user.username,
+        extra={"event": "user_event", "text": preview(text), "text_length": len(text or "")},
+    )
+
+
+def bind_update(update) -> dict:
+    """Fields of the update added to the records logged while it is handled."""
+    message = update.message if isinstance(update, CallbackQuery) else update
+    return {"user_id": update.from_user.id, "chat_id": message.chat.id if message else None}
+
 
 class UserMessageMiddleware(BaseMiddleware):
     def __init__(self) -> None:
         self.update_types = ['message']
 
     def pre_process(self, message: Message, data: dict):
+        start_trace("update.message", **trace_attributes(message))
+        data["log_context"] = bind(**bind_update(message))
         user = crud.upsert_user(
             id=message.from_user.id,
             name=message.from_user.username,
@@ -24,11 +58,12 @@ class UserMessageMiddleware(BaseMiddleware):
             username=message.from_user.username,
             text=message.text
         )
-        logger.info(f"User event: user: '{message.from_user.username}', message: '{message.text}'")
+        log_user_event(message, message.text)
         data['user'] = user
 
     def post_process(self, message, data, exception):
-        pass
+        finish_trace(exception)
+        unbind(data.pop("log_context", None))
 
 
 class UserCallbackMiddleware(BaseMiddleware):
@@ -36,6 +71,8 @@ class UserCallbackMiddleware(BaseMiddleware):
         self.update_types = ['callback_query']
 
     def pre_process(self, callback_query: CallbackQuery, data: dict):
+        start_trace("update.callback_query", **trace_attributes(callback_query))
+        data["log_context"] = bind(**bind_update(callback_query))
         user = crud.upsert_user(
             id=callback_query.from_user.id,
             name=callback_query.from_user.username,
@@ -46,8 +83,9 @@ class UserCallbackMiddleware(BaseMiddleware):
             username=callback_query.from_user.username,
             text=callback_query.data
         )
-        logger.info(f"User event: user: '{callback_query.from_user.username}', callback_data: '{callback_query.data}'")
+        log_user_event(callback_query, callback_query.data)
         data['user'] = user
 
     def post_process(self, callback_query, data, exception):
-        pass
\ No newline at end of file
+        finish_trace(exception)
+        unbind(data.pop("log_context", None))
@@ -0,0 +1,335 @@
+"""Single gateway for messages sent to Telegram: rate limits, priorities and flood-wait retries.
+
+telebot sends every API request through `apihelper`. The gateway is installed as its
+`CUSTOM_REQUEST_SENDER`, so handlers, broadcasts and streaming keep calling `bot.send_message`
+and friends while their sends are admitted one at a time by a dispatcher thread:
+
+- a global token bucket and one per chat keep the bot under Telegram's limits,
+- waiting sends are admitted by priority: interactive replies, then broadcasts, then media,
+- a 429 answer pauses the chat (or the whole bot) for `retry_after` and the send is retried,
+- optionally, plain texts queued for the same chat are merged into one message.
+"""
+import contextlib
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from enum import IntEnum
+from typing import Callable, Optional
+
+import requests
+from telebot import apihelper
+
+from content_assistant_bot.core.metrics import histogram
+from content_assistant_bot.core.rate_limit import TokenBucket
+from content_assistant_bot.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+request_seconds = histogram(
+    "bot_telegram_request_seconds", "Duration of Telegram Bot API requests, including queueing", ["method", "status"]
+)
+
+MEDIA_METHODS = frozenset({
+    "sendPhoto", "sendVideo", "sendDocument", "sendMediaGroup", "sendAudio", "sendAnimation", "sendVoice",
+})
+# Methods that count towards Telegram's message limits, everything else is sent at once
+SEND_METHODS = MEDIA_METHODS | frozenset({
+    "sendMessage", "sendSticker", "copyMessage", "forwardMessage",
+    "editMessageText", "editMessageMedia", "editMessageCaption", "editMessageReplyMarkup",
+})
+MAX_MESSAGE_LENGTH = 4096
+MAX_CHAT_BUCKETS = 10000
+# Only plain texts are merged, anything with a keyboard or options is sent as is
+COALESCABLE_PARAMS = frozenset({"chat_id", "text", "parse_mode"})
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BROADCAST = 1
+    MEDIA = 2
+
+
+_priority: contextvars.ContextVar[Optional[Priority]] = contextvars.ContextVar("outbound_priority", default=None)
+
+
+@contextlib.contextmanager
+def outbound_priority(priority: Priority):
+    """Send everything within the block with `priority`, e.g. broadcast deliveries."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class Ticket:
+    def __init__(
+        self, seq: int, method_name: str, chat_id, priority: Priority, params: Optional[dict], queued_at: float
+    ):
+        """ A send waiting for its turn
+
+        Args:
+            seq (int): Arrival order, sends of equal priority go first come first served
+            method_name (str): Bot API method, e.g. "sendMessage"
+            chat_id: Target chat, None for methods without one
+            priority (Priority): Priority class
+            params (dict): Request parameters, a coalesced text is written into the leader's
+            queued_at (float): Clock time the send was queued
+        """
+        self.seq = seq
+        self.method_name = method_name
+        self.chat_id = chat_id
+        self.priority = priority
+        self.params = params
+        self.queued_at = queued_at
+        self.granted = threading.Event()
+        self.done = threading.Event()
+        self.leader: Optional["Ticket"] = None
+        self.response: Optional[requests.Response] = None
+        self.error: Optional[Exception] = None
+
+    @property
+    def key(self) -> tuple[int, int]:
+        return self.priority, self.seq
+
+    @property
+    def coalescable(self) -> bool:
+        return self.method_name == "sendMessage" and self.params is not None and set(self.params) <= COALESCABLE_PARAMS
+
+
+class OutboundGateway:
+    def __init__(
+        self,
+        rate_per_second: float = 30,
+        chat_rate_per_second: float = 1,
+        chat_burst: float = 3,
+        max_retries: int = 3,
+        coalesce: bool = False,
+        send: Optional[Callable[..., requests.Response]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """ Admit Telegram sends by priority within global and per-chat rate limits
+
+        Args:
+            rate_per_second (float): Messages per second for the whole bot
+            chat_rate_per_second (float): Messages per second in one chat
+            chat_burst (float): Messages a chat may receive at once before its rate applies
+            max_retries (int): Retries of a send answered with 429
+            coalesce (bool): Merge plain texts waiting for the same chat into one message
+            send (Callable): Performs the HTTP request, `requests.Session.request`-like
+            clock (Callable): Monotonic clock, replaceable in tests
+        """
+        self.global_bucket = TokenBucket(rate_per_second, clock=clock)
+        self.chat_rate = chat_rate_per_second
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.coalesce = coalesce
+        self.clock = clock
+        self._send = send or self._session_request
+        self._sessions = threading.local()
+        self._chat_buckets: dict = {}
+        self._waiting: list[Ticket] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._stats = {
+            priority.name.lower(): {
+                "sent": 0, "coalesced": 0, "throttled": 0,
+                "queue_seconds": 0.0, "max_queue_seconds": 0.0, "send_seconds": 0.0, "max_send_seconds": 0.0,
+            }
+            for priority in Priority
+        }
+
+    def _session_request(self, method: str, url: str, **kwargs) -> requests.Response:
+        # requests sessions are not thread-safe, each sending thread keeps its own connection pool
+        session = getattr(self._sessions, "session", None)
+        if session is None:
+            session = self._sessions.session = requests.Session()
+        return session.request(method, url, **kwargs)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                self._prune_chat_buckets()
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, clock=self.clock)
+        return bucket
+
+    def _prune_chat_buckets(self) -> None:
+        # A bucket refilled to its burst behaves like a new one, so dropping it changes nothing
+        refill_seconds = self.chat_burst / self.chat_rate
+        now = self.clock()
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            if now - bucket.updated_at > refill_seconds:
+                del self._chat_buckets[chat_id]
+
+    def request(self, method: str, url: str, params: Optional[dict] = None, files=None, **kwargs) -> requests.Response:
+        """`apihelper.CUSTOM_REQUEST_SENDER`: called by telebot for every API request."""
+        method_name = url.rsplit("/", 1)[-1]
+        with span(f"telegram.{method_name}"), request_seconds.time(method_name):
+            return self._request(method_name, method, url, params, files, **kwargs)
+
+    def _request(self, method_name: str, method: str, url: str, params: Optional[dict], files, **kwargs):
+        if method_name not in SEND_METHODS:
+            return self._send(method, url, params=params, files=files, **kwargs)
+
+        priority = _priority.get()
+        if priority is None:
+            priority = Priority.MEDIA if method_name in MEDIA_METHODS else Priority.INTERACTIVE
+        chat_id = params.get("chat_id") if params else None
+        ticket = Ticket(next(self._seq), method_name, chat_id, priority, params, self.clock())
+
+        response = None
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_turn(ticket)
+            if ticket.leader is not None:
+                # The text went out as part of an earlier message to the same chat
+                ticket.leader.done.wait()
+                if ticket.leader.error is not None:
+                    raise ticket.leader.error
+                return ticket.leader.response
+
+            started = self.clock()
+            try:
+                response = self._send(method, url, params=params, files=files, **kwargs)
+            except Exception as e:
+                ticket.error = e
+                ticket.done.set()
+                raise
+            self._record(priority, "send_seconds", self.clock() - started)
+            retry_after = self._retry_after(response)
+            # Uploaded files were consumed by the first attempt, those sends are not repeated
+            if retry_after is None or files or attempt == self.max_retries:
+                break
+            self._throttle(priority, chat_id, retry_after)
+
+        ticket.response = response
+        ticket.done.set()
+        return response
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        if response.status_code != 429:
+            return None
+        try:
+            return float(response.json().get("parameters", {}).get("retry_after", 1))
+        except ValueError:
+            return 1.0
+
+    def _throttle(self, priority: Priority, chat_id, retry_after: float) -> None:
+        with self._cond:
+            self._stats[priority.name.lower()]["throttled"] += 1
+            # A flood wait names no scope: without a chat it is the bot's limit
+            bucket = self._chat_bucket(chat_id) if chat_id is not None else self.global_bucket
+            bucket.pause(retry_after)
+        logger.warning("Telegram flood limit for chat %s, retrying after %s s", chat_id, retry_after)
+
+    def _wait_for_turn(self, ticket: Ticket) -> None:
+        ticket.granted.clear()
+        with self._cond:
+            self._waiting.append(ticket)
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch, name="outbound", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+        ticket.granted.wait()
+        self._record(ticket.priority, "queue_seconds", self.clock() - ticket.queued_at)
+
+    def _dispatch(self) -> None:
+        with self._cond:
+            while True:
+                while not self._waiting:
+                    self._cond.wait()
+                self._cond.wait(self._admit_next())
+
+    def _admit_next(self) -> Optional[float]:
+        """Admit the most urgent send whose chat has capacity.
+
+        Returns seconds until one might, None to wait for a new send.
+        """
+        delay = self.global_bucket.try_acquire(0)
+        if delay > 0 or self.global_bucket.tokens < 1:
+            return max(delay, (1 - self.global_bucket.tokens) / self.global_bucket.rate)
+
+        waits = []
+        for ticket in sorted(self._waiting, key=lambda ticket: ticket.key):
+            if ticket.chat_id is not None:
+                wait = self._chat_bucket(ticket.chat_id).try_acquire()
+                if wait > 0:
+                    # A throttled chat does not hold back sends to other chats
+                    waits.append(wait)
+                    continue
+            self.global_bucket.try_acquire()
+            self._waiting.remove(ticket)
+            if self.coalesce and ticket.coalescable:
+                self._coalesce(ticket)
+            ticket.granted.set()
+            self._record(ticket.priority, "sent", 1)
+            return 0
+        return min(waits) if waits else None
+
+    def _coalesce(self, leader: Ticket) -> None:
+        texts = [leader.params["text"]]
+        length = len(texts[0])
+        for ticket in sorted(self._waiting, key=lambda ticket: ticket.seq):
+            if ticket.chat_id != leader.chat_id or ticket.seq < leader.seq:
+                continue
+            if not ticket.coalescable or ticket.params.get("parse_mode") != leader.params.get("parse_mode"):
+                # Later texts must not overtake it
+                break
+            length += len(ticket.params["text"]) + 2
+            if length > MAX_MESSAGE_LENGTH:
+                break
+            texts.append(ticket.params["text"])
+            ticket.leader = leader
+            self._waiting.remove(ticket)
+            ticket.granted.set()
+            self._record(ticket.priority, "coalesced", 1)
+        leader.params["text"] = "\n\n".join(texts)
+
+    def _record(self, priority: Priority, key: str, value: float) -> None:
+        with self._cond:
+            stats = self._stats[priority.name.lower()]
+            stats[key] += value
+            if key.endswith("_seconds"):
+                stats[f"max_{key}"] = max(stats[f"max_{key}"], value)
+
+    def metrics(self) -> dict:
+        """Per priority: sends, merged texts, flood waits, and mean and max queue delay and send latency."""
+        with self._cond:
+            metrics = {}
+            for name, stats in self._stats.items():
+                sent = max(stats["sent"], 1)
+                metrics[name] = {
+                    "sent": stats["sent"],
+                    "coalesced": stats["coalesced"],
+                    "throttled": stats["throttled"],
+                    "waiting": sum(1 for ticket in self._waiting if ticket.priority.name.lower() == name),
+                    "queue_ms": 1000 * stats["queue_seconds"] / sent,
+                    "max_queue_ms": 1000 * stats["max_queue_seconds"],
+                    "send_ms": 1000 * stats["send_seconds"] / sent,
+                    "max_send_ms": 1000 * stats["max_send_seconds"],
+                }
+            return metrics
+
+
+gateway: Optional[OutboundGateway] = None
+
+
+def install_gateway(outbound_config, processes: int = 1) -> Optional[OutboundGateway]:
+    """Route this process's Telegram requests through a gateway, splitting the global rate over `processes`."""
+    global gateway
+    if not outbound_config.enabled:
+        return None
+    gateway = OutboundGateway(
+        rate_per_second=outbound_config.rate_per_second / processes,
+        chat_rate_per_second=outbound_config.chat_rate_per_second,
+        chat_burst=outbound_config.chat_burst,
+        max_retries=outbound_config.max_retries,
+        coalesce=outbound_config.coalesce,
+    )
+    apihelper.CUSTOM_REQUEST_SENDER = gateway.request
+    logger.info("Outbound gateway installed: %.1f msg/s", gateway.global_bucket.rate)
+    return gateway
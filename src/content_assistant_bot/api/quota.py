@@ -0,0 +1,56 @@
+"""Per-user budgets and task queue priorities of the bot, keyed by `User.role`."""
+from typing import Optional
+
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.quota import QuotaService, build_quota_service
+
+config = settings.view("config")
+strings = settings.view("common")
+
+quotas: Optional[QuotaService] = (
+    build_quota_service(config.quota, config.timezone) if config.quota.enabled else None
+)
+
+# Rate limit scope of a task -> budget it draws from, and whether the task's cost is charged when it is queued.
+# LLM tokens are only known once the completion is done, `charge_usage` records them then.
+SCOPE_BUDGETS = {"instagram": ("instagram", True), "llm": ("llm_tokens", False)}
+
+
+def task_weight(role: Optional[str]) -> float:
+    """Share of the task queue workers a user of `role` gets while others wait."""
+    return config.quota.weights.get(role, 1) if config.quota.enabled else 1
+
+
+def check_quota(user_id: int, role: Optional[str], scope: str, cost: float = 1) -> Optional[str]:
+    """Check the budget behind `scope` for a task of `cost`.
+
+    Returns:
+        str: The exhausted window, "daily" or "rolling", or None if the task may run
+    """
+    if quotas is None or scope not in SCOPE_BUDGETS:
+        return None
+    resource, upfront = SCOPE_BUDGETS[scope]
+    return quotas.check(user_id, role, resource, int(cost) if upfront else 0)
+
+
+def charge_task(user_id: int, scope: str, cost: float = 1) -> None:
+    """Record the cost of a task that was queued, for budgets charged up front."""
+    if quotas is None or scope not in SCOPE_BUDGETS:
+        return
+    resource, upfront = SCOPE_BUDGETS[scope]
+    if upfront:
+        quotas.charge(user_id, resource, int(cost))
+
+
+def charge_usage(user_id: int, resource: str, amount: int) -> None:
+    if quotas is not None:
+        quotas.charge(user_id, resource, amount)
+
+
+def purge_usage() -> None:
+    if quotas is not None:
+        quotas.purge()
+
+
+def quota_exceeded_text(lang: str, window: str) -> str:
+    return strings.quota_exceeded[window][lang]
@@ -0,0 +1,39 @@
+"""Per-user rate limits, shared by the middleware and the handlers starting expensive work."""
+import math
+from typing import Optional
+
+from content_assistant_bot.core.config import DEFAULT_LANGUAGE, LANGUAGES, settings
+from content_assistant_bot.core.rate_limit import DatabaseBucketStore, RateLimiter, build_rate_limiter
+
+config = settings.view("config")
+strings = settings.view("common")
+
+# Buckets live in the database when bot workers share state, so a user can not spread requests over them
+limiter: Optional[RateLimiter] = (
+    build_rate_limiter(config.rate_limit, shared=config.state_storage == "database")
+    if config.rate_limit.enabled else None
+)
+
+
+def check_rate_limit(scope: str, user_id: int, cost: float = 1) -> float:
+    """Charge `cost` to the user's `scope` bucket. Returns 0 if allowed, otherwise seconds to wait."""
+    if limiter is None:
+        return 0.0
+    return limiter.check(scope, user_id, cost)
+
+
+async def check_rate_limit_async(scope: str, user_id: int, cost: float = 1) -> float:
+    """`check_rate_limit` for the asyncio runtime, shared buckets are read on the database pool."""
+    if limiter is None:
+        return 0.0
+    if isinstance(limiter.store, DatabaseBucketStore):
+        from content_assistant_bot.api.aio.executors import run_blocking
+
+        return await run_blocking("db", limiter.check, scope, user_id, cost)
+    return limiter.check(scope, user_id, cost)
+
+
+def rate_limited_text(lang: Optional[str], wait: float) -> str:
+    if lang not in LANGUAGES:
+        lang = DEFAULT_LANGUAGE
+    return strings.rate_limited[lang].format(seconds=math.ceil(wait))
@@ -0,0 +1,162 @@
+"""Dispatch callback queries by structured callback data instead of trying every handler's filter."""
+import inspect
+import logging
+from typing import Callable, Optional, Union
+
+from telebot.states import State
+from telebot.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = ":"
+# Telegram rejects longer callback data
+MAX_CALLBACK_DATA_BYTES = 64
+
+# Buttons in messages sent before the namespace:action scheme
+LEGACY_CALLBACK_DATA = {
+    "_menu": "menu:open",
+    "_analyze_account": "account:start",
+    "_analyze_hashtag": "hashtag:start",
+    "_generate_ideas": "ideas:start",
+    "_generate_more_ideas": "ideas:more",
+    "SHOW_NEXT_VIDEOS": "hashtag:next",
+    "CANCEL": "common:cancel",
+    "_public_message": "admin:public_message",
+    "_add_admin": "admin:add_admin",
+    "_export_data": "admin:export_data",
+    "_about": "admin:about",
+    "_jobs": "admin:jobs",
+}
+
+
+def callback_data(namespace: str, action: str, *args) -> str:
+    """
+    Build callback data `namespace:action[:arg...]` for an inline button.
+
+    Args:
+        namespace (str): Handler module, e.g. "account"
+        action (str): Action within the module, e.g. "count"
+        args: Arguments passed to the handler as strings, the last one may contain the separator
+
+    Returns:
+        str: Callback data.
+    """
+    data = SEPARATOR.join([namespace, action, *map(str, args)])
+    if len(data.encode()) > MAX_CALLBACK_DATA_BYTES:
+        raise ValueError(f"Callback data is longer than {MAX_CALLBACK_DATA_BYTES} bytes: {data}")
+    return data
+
+
+def parse_callback_data(data: str) -> tuple[str, str, list[str]]:
+    """Split callback data into namespace, action and arguments."""
+    if data.startswith("GET "):
+        data = SEPARATOR.join(["files", "get", data[4:]])
+    data = LEGACY_CALLBACK_DATA.get(data, data)
+    namespace, _, rest = data.partition(SEPARATOR)
+    action, _, args = rest.partition(SEPARATOR)
+    return namespace, action, args.split(SEPARATOR) if args else []
+
+
+class Route:
+    def __init__(self, function: Callable, state: Optional[str]) -> None:
+        """ Handler of one namespace:action
+
+        Args:
+            function (Callable): Handler, its parameters are injected like telebot's
+            state (str): Name of the state the handler is limited to, any state if None
+        """
+        self.function = function
+        self.state = state
+        self.params = list(inspect.signature(function).parameters)[1:]
+
+
+class CallbackRouter:
+    def __init__(self) -> None:
+        """ Callback query handlers by (namespace, action)
+
+        telebot tests the filter of every callback handler in registration order. The router is
+        a single telebot handler that looks the route up in a dict, so dispatch cost does not
+        grow with the number of handlers, and two handlers cannot both claim the same button.
+        """
+        self.routes: dict[tuple[str, str], list[Route]] = {}
+
+    def handler(self, namespace: str, action: str, state: Optional[Union[State, str]] = None) -> Callable:
+        """Register a handler for `namespace:action`, optionally only in `state`.
+
+        Handlers take the callback query and, by name, any middleware data (`state`, `user`, ...),
+        `data` for all of it, and `args` for the arguments in the callback data.
+        """
+        state_name = state.name if isinstance(state, State) else state
+
+        def decorator(function: Callable) -> Callable:
+            routes = self.routes.setdefault((namespace, action), [])
+            if any(route.state == state_name for route in routes):
+                raise ValueError(f"Duplicate callback handler for {namespace}:{action} in state {state_name}")
+            # Handlers limited to a state are tried before the one for any state
+            routes.append(Route(function, state_name))
+            routes.sort(key=lambda route: route.state is None)
+            return function
+
+        return decorator
+
+    def lookup(self, data: str) -> tuple[list[Route], list[str]]:
+        """Handlers registered for the namespace:action of `data`, and its arguments."""
+        namespace, action, args = parse_callback_data(data)
+        return self.routes.get((namespace, action), []), args
+
+    @staticmethod
+    def select(routes: list[Route], current_state: Optional[str]) -> Optional[Route]:
+        for route in routes:
+            if route.state is None or route.state == current_state:
+                return route
+        return None
+
+    def resolve(self, data: str, current_state: Optional[str] = None) -> tuple[Optional[Route], list[str]]:
+        routes, args = self.lookup(data)
+        return self.select(routes, current_state), args
+
+    @staticmethod
+    def _call_kwargs(route: Route, data: dict, args: list[str]) -> dict:
+        available = {**data, "args": args}
+        return {name: (data if name == "data" else available.get(name)) for name in route.params}
+
+    def dispatch(self, call: CallbackQuery, data: dict):
+        routes, args = self.lookup(call.data)
+        state = data.get("state")
+        # The state is only read when a handler of this button depends on it
+        needs_state = state is not None and any(route.state is not None for route in routes)
+        current_state = state.get() if needs_state else None
+        route = self.select(routes, current_state)
+        if route is None:
+            logger.warning("No callback handler for '%s' in state %s", call.data, current_state)
+            return None
+        return route.function(call, **self._call_kwargs(route, data, args))
+
+    async def adispatch(self, call: CallbackQuery, data: dict):
+        """`dispatch` for AsyncTeleBot, where state reads and handlers are awaited."""
+        routes, args = self.lookup(call.data)
+        state = data.get("state")
+        needs_state = state is not None and any(route.state is not None for route in routes)
+        current_state = await state.get() if needs_state else None
+        route = self.select(routes, current_state)
+        if route is None:
+            logger.warning("No callback handler for '%s' in state %s", call.data, current_state)
+            return None
+        return await route.function(call, **self._call_kwargs(route, data, args))
+
+
+def get_router(bot) -> CallbackRouter:
+    """Return the bot's callback router, registering it as the bot's only callback query handler."""
+    router = getattr(bot, "callback_router", None)
+    if router is None:
+        router = CallbackRouter()
+        bot.callback_router = router
+        # Without class middlewares telebot passes the callback query alone
+        if inspect.iscoroutinefunction(bot.process_new_updates):
+            async def dispatch_callback(call: CallbackQuery, data: Optional[dict] = None):
+                return await router.adispatch(call, data or {})
+        else:
+            def dispatch_callback(call: CallbackQuery, data: Optional[dict] = None):
+                return router.dispatch(call, data or {})
+        bot.register_callback_query_handler(dispatch_callback, func=None)
+    return router
@@ -0,0 +1,138 @@
+"""FSM state storage kept in the database, so every bot worker sees the same conversation state."""
+import pickle
+from typing import Optional, Union
+
+from telebot.storage.base_storage import StateDataContext, StateStorageBase
+
+from content_assistant_bot.db import crud
+
+
+class DatabaseStateStorage(StateStorageBase):
+    def __init__(self, separator: str = ":", prefix: str = "telebot") -> None:
+        """ Drop-in replacement for `StateMemoryStorage` backed by the `chat_states` table
+        Args:
+            separator (str): Separator of the key parts
+            prefix (str): Prefix of the keys
+        """
+        self.separator = separator
+        self.prefix = prefix
+
+    def _key(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None) -> str:
+        return self._get_key(
+            chat_id, user_id, self.prefix, self.separator, business_connection_id, message_thread_id, bot_id
+        )
+
+    def set_state(
+        self,
+        chat_id: int,
+        user_id: int,
+        state: str,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> bool:
+        if hasattr(state, "name"):
+            state = state.name
+        crud.set_chat_state(self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id), state)
+        return True
+
+    def get_state(
+        self,
+        chat_id: int,
+        user_id: int,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> Union[str, None]:
+        chat_state = crud.get_chat_state(
+            self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        )
+        return chat_state.state if chat_state is not None else None
+
+    def delete_state(
+        self,
+        chat_id: int,
+        user_id: int,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> bool:
+        return crud.delete_chat_state(self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id))
+
+    def set_data(
+        self,
+        chat_id: int,
+        user_id: int,
+        key: str,
+        value: Union[str, int, float, dict],
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> bool:
+        _key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        chat_state = crud.get_chat_state(_key)
+        if chat_state is None:
+            raise RuntimeError(f"DatabaseStateStorage: key {_key} does not exist.")
+        data = pickle.loads(chat_state.data) if chat_state.data else {}
+        data[key] = value
+        return crud.set_chat_data(_key, pickle.dumps(data))
+
+    def get_data(
+        self,
+        chat_id: int,
+        user_id: int,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> dict:
+        chat_state = crud.get_chat_state(
+            self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        )
+        if chat_state is None or not chat_state.data:
+            return {}
+        return pickle.loads(chat_state.data)
+
+    def reset_data(
+        self,
+        chat_id: int,
+        user_id: int,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> bool:
+        return crud.set_chat_data(
+            self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id), pickle.dumps({})
+        )
+
+    def get_interactive_data(
+        self,
+        chat_id: int,
+        user_id: int,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> Optional[dict]:
+        return StateDataContext(
+            self,
+            chat_id=chat_id,
+            user_id=user_id,
+            business_connection_id=business_connection_id,
+            message_thread_id=message_thread_id,
+            bot_id=bot_id,
+        )
+
+    def save(
+        self,
+        chat_id: int,
+        user_id: int,
+        data: dict,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> bool:
+        return crud.set_chat_data(
+            self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id), pickle.dumps(data)
+        )
+
+    def __str__(self) -> str:
+        return "<DatabaseStateStorage>"
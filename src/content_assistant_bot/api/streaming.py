@@ -0,0 +1,142 @@
+"""Deliver a streamed LLM completion by editing Telegram messages as tokens arrive."""
+import logging
+import time
+from typing import Callable, Iterable, Optional
+
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects longer message texts
+MESSAGE_LIMIT = 4096
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Split text into message-sized parts, preferring paragraph, line and word boundaries."""
+    parts = []
+    while len(text) > limit:
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = text.rfind(separator, 0, limit)
+            if cut > limit // 2:
+                break
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n ")
+    parts.append(text)
+    return parts
+
+
+def get_chunk_text(chunk) -> str:
+    """Text of a streamed chunk: LangChain message chunks or plain strings."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content or ""
+
+
+def get_retry_after(e: ApiTelegramException) -> Optional[int]:
+    if e.error_code != 429:
+        return None
+    return (e.result_json or {}).get("parameters", {}).get("retry_after", 1)
+
+
+class StreamingMessage:
+    def __init__(
+        self,
+        bot: TeleBot,
+        chat_id: int,
+        message_id: Optional[int] = None,
+        edit_interval: float = 1.0,
+        progress_markup=None,
+        limit: int = MESSAGE_LIMIT,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """ Message that grows while a completion streams in
+
+        Partial text is sent without formatting, since unfinished Markdown does not parse;
+        `finish` applies the final formatting. Text beyond `limit` continues in new messages.
+
+        Args:
+            bot (TeleBot): TeleBot instance
+            chat_id (int): Chat to write to
+            message_id (int): Placeholder message to edit, a new one is sent if None
+            edit_interval (float): Minimum seconds between edits, Telegram throttles faster edits
+            progress_markup (InlineKeyboardMarkup): Markup kept under the text while it streams, e.g. a cancel button
+            limit (int): Maximum characters per message
+            clock (Callable): Monotonic time source
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_ids: list[int] = [message_id] if message_id is not None else []
+        self.rendered: list[Optional[str]] = [None] * len(self.message_ids)
+        self.edit_interval = edit_interval
+        self.progress_markup = progress_markup
+        self.limit = limit
+        self.clock = clock
+        self.text = ""
+        self.next_edit_at = 0.0
+
+    def append(self, chunk: str) -> None:
+        self.text += chunk
+        if self.text.strip() and self.clock() >= self.next_edit_at:
+            self.flush()
+
+    def consume(self, chunks: Iterable, on_chunk: Optional[Callable[[], None]] = None) -> str:
+        """Append every chunk of a stream and return the full text; `on_chunk` runs after each one."""
+        for chunk in chunks:
+            self.append(get_chunk_text(chunk))
+            if on_chunk is not None:
+                on_chunk()
+        return self.text
+
+    def flush(self) -> None:
+        try:
+            self._render(split_text(self.text, self.limit), reply_markup=self.progress_markup)
+        except ApiTelegramException as e:
+            retry_after = get_retry_after(e)
+            if retry_after is None:
+                raise
+            # Skip edits until Telegram accepts them again, the text keeps accumulating meanwhile
+            self.next_edit_at = self.clock() + retry_after
+            return
+        self.next_edit_at = self.clock() + self.edit_interval
+
+    def finish(self, reply_markup=None, parse_mode: Optional[str] = "Markdown") -> str:
+        """Write the complete text with its formatting, the markup goes under the last part."""
+        parts = split_text(self.text, self.limit) if self.text.strip() else []
+        for attempt in range(3):
+            try:
+                self._render(parts, reply_markup=reply_markup, parse_mode=parse_mode, final=True)
+                break
+            except ApiTelegramException as e:
+                retry_after = get_retry_after(e)
+                if retry_after is not None:
+                    time.sleep(retry_after)
+                elif parse_mode and "can't parse entities" in e.description:
+                    # The model produced Markdown Telegram cannot parse, fall back to plain text
+                    logger.warning("Streamed message is not valid %s, sending as plain text", parse_mode)
+                    parse_mode = None
+                else:
+                    raise
+        return self.text
+
+    def _render(self, parts: list[str], reply_markup=None, parse_mode=None, final: bool = False) -> None:
+        for idx, part in enumerate(parts):
+            markup = reply_markup if idx == len(parts) - 1 else None
+            if idx >= len(self.message_ids):
+                message = self.bot.send_message(self.chat_id, part, reply_markup=markup, parse_mode=parse_mode)
+                self.message_ids.append(message.message_id)
+                self.rendered.append(part)
+            elif final or self.rendered[idx] != part:
+                try:
+                    self.bot.edit_message_text(
+                        part, chat_id=self.chat_id, message_id=self.message_ids[idx],
+                        reply_markup=markup, parse_mode=parse_mode,
+                    )
+                except ApiTelegramException as e:
+                    if "message is not modified" not in e.description:
+                        raise
+                self.rendered[idx] = part
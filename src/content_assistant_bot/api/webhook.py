@@ -0,0 +1,165 @@
+"""Embedded HTTP server that receives updates pushed by Telegram (webhook mode)."""
+import hmac
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from telebot.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    def __init__(
+        self,
+        process_updates: Callable[[list[Update]], None],
+        secret_token: str,
+        host: str = "0.0.0.0",
+        port: int = 8443,
+        path: str = "/webhook",
+        queue_size: int = 1000,
+        max_batch_size: int = 100,
+    ) -> None:
+        """ Accept webhook requests, answer at once and process the updates in the background
+
+        Args:
+            process_updates (Callable): Handles a list of updates, e.g. `TeleBot.process_new_updates`
+            secret_token (str): Expected `X-Telegram-Bot-Api-Secret-Token`, requests without it are rejected.
+                Required: without it anyone who reaches the port could post updates as any user, admins included
+            host (str): Interface to bind
+            port (int): Port to bind, 0 picks a free one
+            path (str): URL path Telegram posts to
+            queue_size (int): Updates buffered before requests are answered with 503 and retried by Telegram
+            max_batch_size (int): Updates handed to `process_updates` at once
+        """
+        if not secret_token:
+            raise ValueError("A webhook server needs a secret token")
+        self.process_updates = process_updates
+        self.secret_token = secret_token
+        self.path = path
+        self.updates: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.max_batch_size = max_batch_size
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.threads: list[threading.Thread] = []
+        self.stats = {"received": 0, "rejected": 0, "dropped": 0, "processed": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{self.path}"
+
+    def start(self) -> "WebhookServer":
+        # A single consumer keeps the arrival order, the dispatcher lanes behind it add the parallelism
+        consumer = threading.Thread(target=self._consume, name="webhook-consumer", daemon=True)
+        server = threading.Thread(target=self.server.serve_forever, name="webhook-server", daemon=True)
+        for thread in (consumer, server):
+            thread.start()
+            self.threads.append(thread)
+        logger.info("Webhook server listening on %s", self.url)
+        return self
+
+    def serve_forever(self) -> None:
+        self.start()
+        try:
+            self.threads[-1].join()
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Stop accepting requests and finish the queued updates."""
+        if not self.threads:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.updates.put(None)
+        self.threads[0].join()
+        self.threads = []
+
+    def __enter__(self) -> "WebhookServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def handle(self, headers, body: bytes) -> int:
+        """Validate and enqueue one webhook request, returning the HTTP status to answer with."""
+        if not hmac.compare_digest(headers.get(SECRET_TOKEN_HEADER, ""), self.secret_token):
+            self._count("rejected")
+            return 403
+        try:
+            update = Update.de_json(json.loads(body))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Malformed webhook payload: %s", e)
+            self._count("rejected")
+            return 400
+        try:
+            self.updates.put_nowait(update)
+        except queue.Full:
+            logger.warning("Webhook queue is full, update %s left for Telegram to retry", update.update_id)
+            self._count("dropped")
+            return 503
+        self._count("received")
+        return 200
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self.lock:
+            self.stats[key] += n
+
+    def _consume(self) -> None:
+        while True:
+            batch = [self.updates.get()]
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self.updates.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            batch = [update for update in batch if update is not None]
+            if batch:
+                try:
+                    self.process_updates(batch)
+                except Exception as e:
+                    logger.exception("Error processing webhook updates: %s", e)
+                self._count("processed", len(batch))
+            if stop:
+                return
+
+    def _make_handler(self):
+        webhook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != webhook.path:
+                    self._reply(404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                self._reply(webhook.handle(self.headers, self.rfile.read(length)))
+
+            def _reply(self, status: int):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+
+def set_webhook(bot, webhook_config, secret_token: str) -> None:
+    """Register the public URL with Telegram, replacing long polling."""
+    bot.remove_webhook()
+    bot.set_webhook(
+        url=webhook_config.url,
+        secret_token=secret_token,
+        max_connections=webhook_config.max_connections,
+        drop_pending_updates=webhook_config.drop_pending_updates,
+    )
+    logger.info("Webhook set to %s", webhook_config.url)
@@ -0,0 +1,100 @@
+"""Startup phases with timings, warm-ups run in parallel, and the readiness flag health checks report."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Phase:
+    def __init__(self, name: str, required: bool) -> None:
+        """ One step of the boot sequence
+
+        Args:
+            name (str): Phase name, e.g. "database"
+            required (bool): Whether the bot can not start without it
+        """
+        self.name = name
+        self.required = required
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def status(self) -> str:
+        if self.seconds is None:
+            return "running"
+        return "failed" if self.error else "ok"
+
+    def as_dict(self) -> dict:
+        return {"status": self.status, "seconds": self.seconds, "required": self.required, "error": self.error}
+
+
+class BootSequence:
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        """ Runs and times the startup phases and holds the readiness flag
+
+        The bot is ready once every required phase succeeded and updates are being received.
+        Optional phases only warm up caches: when one fails, the work is done on first use instead.
+
+        Args:
+            clock (Callable): Monotonic clock in seconds
+        """
+        self.clock = clock
+        self.started = clock()
+        self.phases: dict[str, Phase] = {}
+        self.lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def run(self, name: str, fn: Callable[[], Any], required: bool = True) -> Any:
+        """Run and time one phase. A required phase re-raises its error, an optional one returns None."""
+        phase = Phase(name, required)
+        with self.lock:
+            self.phases[name] = phase
+        started = self.clock()
+        try:
+            result = fn()
+        except Exception as e:
+            phase.error = f"{type(e).__name__}: {e}"
+            phase.seconds = self.clock() - started
+            if required:
+                logger.error("Boot phase %s failed after %.2f s: %s", name, phase.seconds, phase.error)
+                raise
+            logger.warning("Optional boot phase %s failed after %.2f s: %s", name, phase.seconds, phase.error)
+            return None
+        phase.seconds = self.clock() - started
+        logger.info("Boot phase %s took %.2f s", name, phase.seconds)
+        return result
+
+    def run_parallel(self, phases: dict[str, Callable[[], Any]], optional: Iterable[str] = ()) -> dict[str, Any]:
+        """Run independent phases at once, so startup takes as long as the slowest one rather than all of them.
+
+        Returns:
+            dict[str, Any]: Result of each phase, None for failed optional ones.
+        """
+        optional = set(optional)
+        with ThreadPoolExecutor(max_workers=max(1, len(phases)), thread_name_prefix="boot") as executor:
+            futures = {
+                name: executor.submit(self.run, name, fn, name not in optional) for name, fn in phases.items()
+            }
+        # Every phase has finished here, the first required failure stops the boot
+        return {name: future.result() for name, future in futures.items()}
+
+    def mark_ready(self) -> None:
+        self._ready.set()
+        timings = ", ".join(f"{name} {phase.seconds:.2f} s" for name, phase in self.phases.items())
+        logger.info("Ready in %.2f s (%s)", self.clock() - self.started, timings)
+
+    def mark_not_ready(self) -> None:
+        """Stop reporting ready, e.g. while shutting down, so traffic moves to other instances."""
+        self._ready.clear()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def status(self) -> dict:
+        with self.lock:
+            phases = {name: phase.as_dict() for name, phase in self.phases.items()}
+        return {"ready": self.ready, "uptime_seconds": round(self.clock() - self.started, 3), "phases": phases}
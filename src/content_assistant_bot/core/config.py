@@ -0,0 +1,207 @@
+"""Configuration and localised strings, loaded once and compiled to plain Python objects.
+
+Handlers used to hold OmegaConf nodes and resolve `strings.menu.title[lang]` through
+OmegaConf's node machinery on every reply. The service loads every YAML file in `conf/`
+once, compiles it to dicts, lists and `Template` strings, and swaps the whole snapshot in
+one assignment when a file changes, so a reply never sees half of a reload.
+"""
+import logging
+import os
+import string
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from omegaconf import OmegaConf
+
+logger = logging.getLogger(__name__)
+
+CONF_DIR = Path(__file__).resolve().parent.parent / "conf"
+LANGUAGES = ("ru", "en")
+# Used when a string has no translation to the user's language
+DEFAULT_LANGUAGE = "ru"
+
+_formatter = string.Formatter()
+_DICT_ATTRIBUTES = frozenset(dir(dict))
+
+
+class ConfigError(ValueError):
+    """A configuration file could not be loaded or one of its templates is malformed."""
+
+
+class Node(dict):
+    """Mapping of a config section with attribute access, like the OmegaConf nodes it replaces."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Attributes resolve with one dict lookup instead of a failed lookup and a __getattr__ call
+        self.__dict__ = self
+
+
+class Translations(Node):
+    """A string in each language, falling back to the default language for missing ones."""
+
+    def __missing__(self, lang: str) -> "Template":
+        if DEFAULT_LANGUAGE in self:
+            return self[DEFAULT_LANGUAGE]
+        return next(iter(self.values()))
+
+
+class Template(str):
+    """Translated string whose `str.format` fields are parsed and validated at load time.
+
+    `format` is str's own, so formatting a reply costs the same as with a plain string.
+    """
+
+    __slots__ = ("fields",)
+
+    def __new__(cls, text: str) -> "Template":
+        template = super().__new__(cls, text)
+        try:
+            template.fields = frozenset(field for _, field, _, _ in _formatter.parse(text) if field is not None)
+        except ValueError as e:
+            raise ConfigError(f"Malformed template {text[:40]!r}: {e}") from e
+        return template
+
+
+def _is_translations(value: dict) -> bool:
+    return bool(value) and all(key in LANGUAGES and isinstance(item, str) for key, item in value.items())
+
+
+def compile_config(value: Any, path: str = "") -> Any:
+    """
+    Compile a config container into Nodes, lists and, for translated strings, Templates.
+
+    Args:
+        value (Any): Container from `OmegaConf.to_container`
+        path (str): Dotted path of `value`, for error messages
+
+    Returns:
+        Any: The compiled value.
+    """
+    if isinstance(value, dict):
+        if _is_translations(value):
+            translations = Translations((lang, Template(text)) for lang, text in value.items())
+            fields = {lang: template.fields for lang, template in translations.items()}
+            if len(set(fields.values())) > 1:
+                logger.warning("Translations of %s use different fields: %s", path, fields)
+            return translations
+        shadowing = [key for key in value if key in _DICT_ATTRIBUTES]
+        if shadowing:
+            raise ConfigError(f"Keys of {path} shadow dict methods: {shadowing}")
+        return Node((key, compile_config(item, f"{path}.{key}" if path else str(key))) for key, item in value.items())
+    if isinstance(value, list):
+        return [compile_config(item, f"{path}[{idx}]") for idx, item in enumerate(value)]
+    return value
+
+
+class ConfigView:
+    def __init__(self, service: "ConfigService", name: str) -> None:
+        """ Module-level handle on one config file that always reads the current snapshot
+
+        Args:
+            service (ConfigService): Service holding the snapshots
+            name (str): File name without extension, e.g. "common"
+        """
+        self._service = service
+        self._name = name
+
+    def __getattr__(self, key: str) -> Any:
+        return getattr(self._service.get(self._name), key)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._service.get(self._name)[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._service.get(self._name)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._service.get(self._name).get(key, default)
+
+    def snapshot(self) -> Node:
+        return self._service.get(self._name)
+
+
+class ConfigService:
+    def __init__(self, conf_dir: os.PathLike = CONF_DIR, poll_seconds: float = 2.0) -> None:
+        """ Compiled snapshots of every YAML file in a directory, reloaded when a file changes
+
+        Args:
+            conf_dir (PathLike): Directory with the YAML files
+            poll_seconds (float): How often the watcher compares file modification times
+        """
+        self.conf_dir = Path(conf_dir)
+        self.poll_seconds = poll_seconds
+        self.version = 0
+        self._snapshot: dict[str, Node] = {}
+        self._raw: dict[str, dict] = {}
+        self._mtimes: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def _scan(self) -> dict[str, float]:
+        return {path.stem: path.stat().st_mtime for path in sorted(self.conf_dir.glob("*.yaml"))}
+
+    def reload(self, force: bool = False) -> bool:
+        """Compile all files again if any changed. The previous snapshot stays in use if one fails to load."""
+        with self._lock:
+            mtimes = self._scan()
+            if not force and self._snapshot and mtimes == self._mtimes:
+                return False
+            raw, snapshot = {}, {}
+            try:
+                for name in mtimes:
+                    raw[name] = OmegaConf.to_container(OmegaConf.load(self.conf_dir / f"{name}.yaml"), resolve=True)
+                    snapshot[name] = compile_config(raw[name], name)
+            except Exception as e:
+                if not self._snapshot:
+                    raise
+                logger.error("Keeping the previous configuration, %s failed to load: %s", self.conf_dir, e)
+                self._mtimes = mtimes
+                return False
+            self._raw, self._snapshot = raw, snapshot
+            self._mtimes = mtimes
+            self.version += 1
+        logger.info("Loaded configuration v%s: %s", self.version, ', '.join(snapshot))
+        return True
+
+    def get(self, name: str) -> Node:
+        """Current compiled snapshot of `name`.yaml, the same object until the file changes."""
+        snapshot = self._snapshot
+        if not snapshot:
+            self.reload()
+            snapshot = self._snapshot
+        return snapshot[name]
+
+    def raw(self, name: str) -> dict:
+        """`name`.yaml as loaded, for consumers expecting plain containers such as hydra or yaml dumps."""
+        self.get(name)
+        return self._raw[name]
+
+    def view(self, name: str) -> ConfigView:
+        return ConfigView(self, name)
+
+    def watch(self) -> None:
+        """Start a daemon thread that reloads the configuration when a file changes."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error("Failed to reload configuration: %s", e)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+
+settings = ConfigService()
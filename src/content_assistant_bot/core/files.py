@@ -1,10 +1,129 @@
 import base64
 import io
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Union
 
-from PIL import Image
+if TYPE_CHECKING:
+    from PIL import Image
 
+# Vision models tile or downscale anything larger, so bigger images only cost upload time and tokens
+DEFAULT_MAX_SIDE = 1024
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
 
-def image_to_base64(image: Image) -> str:
+
+class EncodedImage:
+    def __init__(self, data: bytes, image_format: str, size: tuple[int, int]) -> None:
+        """ Image ready to be sent to a model
+
+        Args:
+            data (bytes): Encoded image
+            image_format (str): PIL format name, e.g. "JPEG"
+            size (tuple[int, int]): Width and height in pixels
+        """
+        self.data = data
+        self.format = image_format
+        self.size = size
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.format]
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.data).decode()
+
+    def to_data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.to_base64()}"
+
+
+def encode_image(
+    image: Union["Image.Image", bytes],
+    max_side: int = DEFAULT_MAX_SIDE,
+    image_format: str = "JPEG",
+    quality: int = 85,
+) -> EncodedImage:
+    """
+    Downscale an image to `max_side`, drop its metadata and encode it lossily.
+
+    Args:
+        image (Image | bytes): Image, or the bytes of an image file
+        max_side (int): Longest side in pixels after downscaling
+        image_format (str): "JPEG" or "WEBP"
+        quality (int): Encoder quality, 1-100
+
+    Returns:
+        EncodedImage: The encoded image.
+    """
+    # Imported on first photo rather than at startup
+    from PIL import Image, ImageOps
+
+    if isinstance(image, bytes):
+        image = Image.open(io.BytesIO(image))
+        # JPEG decoders can scale by 1/2-1/8 while decoding, far cheaper than resizing afterwards
+        image.draft("RGB", (max_side, max_side))
+    # Phone photos store their rotation in EXIF, apply it before the metadata is dropped
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    buffered = io.BytesIO()
+    # No exif or icc_profile is passed, so the output carries no metadata
+    image.save(buffered, format=image_format, quality=quality, optimize=image_format == "JPEG")
+    return EncodedImage(buffered.getvalue(), image_format, image.size)
+
+
+class ImageCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """ Encoded images by Telegram file_id, least recently used dropped first
+
+        Args:
+            max_bytes (int): Total size of the cached images
+        """
+        self.max_bytes = max_bytes
+        self._images: OrderedDict[tuple, EncodedImage] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[EncodedImage]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key: tuple, image: EncodedImage) -> None:
+        with self._lock:
+            previous = self._images.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.data)
+            self._images[key] = image
+            self._size += len(image.data)
+            while self._size > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._size -= len(evicted.data)
+
+
+image_cache = ImageCache()
+
+
+def select_photo_size(photo_sizes: list, max_side: int):
+    """Smallest of the sizes Telegram keeps for a photo that still covers `max_side`, to download less."""
+    photo_sizes = sorted(photo_sizes, key=lambda size: max(size.width, size.height))
+    for size in photo_sizes:
+        if max(size.width, size.height) >= max_side:
+            return size
+    return photo_sizes[-1]
+
+
+def image_to_base64(image: "Image.Image") -> str:
     """
     Converts a PIL Image to a base64 string.
 
@@ -12,8 +131,6 @@ def image_to_base64(image: Image) -> str:
         image (Image): The image to convert.
 
     Returns:
-        str: Base64 encoded string of the image.
+        str: Base64 encoded string of the image, downscaled JPEG.
     """
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")  # or any other format
-    return base64.b64encode(buffered.getvalue()).decode()
+    return encode_image(image).to_base64()
@@ -0,0 +1,106 @@
+"""Keep chat histories within a token budget by folding older turns into a digest."""
+import logging
+from typing import Awaitable, Callable, Optional
+
+from content_assistant_bot.api.schemas import Message
+from content_assistant_bot.core.tokens import TokenCounter, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Role of the digest message, sent to the model as a user message
+SUMMARY_ROLE = "summary"
+
+
+def extract_digest(messages: list[Message]) -> str:
+    """Digest without a model call: the first line of every paragraph, i.e. the idea titles."""
+    lines = []
+    for message in messages:
+        if message.role == "user":
+            continue
+        for paragraph in message.content.split("\n\n"):
+            line = paragraph.strip().split("\n", 1)[0].strip()
+            if line:
+                lines.append(line)
+    return "\n".join(lines)
+
+
+class HistoryCompactor:
+    def __init__(self, max_tokens: int, digest_tokens: int, count: TokenCounter, digest_prefix: str = "") -> None:
+        """ Token budget of a chat history
+
+        Once a history exceeds `max_tokens`, the turns between the first message (the topic)
+        and the newest ones that fit are folded, together with any earlier digest, into one
+        digest of at most `digest_tokens`. The prompt stays within the budget however long
+        the conversation goes on.
+
+        Args:
+            max_tokens (int): Token budget of the history, excluding the system prompt
+            digest_tokens (int): Token budget of the digest
+            count (TokenCounter): Token counter of the model
+            digest_prefix (str): Text put before the digest, telling the model what it is
+        """
+        if digest_tokens * 2 > max_tokens:
+            raise ValueError("digest_tokens must be at most half of max_tokens")
+        self.max_tokens = max_tokens
+        self.digest_tokens = digest_tokens
+        self.count = count
+        self.digest_prefix = digest_prefix
+
+    def count_history(self, history: list[Message]) -> int:
+        return sum(self.count(message.content) for message in history)
+
+    def split(self, history: list[Message]) -> Optional[tuple[Message, list[Message], list[Message]]]:
+        """Return (topic, messages to fold, messages kept), or None if the history fits."""
+        if len(history) < 2 or self.count_history(history) <= self.max_tokens:
+            return None
+        topic, rest = history[0], history[1:]
+        available = self.max_tokens - min(self.count(topic.content), self.max_tokens // 2) - self.digest_tokens
+        kept, used = [], 0
+        for message in reversed(rest):
+            cost = self.count(message.content)
+            # The newest message is always kept, the older ones while they fit
+            if kept and used + cost > available:
+                break
+            kept.insert(0, message)
+            used += cost
+        fold = rest[: len(rest) - len(kept)]
+        if not fold:
+            return None
+        return topic, fold, kept
+
+    def _assemble(self, topic: Message, digest: str, kept: list[Message]) -> list[Message]:
+        topic = topic.model_copy(update={"content": truncate_tokens(topic.content, self.max_tokens // 2, self.count)})
+        digest = truncate_tokens(self.digest_prefix + digest, self.digest_tokens, self.count)
+        return [topic, Message(role=SUMMARY_ROLE, content=digest)] + kept
+
+    def compact(self, history: list[Message], summarize: Callable[[list[Message], int], str]) -> list[Message]:
+        """Fold older turns with `summarize(messages, max_tokens)`, falling back to `extract_digest`."""
+        parts = self.split(history)
+        if parts is None:
+            return history
+        topic, fold, kept = parts
+        try:
+            digest = summarize(fold, self.digest_tokens)
+        except Exception as e:
+            logger.warning("Failed to summarise chat history, using extracted digest: %s", e)
+            digest = extract_digest(fold)
+        compacted = self._assemble(topic, digest, kept)
+        logger.info(
+            "Compacted chat history from %s to %s tokens", self.count_history(history), self.count_history(compacted)
+        )
+        return compacted
+
+    async def acompact(
+        self, history: list[Message], summarize: Callable[[list[Message], int], Awaitable[str]]
+    ) -> list[Message]:
+        """Asynchronous `compact`."""
+        parts = self.split(history)
+        if parts is None:
+            return history
+        topic, fold, kept = parts
+        try:
+            digest = await summarize(fold, self.digest_tokens)
+        except Exception as e:
+            logger.warning("Failed to summarise chat history, using extracted digest: %s", e)
+            digest = extract_digest(fold)
+        return self._assemble(topic, digest, kept)
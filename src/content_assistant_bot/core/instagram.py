@@ -1,21 +1,41 @@
 import logging
+import os
 import random
+import threading
+from typing import Optional
 
-from instagrapi import Client
+from dotenv import find_dotenv, load_dotenv
+
+from content_assistant_bot.core.metrics import histogram
+from content_assistant_bot.core.tracing import traced
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+request_seconds = histogram("bot_instagram_seconds", "Duration of InstagramWrapper calls", ["method", "status"])
+
 class InstagramWrapper:
-    def __init__(self, login: str, password: str):
+    def __init__(self, login: str, password: str, session_path: Optional[str] = None):
         if not login or not password:
             raise ValueError("Login and password are required")
+        # instagrapi pulls in half a second of imports, paid by the first Instagram request instead of startup
+        from instagrapi import Client
+
         self.client = Client()
-        if self.client.login(login, password):
-            logger.info(f"Logged in as {login}")
+        # A saved session skips the full login flow and the checks Instagram runs on new devices
+        if session_path and os.path.exists(session_path):
+            self.client.load_settings(session_path)
+            logger.info("Restored Instagram session from %s", session_path)
+        with request_seconds.time("login"):
+            logged_in = self.client.login(login, password)
+        if logged_in:
+            logger.info("Logged in as %s", login)
         else:
             raise ValueError("Instagram client login failed")
+        if session_path:
+            self.client.dump_settings(session_path)
 
+    @traced("instagram.user_exists")
+    @request_seconds.timed("user_exists")
     def user_exists(self, username: str):
         try:
             print(f"Username: {username}")
@@ -24,6 +44,8 @@ class InstagramWrapper:
         except:
             False
 
+    @traced("instagram.fetch_user_reels")
+    @request_seconds.timed("fetch_user_reels")
     def fetch_user_reels(self, username: str, n_media_items: int = 100, estimate_view_count: bool = False):
         try:
             user_id = self.client.user_id_from_username(username)
@@ -63,6 +85,8 @@ class InstagramWrapper:
                 reels.append(reel_item)
         return {"status": 200, "data": reels}
 
+    @traced("instagram.fetch_hashtag_reels")
+    @request_seconds.timed("fetch_hashtag_reels")
     def fetch_hashtag_reels(self, hashtag: str, n_media_items: int = 100, estimate_view_count: bool = False):
         media_list = self.client.hashtag_medias_top(hashtag, amount=n_media_items)
         if not media_list:
@@ -91,5 +115,23 @@ class InstagramWrapper:
                 if estimate_view_count:
                     reel_item["estimated_view_count"] = reel_item["likes"] * 100 + random.randint(100, 1000)
                 reels.append(reel_item)
-        logger.info(f"Found {len(reels)} reels for hashtag {hashtag}")
+        logger.info("Found %s reels for hashtag %s", len(reels), hashtag)
         return {"status": 200, "data": reels}
+
+
+_client: Optional[InstagramWrapper] = None
+_client_lock = threading.Lock()
+
+
+def get_instagram_client() -> InstagramWrapper:
+    """Return the process-wide Instagram client, logging in on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            load_dotenv(find_dotenv(usecwd=True))
+            username = os.getenv("INSTAGRAM_USERNAME")
+            password = os.getenv("INSTAGRAM_PASSWORD")
+            if not username or not password:
+                raise ValueError("Instagram credentials not found in environment variables")
+            _client = InstagramWrapper(username, password, session_path=os.getenv("INSTAGRAM_SESSION_PATH"))
+        return _client
@@ -1,18 +1,115 @@
-from typing import Optional
-
-from langchain_core.messages import AIMessage, HumanMessage
-from langchain_fireworks import ChatFireworks
-from langchain_openai import ChatOpenAI
-from PIL.Image import Image
+import importlib
+import threading
+from typing import TYPE_CHECKING, Optional, Union
 
 from content_assistant_bot.api.schemas import Message, ModelConfig, ModelResponse
-from content_assistant_bot.core.files import image_to_base64
+from content_assistant_bot.core.files import EncodedImage, encode_image
+from content_assistant_bot.core.history import SUMMARY_ROLE
+from content_assistant_bot.core.metrics import counter, histogram
+from content_assistant_bot.core.routing import LLMRouter
+from content_assistant_bot.core.tracing import span, start_span
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from PIL.Image import Image
+
+# Provider SDKs take about a second each to import, so a client class is imported on first use
+CLIENTS: dict[str, Union[str, type]] = {
+    "openai": "langchain_openai.ChatOpenAI",
+    "fireworksai": "langchain_fireworks.ChatFireworks",
+}
+
+# Chat clients own their HTTP connection pools, so reusing them keeps connections alive between requests
+_client_registry: dict[tuple, "BaseChatModel"] = {}
+_client_registry_lock = threading.Lock()
+
+
+def get_client_class(provider: str) -> type:
+    """Chat model class of `provider`, imported from its dotted path on first use."""
+    client_class = CLIENTS[provider]
+    if isinstance(client_class, str):
+        module_name, _, class_name = client_class.rpartition(".")
+        client_class = getattr(importlib.import_module(module_name), class_name)
+        CLIENTS[provider] = client_class
+    return client_class
+
+
+def get_client(provider: str, model_name: str, max_tokens: Optional[int], temperature: float) -> "BaseChatModel":
+    """Return the shared client for these parameters, creating it on first use."""
+    key = (provider, model_name, max_tokens, temperature)
+    with _client_registry_lock:
+        client = _client_registry.get(key)
+        if client is None:
+            client = get_client_class(provider)(model_name=model_name, max_tokens=max_tokens, temperature=temperature)
+            _client_registry[key] = client
+        return client
+
+
+def clear_clients() -> None:
+    with _client_registry_lock:
+        _client_registry.clear()
+
+
+run_seconds = histogram(
+    "bot_llm_run_seconds", "Duration of LLM completions, until the last chunk when streamed", ["mode", "status"]
+)
+tokens_total = counter("bot_llm_tokens_total", "Tokens reported by the providers", ["model", "kind"])
+
+
+def record_usage(model_name: str, message) -> None:
+    """Count the tokens of a response or stream chunk that carries `usage_metadata`."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        tokens_total.inc(model_name, "input", amount=usage.get("input_tokens", 0))
+        tokens_total.inc(model_name, "output", amount=usage.get("output_tokens", 0))
+
+
+def observe_stream(stream, model_name: str):
+    """Pass the chunks of `stream` through, recording its duration and tokens once it is consumed."""
+    # Not made current: the consumer's own spans run between the chunks
+    stream_span = start_span("llm.stream", model=model_name)
+    error = None
+    try:
+        with run_seconds.time("stream"):
+            for chunk in stream:
+                record_usage(model_name, chunk)
+                yield chunk
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if stream_span is not None:
+            stream_span.end(error)
+
+
+async def aobserve_stream(stream, model_name: str):
+    """Asynchronous `observe_stream`."""
+    stream_span = start_span("llm.stream", model=model_name)
+    error = None
+    try:
+        with run_seconds.time("stream"):
+            async for chunk in stream:
+                record_usage(model_name, chunk)
+                yield chunk
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if stream_span is not None:
+            stream_span.end(error)
 
 
 class LLM:
-    def __init__(self, config: ModelConfig):  # noqa: D107
+    def __init__(self, config: ModelConfig, router: Optional[LLMRouter] = None):
+        """ Chat model wrapper
+
+        Args:
+            config (ModelConfig): Model configuration
+            router (LLMRouter): Routes requests over several providers, `config` alone is used if None
+        """
         self.config = config
-        self.clients = {"openai": ChatOpenAI, "fireworksai": ChatFireworks}
+        self.clients = CLIENTS
+        self.router = router
 
     def update_config(self, config: ModelConfig) -> None:
         """Update the model configuration"""
@@ -20,12 +117,7 @@ class LLM:
             if getattr(config, attr) is not None:
                 self.config.__setattr__(attr, getattr(config, attr))
 
-    def run(
-        self, chat_history: list[Message],
-        config: Optional[ModelConfig] = None,
-        image: Optional[Image] = None
-    ) -> ModelResponse:
-        """Run the model with the given chat history and configuration"""
+    def _resolve(self, config: Optional[ModelConfig]):
         if config is None and self.config is not None:
             config = self.config
         else:
@@ -35,12 +127,16 @@ class LLM:
         if provider not in self.clients:
             raise ValueError(f"Invalid provider: {provider}. Available providers: {', '.join(self.clients.keys())}")
 
-        client = self.clients[provider](
-            model_name=config.model_name, max_tokens=config.max_tokens, temperature=config.temperature
-        )
+        client = get_client(provider, config.model_name, config.max_tokens, config.temperature)
+        return config, client
+
+    def _build_messages(
+        self, chat_history: list[Message], config: ModelConfig, image: Optional[Union["Image", EncodedImage]] = None
+    ) -> list:
+        from langchain_core.messages import AIMessage, HumanMessage
 
         chat_history = chat_history[-config.chat_history_limit :]
-        role_message_map = {"user": HumanMessage, "assistant": AIMessage}
+        role_message_map = {"user": HumanMessage, "assistant": AIMessage, SUMMARY_ROLE: HumanMessage}
         messages = [
             role_message_map[message.role](content=[{"type": "text", "text": message.content}])
             for message in chat_history
@@ -57,17 +153,103 @@ class LLM:
         # Handle the image if provided
         if image:
             message = HumanMessage(content=[{"type": "text", "text": "Received the following image(s):"}])
-            image_base64 = image_to_base64(image)
+            # Images prepared by the handlers are already downscaled and encoded
+            encoded = image if isinstance(image, EncodedImage) else encode_image(image)
             message.content.append(
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"},
+                    "image_url": {"url": encoded.to_data_url()},
                 }
             )
             messages.append(message)
+        return messages
+
+    def run(
+        self, chat_history: list[Message],
+        config: Optional[ModelConfig] = None,
+        image: Optional[Union["Image", EncodedImage]] = None
+    ) -> ModelResponse:
+        """Run the model with the given chat history and configuration"""
+        config, client = self._resolve(config)
+        messages = self._build_messages(chat_history, config, image)
+
+        if self.router is not None:
+            return self._run_routed(messages, config.stream)
+        if config.stream:
+            return observe_stream(client.stream(messages), config.model_name)
+        else:
+            with span("llm.invoke", model=config.model_name), run_seconds.time("invoke"):
+                response = client.invoke(messages)
+            record_usage(config.model_name, response)
+            return ModelResponse(response_content=response.content, config=config)
+
+    async def arun(
+        self, chat_history: list[Message],
+        config: Optional[ModelConfig] = None,
+        image: Optional[Union["Image", EncodedImage]] = None
+    ) -> ModelResponse:
+        """Asynchronous `run`: waits on the provider without holding a thread"""
+        config, client = self._resolve(config)
+        messages = self._build_messages(chat_history, config, image)
 
+        if self.router is not None:
+            return await self._arun_routed(messages, config.stream)
         if config.stream:
-            return client.stream(messages)
+            return aobserve_stream(client.astream(messages), config.model_name)
         else:
-            response = client.invoke(messages)
+            with span("llm.invoke", model=config.model_name), run_seconds.time("invoke"):
+                response = await client.ainvoke(messages)
+            record_usage(config.model_name, response)
             return ModelResponse(response_content=response.content, config=config)
+
+    def _build_summary_messages(self, chat_history: list[Message], prompt: str) -> list:
+        from langchain_core.messages import HumanMessage
+
+        text = "\n\n".join(message.content for message in chat_history)
+        return [HumanMessage(content=prompt), HumanMessage(content=text)]
+
+    def summarize(self, chat_history: list[Message], prompt: str, max_tokens: int) -> str:
+        """Condense messages into at most `max_tokens` with the configured model, never streamed"""
+        client = get_client(self.config.provider, self.config.model_name, max_tokens, 0.0)
+        return client.invoke(self._build_summary_messages(chat_history, prompt)).content
+
+    async def asummarize(self, chat_history: list[Message], prompt: str, max_tokens: int) -> str:
+        """Asynchronous `summarize`"""
+        client = get_client(self.config.provider, self.config.model_name, max_tokens, 0.0)
+        return (await client.ainvoke(self._build_summary_messages(chat_history, prompt))).content
+
+    def warm_up(self) -> None:
+        """Create the client of every route ahead of the first request, which also imports the provider SDKs."""
+        routes = self.router.routes if self.router is not None else [self.config]
+        for route in routes:
+            self._get_route_client(route)
+
+    @staticmethod
+    def _get_route_client(route: ModelConfig) -> "BaseChatModel":
+        return get_client(route.provider, route.model_name, route.max_tokens, route.temperature)
+
+    def _run_routed(self, messages: list, stream: bool):
+        if stream:
+            return observe_stream(
+                self.router.stream(lambda route: self._get_route_client(route).stream(messages)), "routed"
+            )
+        with span("llm.invoke", model="routed"), run_seconds.time("invoke"):
+            response, route = self.router.invoke(
+                lambda route: (self._get_route_client(route).invoke(messages), route)
+            )
+        record_usage(route.model_name, response)
+        return ModelResponse(response_content=response.content, config=route)
+
+    async def _arun_routed(self, messages: list, stream: bool):
+        if stream:
+            return aobserve_stream(
+                self.router.astream(lambda route: self._get_route_client(route).astream(messages)), "routed"
+            )
+
+        async def call(route: ModelConfig):
+            return await self._get_route_client(route).ainvoke(messages), route
+
+        with span("llm.invoke", model="routed"), run_seconds.time("invoke"):
+            response, route = await self.router.ainvoke(call)
+        record_usage(route.model_name, response)
+        return ModelResponse(response_content=response.content, config=route)
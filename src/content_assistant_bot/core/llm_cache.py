@@ -0,0 +1,88 @@
+"""Database cache of LLM completions keyed by a normalised user query."""
+import hashlib
+import json
+import logging
+import random
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from content_assistant_bot.api.schemas import ModelConfig
+from content_assistant_bot.db import crud
+from content_assistant_bot.db.models import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+_punctuation = re.compile(r"[^\w\s]", re.UNICODE)
+_whitespace = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1)
+def _get_morph_analyzer():
+    try:
+        import pymorphy3
+    except ImportError:
+        logger.warning("pymorphy3 is not installed, cache keys are not lemmatised")
+        return None
+    return pymorphy3.MorphAnalyzer()
+
+
+def normalize_query(query: str, lemmatize: bool = False) -> str:
+    """Fold case, punctuation and whitespace, and optionally reduce words to their lemmas.
+
+    "Фитнес-тренер!!" and "фитнес тренер" give the same key; with `lemmatize`,
+    so does "фитнес тренера".
+    """
+    query = unicodedata.normalize("NFKC", query).lower().replace("ё", "е")
+    query = _punctuation.sub(" ", query).replace("_", " ")
+    words = _whitespace.sub(" ", query).strip().split(" ")
+    if lemmatize and (morph := _get_morph_analyzer()) is not None:
+        words = [morph.parse(word)[0].normal_form for word in words]
+    return " ".join(words)
+
+
+def make_cache_key(query: str, config: ModelConfig, lemmatize: bool = False) -> str:
+    """Key of a query for a model: the same query under another prompt or model params is another entry."""
+    model = json.dumps(
+        [config.provider, config.model_name, config.max_tokens, config.temperature, config.system_prompt]
+    )
+    return hashlib.sha256(f"{normalize_query(query, lemmatize)}\x00{model}".encode()).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, ttl_seconds: float, max_entries: int, max_variants: int = 3) -> None:
+        """ Completions cached in the `llm_cache` table
+
+        Args:
+            ttl_seconds (float): Age after which an entry is no longer served
+            max_entries (int): Entries kept in total, the least recently used are evicted above it
+            max_variants (int): Different completions stored per key
+        """
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.max_variants = max_variants
+
+    def get(self, key: str, exclude: Iterable[int] = ()) -> Optional[LLMCacheEntry]:
+        """Return a cached variant the caller has not seen yet, or None."""
+        exclude = set(exclude)
+        entries = [
+            entry for entry in crud.get_cache_entries(key, datetime.now() - self.ttl) if entry.id not in exclude
+        ]
+        if not entries:
+            return None
+        # Spread the variants over users instead of showing everyone the first one
+        entry = random.choice(entries)
+        crud.touch_cache_entry(entry.id)
+        return entry
+
+    def put(self, key: str, query: str, response: str) -> Optional[LLMCacheEntry]:
+        """Store a new variant, unless the key already has `max_variants` of them."""
+        if len(crud.get_cache_entries(key, datetime.now() - self.ttl)) >= self.max_variants:
+            return None
+        entry = crud.add_cache_entry(key, query, response)
+        evicted = crud.evict_cache_entries(datetime.now() - self.ttl, self.max_entries)
+        if evicted:
+            logger.info("Evicted %s LLM cache entries", evicted)
+        return entry
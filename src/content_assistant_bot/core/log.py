@@ -0,0 +1,183 @@
+"""Logging of every module through one queue, written by a background thread.
+
+`configure_logging` replaces the root handlers with a `QueueHandler`: the thread that logs only
+interpolates the message and adds the context of its update before putting the record on a
+bounded queue, a `QueueListener` thread formats it as a JSON line and writes it. When the queue
+is full records are dropped and counted instead of blocking a handler on a slow stderr.
+
+Records carry the fields bound with `log_context` in the current thread or task, the ids of the
+current trace and the `extra` passed to the call. Records with an `event` extra are sampled by
+`sample_rates`, warnings and errors are always written.
+
+    logger.info("User event: %s from '%s'", kind, username, extra={"event": "user_event", "text": preview(text)})
+"""
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import random
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Optional
+
+from content_assistant_bot.core.metrics import counter
+from content_assistant_bot.core.tracing import current_span
+from content_assistant_bot.core.utils import redact_secrets
+
+records_dropped = counter("log_records_dropped_total", "Log records not written, by reason", ["reason"])
+
+_context: contextvars.ContextVar[dict] = contextvars.ContextVar("log_context", default={})
+
+# Attributes every LogRecord has, the rest came in with `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "context", "trace_id", "span_id"}
+
+max_text_length = 64
+
+
+def bind(**fields) -> contextvars.Token:
+    """Add fields to the records of the current thread or task until the token is reset."""
+    return _context.set({**_context.get(), **fields})
+
+
+def unbind(token: Optional[contextvars.Token]) -> None:
+    """Restore the fields from before `bind`, None when it was not called, e.g. a middleware failed first."""
+    if token is not None:
+        _context.reset(token)
+
+
+@contextmanager
+def log_context(**fields):
+    token = bind(**fields)
+    try:
+        yield
+    finally:
+        unbind(token)
+
+
+def preview(text: Optional[str], limit: Optional[int] = None) -> Optional[str]:
+    """The start of a user's text for a log line, None to log only its length.
+
+    Args:
+        text (str): Message text or callback data
+        limit (int): Characters kept, `max_text_length` from the config by default
+    """
+    limit = max_text_length if limit is None else limit
+    if not text or limit <= 0:
+        return None
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… ({len(text)} chars)"
+
+
+class ContextQueueHandler(QueueHandler):
+    def __init__(self, records: queue.Queue) -> None:
+        """ Puts records on a queue with the context of the thread that logged them
+
+        Args:
+            records (queue.Queue): Bounded queue read by the listener thread
+        """
+        super().__init__(records)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The arguments may change once the handler returns, everything else is formatted by the listener
+        record.msg = record.getMessage()
+        record.args = None
+        record.context = _context.get()
+        span = current_span()
+        if span is not None:
+            record.trace_id = span.trace.trace_id
+            record.span_id = span.span_id
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped.inc("queue_full")
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: dict, sample: Callable[[], float] = random.random) -> None:
+        """ Keeps a share of the records of high-volume events
+
+        Args:
+            rates (dict): Share of records written per `event` extra, events not listed are all written
+            sample (Callable): Uniform random numbers in [0, 1), replaceable in tests
+        """
+        super().__init__()
+        self.rates = rates
+        self.sample = sample
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or record.levelno >= logging.WARNING or self.sample() < rate:
+            return True
+        records_dropped.inc("sampled")
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, context, trace ids and extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact_secrets(record.getMessage()),
+        }
+        line.update(getattr(record, "context", {}))
+        for key in ("trace_id", "span_id"):
+            if hasattr(record, key):
+                line[key] = getattr(record, key)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                line[key] = value
+        if record.exc_info:
+            line["exception"] = redact_secrets(self.formatException(record.exc_info))
+        return json.dumps(line, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The usual one-line format, with the context fields appended, for reading in a terminal."""
+
+    def __init__(self) -> None:
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        context = getattr(record, "context", {})
+        if context:
+            text += " [" + " ".join(f"{key}={value}" for key, value in context.items()) + "]"
+        return redact_secrets(text)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(logging_config) -> QueueListener:
+    """Route this process's logging through the queue, from the `logging` section of config.yaml."""
+    global _listener, max_text_length
+    max_text_length = logging_config.max_text_length
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if logging_config.format == "json" else TextFormatter())
+    records = queue.Queue(maxsize=logging_config.queue_size)
+    handler = ContextQueueHandler(records)
+    handler.addFilter(SamplingFilter(dict(logging_config.sample_rates)))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(logging_config.level)
+
+    _listener = QueueListener(records, output)
+    _listener.start()
+    # Writes what is still queued when the process exits
+    atexit.register(_listener.stop)
+    return _listener
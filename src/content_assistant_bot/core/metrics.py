@@ -0,0 +1,252 @@
+"""Counters and latency histograms in the Prometheus text format, without a client library.
+
+Recording is a dict lookup and a few additions under a per-metric lock, one to two microseconds,
+so it is done on every handler call and request. Values that already live elsewhere, like
+queue depths, are read by callbacks only when `/metrics` is scraped.
+
+    handler_seconds = histogram("bot_handler_seconds", "Handler latency", ["handler"])
+
+    with handler_seconds.time("menu"):
+        ...
+"""
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Seconds, from a cached reply to an LLM completion
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+Labels = tuple[str, ...]
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        """ Monotonic count per label values
+
+        Args:
+            name (str): Metric name, ending in `_total`
+            documentation (str): HELP text
+            labelnames (Iterable[str]): Label names, values are passed positionally
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        """ Distribution of observed values per label values, with a `status` label for timings
+
+        Args:
+            name (str): Metric name, ending in the unit, e.g. `_seconds`
+            documentation (str): HELP text
+            labelnames (Iterable[str]): Label names, values are passed positionally
+            buckets (Iterable[float]): Upper bounds of the buckets, +Inf is added
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (last is +Inf), sum]
+        self._values: dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][idx] += 1
+            state[1] += value
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return sum(state[0]) if state else 0
+
+    @contextmanager
+    def time(self, *labels: str):
+        """Observe the duration of the block, with "ok" or "error" appended to `labels` as status."""
+        started = time.perf_counter()
+        status = "error"
+        try:
+            yield
+            status = "ok"
+        finally:
+            self.observe(time.perf_counter() - started, *labels, status)
+
+    def timed(self, *labels: str) -> Callable[[Callable], Callable]:
+        """Decorator timing a function or coroutine function like `time`."""
+        ok, error = labels + ("ok",), labels + ("error",)
+
+        # Spelled out instead of using `time`: a generator based context manager costs several microseconds
+        def decorator(function: Callable) -> Callable:
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def async_wrapper(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        result = await function(*args, **kwargs)
+                    except BaseException:
+                        self.observe(time.perf_counter() - started, *error)
+                        raise
+                    self.observe(time.perf_counter() - started, *ok)
+                    return result
+                return async_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = function(*args, **kwargs)
+                except BaseException:
+                    self.observe(time.perf_counter() - started, *error)
+                    raise
+                self.observe(time.perf_counter() - started, *ok)
+                return result
+            return wrapper
+
+        return decorator
+
+    def collect(self) -> list[str]:
+        with self._lock:
+            values = {labels: (list(state[0]), state[1]) for labels, state in self._values.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class GaugeCallback:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, dict[Labels, float]]],
+        labelnames: Iterable[str] = (),
+    ) -> None:
+        """ Current value read at scrape time, for numbers kept elsewhere such as queue depths
+
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            callback (Callable): Returns the value, or values by label values
+            labelnames (Iterable[str]): Label names of the values returned by `callback`
+        """
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def collect(self) -> list[str]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        """Metrics of the process, rendered together for a scrape."""
+        self._metrics: dict[str, Union[Counter, Histogram, GaugeCallback]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            # A module imported twice, or a gauge re-registered on restart, keeps one series
+            if existing is not None and not isinstance(metric, GaugeCallback):
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def metrics(self) -> list:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        metrics = self.metrics()
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.collect())
+            except Exception as e:
+                # One failing callback must not take the other metrics down
+                logger.warning("Failed to collect %s: %s", metric.name, e)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(
+    name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Optional[Iterable[float]] = None
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+
+def gauge_callback(
+    name: str, documentation: str, callback: Callable, labelnames: Iterable[str] = ()
+) -> GaugeCallback:
+    return REGISTRY.register(GaugeCallback(name, documentation, callback, labelnames))
@@ -0,0 +1,112 @@
+"""Per-user daily and rolling budgets of expensive resources, persisted in the `usage` table."""
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+import pytz
+
+from content_assistant_bot.db import crud
+
+logger = logging.getLogger(__name__)
+
+
+def utc_now() -> datetime:
+    """Naive UTC time, as stored in the database."""
+    return datetime.now(pytz.utc).replace(tzinfo=None)
+
+
+class Budget:
+    def __init__(self, resource: str, daily: int, rolling: int, rolling_hours: float) -> None:
+        """ How much of a resource one user may spend
+
+        Args:
+            resource (str): Resource name, e.g. "instagram" for requests or "llm_tokens"
+            daily (int): Amount per calendar day in the bot's timezone
+            rolling (int): Amount per sliding window, so a day's budget can not be spent in minutes
+            rolling_hours (float): Length of the sliding window
+        """
+        self.resource = resource
+        self.daily = daily
+        self.rolling = rolling
+        self.rolling_window = timedelta(hours=rolling_hours)
+
+    def limits(self) -> dict[str, int]:
+        return {"daily": self.daily, "rolling": self.rolling}
+
+
+class QuotaService:
+    def __init__(
+        self,
+        budgets: dict[str, Budget],
+        timezone: str = "UTC",
+        exempt_roles: Iterable[str] = ("admin",),
+        clock: Callable[[], datetime] = utc_now,
+    ) -> None:
+        """ Checks and records what users spend against their budgets
+
+        Args:
+            budgets (dict[str, Budget]): Budgets by resource, resources without one are unlimited
+            timezone (str): Timezone whose midnight starts a new day
+            exempt_roles (Iterable[str]): `User.role` values without budgets
+            clock (Callable): Naive UTC clock, replaceable in tests
+        """
+        self.budgets = budgets
+        self.timezone = pytz.timezone(timezone)
+        self.exempt_roles = frozenset(exempt_roles)
+        self.clock = clock
+
+    def windows(self, budget: Budget) -> dict[str, datetime]:
+        """Start of the current day and of the sliding window, in naive UTC."""
+        now = self.clock()
+        local_now = pytz.utc.localize(now).astimezone(self.timezone)
+        midnight = self.timezone.localize(local_now.replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0))
+        return {
+            "daily": midnight.astimezone(pytz.utc).replace(tzinfo=None),
+            "rolling": now - budget.rolling_window,
+        }
+
+    def usage(self, user_id: int, resource: str) -> dict[str, int]:
+        budget = self.budgets[resource]
+        return crud.get_usage(user_id, resource, self.windows(budget))
+
+    def check(self, user_id: int, role: Optional[str], resource: str, amount: int = 0) -> Optional[str]:
+        """Window whose budget `amount` more would exceed, "daily" or "rolling", or None if it fits.
+
+        With `amount` 0 the user only needs budget left, for costs known once the work is done.
+        """
+        budget = self.budgets.get(resource)
+        if budget is None or role in self.exempt_roles:
+            return None
+        used = self.usage(user_id, resource)
+        for window, limit in budget.limits().items():
+            if used[window] + amount > limit or used[window] >= limit:
+                logger.info(
+                    "User %s is over the %s %s budget: %s of %s", user_id, window, resource, used[window], limit
+                )
+                return window
+        return None
+
+    def charge(self, user_id: int, resource: str, amount: int) -> None:
+        if resource not in self.budgets or amount <= 0:
+            return
+        crud.add_usage(user_id, resource, amount, self.clock())
+
+    def top_users(self, resource: str, limit: int = 10) -> list[tuple[int, Optional[str], int]]:
+        """Users who spent the most of `resource` today."""
+        return crud.get_top_usage(resource, self.windows(self.budgets[resource])["daily"], limit)
+
+    def purge(self) -> int:
+        """Delete records no window looks at anymore."""
+        longest = max([timedelta(days=1)] + [budget.rolling_window for budget in self.budgets.values()])
+        # A day in the bot's timezone may have started up to a day ago, plus DST shifts
+        deleted = crud.delete_usage(self.clock() - longest - timedelta(days=1))
+        logger.info("Deleted %s usage records", deleted)
+        return deleted
+
+
+def build_quota_service(quota_config, timezone: str) -> QuotaService:
+    budgets = {
+        resource: Budget(resource, budget.daily, budget.rolling, budget.rolling_hours)
+        for resource, budget in quota_config.budgets.items()
+    }
+    return QuotaService(budgets, timezone, exempt_roles=quota_config.exempt_roles)
@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """ Thread-safe token bucket
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum burst size, defaults to `rate`
+            clock: Monotonic clock, replaceable in tests
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds to wait before retrying
+        """
+        with self.lock:
+            now = self.clock()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self._refill(now)
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Block until tokens are available.
+
+        Returns:
+            float: Total seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(tokens)
+            if delay == 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds`, e.g. after Telegram answered with `retry_after`."""
+        with self.lock:
+            now = self.clock()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0
+            self.updated_at = self.paused_until
+
+
+class Scope:
+    def __init__(self, name: str, rate_per_minute: float, burst: float) -> None:
+        """ Limit of one kind of operation, each user has a bucket per scope
+
+        Args:
+            name (str): Scope name, e.g. "instagram"
+            rate_per_minute (float): Cost units refilled per minute
+            burst (float): Cost a user may spend at once
+        """
+        if rate_per_minute <= 0 or burst <= 0:
+            raise ValueError(f"Scope {name} needs a positive rate and burst")
+        self.name = name
+        self.rate = rate_per_minute / 60
+        self.capacity = burst
+
+    @property
+    def refill_seconds(self) -> float:
+        """Time an empty bucket takes to fill, after which it is the same as a new one."""
+        return self.capacity / self.rate
+
+
+class MemoryBucketStore:
+    def __init__(self, ttl_seconds: float, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic) -> None:
+        """ Token buckets of one process, forgotten after `ttl_seconds` without use
+
+        Args:
+            ttl_seconds (float): Idle time after which a bucket is dropped
+            max_keys (int): Hard cap on buckets, the least recently used go first above it
+            clock (Callable): Monotonic clock, replaceable in tests
+        """
+        self.ttl = ttl_seconds
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (tokens, updated_at), least recently used first
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: Hashable, rate: float, capacity: float, cost: float) -> float:
+        """Take `cost` tokens from the bucket of `key`. Returns 0 if taken, otherwise seconds until they would be."""
+        with self._lock:
+            now = self.clock()
+            self._evict(now)
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            return wait
+
+    def _evict(self, now: float) -> None:
+        # The dict is in order of last use, so expired buckets are all at its front
+        while self._buckets:
+            key, (_, updated_at) = next(iter(self._buckets.items()))
+            if now - updated_at <= self.ttl and len(self._buckets) < self.max_keys:
+                return
+            del self._buckets[key]
+
+
+class DatabaseBucketStore:
+    def __init__(self, ttl_seconds: float, clock: Callable[[], float] = time.time) -> None:
+        """ Token buckets in the `rate_limit_buckets` table, shared by all bot processes
+
+        Args:
+            ttl_seconds (float): Idle time after which a bucket is deleted
+            clock (Callable): Wall clock, the processes must agree on it
+        """
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self._swept_at = clock()
+        self._lock = threading.Lock()
+
+    def take(self, key: Hashable, rate: float, capacity: float, cost: float) -> float:
+        from content_assistant_bot.db import crud
+
+        now = self.clock()
+        with self._lock:
+            sweep = now - self._swept_at > self.ttl
+            if sweep:
+                self._swept_at = now
+        if sweep:
+            deleted = crud.delete_idle_rate_limit_buckets(now - self.ttl)
+            logger.debug("Deleted %s idle rate limit buckets", deleted)
+        return crud.take_rate_limit_tokens(str(key), rate, capacity, cost, now)
+
+
+class RateLimiter:
+    def __init__(self, scopes: dict[str, Scope], store) -> None:
+        """ Cost-aware per-user limits, one token bucket per user and scope
+
+        Cheap navigation and expensive work are limited separately, so browsing menus
+        never uses up the allowance of an Instagram analysis and the other way round.
+
+        Args:
+            scopes (dict[str, Scope]): Limits by scope name
+            store (MemoryBucketStore | DatabaseBucketStore): Where the buckets are kept
+        """
+        self.scopes = scopes
+        self.store = store
+        self._stats = {name: {"allowed": 0, "limited": 0} for name in scopes}
+        self._lock = threading.Lock()
+
+    def check(self, scope: str, user_id: int, cost: float = 1) -> float:
+        """Charge `cost` to the user's bucket of `scope`.
+
+        Returns:
+            float: 0 if the operation may run, otherwise seconds until the user can afford it
+        """
+        limit = self.scopes.get(scope)
+        if limit is None:
+            return 0.0
+        # A cost above the burst could never be paid, it takes a full bucket instead
+        wait = self.store.take((scope, user_id), limit.rate, limit.capacity, min(cost, limit.capacity))
+        with self._lock:
+            self._stats[scope]["allowed" if wait == 0 else "limited"] += 1
+        return wait
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def build_rate_limiter(rate_limit_config, shared: bool = False) -> RateLimiter:
+    """Rate limiter for the `rate_limit` section of config.yaml, with buckets in the database when `shared`."""
+    scopes = {
+        name: Scope(name, scope.rate_per_minute, scope.burst) for name, scope in rate_limit_config.scopes.items()
+    }
+    ttl = rate_limit_config.ttl_seconds
+    refill = max((scope.refill_seconds for scope in scopes.values()), default=0)
+    if ttl < refill:
+        # Forgetting a bucket before it is full again would hand the user a fresh burst
+        logger.warning("rate_limit.ttl_seconds %s is below the longest refill time, using %.0f", ttl, refill)
+        ttl = refill
+    store = DatabaseBucketStore(ttl) if shared else MemoryBucketStore(ttl, rate_limit_config.max_keys)
+    return RateLimiter(scopes, store)
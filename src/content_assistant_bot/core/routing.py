@@ -0,0 +1,349 @@
+"""Route LLM requests to the fastest healthy provider, hedging slow ones and skipping failing ones."""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional, Sequence, TypeVar
+
+from content_assistant_bot.api.schemas import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class NoRouteAvailable(Exception):
+    """Raised when the circuit breaker of every route is open."""
+
+
+def get_route_name(route: ModelConfig) -> str:
+    return f"{route.provider}/{route.model_name}"
+
+
+def create_router(config: ModelConfig, routing) -> Optional["LLMRouter"]:
+    """Router over `config` and its fallbacks from a `routing` config section, None when routing is off."""
+    if routing is None or not routing.enabled or not routing.fallbacks:
+        return None
+    routes = [config] + [config.model_copy(update=dict(fallback)) for fallback in routing.fallbacks]
+    return LLMRouter(
+        routes,
+        hedge_delay=routing.hedge_delay_seconds,
+        max_hedges=routing.max_hedges,
+        alpha=routing.ewma_alpha,
+        failure_threshold=routing.failure_threshold,
+        open_seconds=routing.open_seconds,
+    )
+
+
+class RouteStats:
+    def __init__(self, alpha: float) -> None:
+        """ Rolling latency and error rate of one provider/model, with its circuit breaker
+
+        Args:
+            alpha (float): Weight of the newest sample in the moving averages
+        """
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+
+    def record_latency(self, latency: float) -> None:
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+
+    def record_success(self, latency: float) -> None:
+        self.record_latency(latency)
+        self.error_rate = (1 - self.alpha) * self.error_rate
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_failures += 1
+
+    @property
+    def score(self) -> float:
+        """Expected seconds to a good answer: latency inflated by the share of failed attempts."""
+        return (self.latency or 0.0) / max(1.0 - self.error_rate, 0.05)
+
+
+class Attempt:
+    def __init__(self, route: ModelConfig, started: float) -> None:
+        """ One request sent to a route
+
+        Args:
+            route (ModelConfig): Route the request went to
+            started (float): Clock time it was sent
+        """
+        self.route = route
+        self.started = started
+        self.abandoned = False
+
+
+class LLMRouter:
+    def __init__(
+        self,
+        routes: Sequence[ModelConfig],
+        hedge_delay: Optional[float] = 5.0,
+        max_hedges: int = 1,
+        alpha: float = 0.2,
+        failure_threshold: int = 3,
+        open_seconds: float = 60.0,
+        max_workers: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """ Latency-based routing over several provider/model configs
+
+        A request goes to the route with the best score. If no answer arrives within
+        `hedge_delay`, a duplicate goes to the next route and the first good answer wins.
+        A failed attempt fails over to the next route at once. After `failure_threshold`
+        consecutive failures a route's breaker opens: it gets no traffic for `open_seconds`,
+        then a single probe request decides whether it closes again.
+
+        Args:
+            routes (Sequence[ModelConfig]): Candidate configs, in order of preference until measured
+            hedge_delay (float): Seconds before a hedged duplicate is sent, None disables hedging
+            max_hedges (int): Duplicates in flight besides the first request
+            alpha (float): Weight of the newest sample in the moving averages
+            failure_threshold (int): Consecutive failures that open a route's breaker
+            open_seconds (float): How long an open breaker keeps the route out of rotation
+            max_workers (int): Threads running blocking requests
+            clock (Callable): Monotonic time source
+        """
+        if not routes:
+            raise ValueError("At least one route is required")
+        self.routes = list(routes)
+        self.hedge_delay = hedge_delay
+        self.max_hedges = max_hedges if hedge_delay is not None else 0
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.stats = {get_route_name(route): RouteStats(alpha) for route in self.routes}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-route")
+
+    def close(self) -> None:
+        """Stop accepting requests, the ones in flight still finish."""
+        self._executor.shutdown(wait=False)
+
+    def select(self) -> list[ModelConfig]:
+        """Routes to try, best first; unmeasured routes keep their configured order."""
+        now = self.clock()
+        available = []
+        with self._lock:
+            for idx, route in enumerate(self.routes):
+                stats = self.stats[get_route_name(route)]
+                probe = stats.opened_at is not None
+                if probe:
+                    if now - stats.opened_at < self.open_seconds:
+                        continue
+                    # Half-open: this request probes the route first, the next probe waits another cooldown
+                    stats.opened_at = now
+                available.append((not probe, stats.score, idx, route))
+        return [item[-1] for item in sorted(available, key=lambda item: item[:3])]
+
+    def record_success(self, route: ModelConfig, latency: float) -> None:
+        name = get_route_name(route)
+        with self._lock:
+            stats = self.stats[name]
+            if stats.opened_at is not None:
+                logger.info("Circuit breaker of %s closed", name)
+            stats.record_success(latency)
+
+    def record_abandoned(self, attempt: "Attempt") -> None:
+        """A request that lost to a hedge took at least this long, which is what ranks its route lower."""
+        attempt.abandoned = True
+        with self._lock:
+            self.stats[get_route_name(attempt.route)].record_latency(self.clock() - attempt.started)
+
+    def record_failure(self, route: ModelConfig) -> None:
+        name = get_route_name(route)
+        with self._lock:
+            stats = self.stats[name]
+            stats.record_failure()
+            if stats.consecutive_failures >= self.failure_threshold:
+                if stats.opened_at is None:
+                    logger.warning("Circuit breaker of %s opened after %s failures", name, stats.consecutive_failures)
+                stats.opened_at = self.clock()
+
+    def snapshot(self) -> dict[str, dict]:
+        """Current latency, error rate and breaker state per route, for logs and admin views."""
+        with self._lock:
+            return {
+                name: {
+                    "latency": stats.latency,
+                    "error_rate": round(stats.error_rate, 3),
+                    "open": stats.opened_at is not None,
+                }
+                for name, stats in self.stats.items()
+            }
+
+    def _timed(self, call: Callable[[ModelConfig], T], attempt: "Attempt") -> T:
+        attempt.started = self.clock()
+        try:
+            result = call(attempt.route)
+        except Exception as e:
+            if not attempt.abandoned:
+                self.record_failure(attempt.route)
+            logger.warning("LLM request to %s failed: %s", get_route_name(attempt.route), e)
+            raise
+        if not attempt.abandoned:
+            self.record_success(attempt.route, self.clock() - attempt.started)
+        return result
+
+    def _select_or_raise(self) -> list[ModelConfig]:
+        routes = self.select()
+        if not routes:
+            raise NoRouteAvailable(", ".join(self.stats))
+        return routes
+
+    def invoke(self, call: Callable[[ModelConfig], T], discard: Optional[Callable[[T], None]] = None) -> T:
+        """Run `call(route)` on the best route with hedging and failover, return the first good result.
+
+        A hedge that has not started yet is cancelled; one already waiting on the provider
+        cannot be interrupted from here, so its result is passed to `discard` and dropped.
+        """
+        routes = self._select_or_raise()
+        pending: dict[Future, Attempt] = {}
+        launched = 0
+        error: Optional[Exception] = None
+        hedges = 0
+
+        def launch() -> None:
+            nonlocal launched
+            route = routes[launched]
+            launched += 1
+            attempt = Attempt(route, self.clock())
+            pending[self._executor.submit(self._timed, call, attempt)] = attempt
+
+        def drop(future: Future) -> None:
+            if not future.cancelled() and future.exception() is None and discard is not None:
+                discard(future.result())
+
+        launch()
+        while pending:
+            can_hedge = hedges < self.max_hedges and launched < len(routes)
+            done, _ = wait(pending, timeout=self.hedge_delay if can_hedge else None, return_when=FIRST_COMPLETED)
+            if not done:
+                hedges += 1
+                launch()
+                logger.info("Hedging LLM request to %s", get_route_name(routes[launched - 1]))
+                continue
+            winner = None
+            for future in done:
+                pending.pop(future)
+                if future.exception() is not None:
+                    error = future.exception()
+                elif winner is None:
+                    winner = future
+                else:
+                    drop(future)
+            if winner is not None:
+                for loser, attempt in pending.items():
+                    if not loser.cancel():
+                        self.record_abandoned(attempt)
+                        loser.add_done_callback(drop)
+                return winner.result()
+            if not pending and launched < len(routes):
+                launch()
+        raise error
+
+    async def _atimed(self, call: Callable[[ModelConfig], Awaitable[T]], attempt: "Attempt") -> T:
+        try:
+            result = await call(attempt.route)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.record_failure(attempt.route)
+            logger.warning("LLM request to %s failed: %s", get_route_name(attempt.route), e)
+            raise
+        self.record_success(attempt.route, self.clock() - attempt.started)
+        return result
+
+    async def ainvoke(
+        self, call: Callable[[ModelConfig], Awaitable[T]], discard: Optional[Callable[[T], Awaitable[None]]] = None
+    ) -> T:
+        """Asynchronous `invoke`: the losing requests are cancelled, which closes their connections."""
+        routes = self._select_or_raise()
+        pending: dict[asyncio.Task, Attempt] = {}
+        launched = 0
+        error: Optional[Exception] = None
+        hedges = 0
+
+        def launch() -> None:
+            nonlocal launched
+            route = routes[launched]
+            launched += 1
+            attempt = Attempt(route, self.clock())
+            pending[asyncio.ensure_future(self._atimed(call, attempt))] = attempt
+
+        launch()
+        try:
+            while pending:
+                can_hedge = hedges < self.max_hedges and launched < len(routes)
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.hedge_delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedges += 1
+                    launch()
+                    logger.info("Hedging LLM request to %s", get_route_name(routes[launched - 1]))
+                    continue
+                winner = None
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                    elif discard is not None:
+                        await discard(task.result())
+                if winner is not None:
+                    for attempt in pending.values():
+                        self.record_abandoned(attempt)
+                    return winner.result()
+                if not pending and launched < len(routes):
+                    launch()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stream(self, call: Callable[[ModelConfig], Iterator]) -> Iterator:
+        """Route a streamed completion: hedging and failover apply until the first chunk arrives.
+
+        Latency of a stream is its time to the first chunk; a failure later in the stream
+        counts against the route that produced it.
+        """
+
+        def open_stream(route: ModelConfig):
+            iterator = iter(call(route))
+            return route, iterator, next(iterator)
+
+        route, iterator, first = self.invoke(open_stream, discard=lambda opened: opened[1].close())
+        yield first
+        try:
+            yield from iterator
+        except Exception:
+            self.record_failure(route)
+            raise
+
+    async def astream(self, call: Callable[[ModelConfig], AsyncIterator]) -> AsyncIterator:
+        """Asynchronous `stream`."""
+
+        async def open_stream(route: ModelConfig):
+            iterator = call(route).__aiter__()
+            return route, iterator, await iterator.__anext__()
+
+        async def close_stream(opened) -> None:
+            await opened[1].aclose()
+
+        route, iterator, first = await self.ainvoke(open_stream, discard=close_stream)
+        yield first
+        try:
+            async for chunk in iterator:
+                yield chunk
+        except Exception:
+            self.record_failure(route)
+            raise
@@ -0,0 +1,74 @@
+"""Application-wide background scheduler backed by the bot database."""
+import logging
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.db.database import get_engine
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+config = settings.view("config")
+
+logger = logging.getLogger(__name__)
+
+_scheduler: Optional["BackgroundScheduler"] = None
+_lock = threading.Lock()
+_stop_polling = threading.Event()
+
+
+def get_scheduler() -> "BackgroundScheduler":
+    """Return the shared scheduler, creating it on first use.
+
+    Jobs are persisted in the `apscheduler_jobs` table, so their callables must be
+    importable module-level functions and their arguments must be picklable.
+    """
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            from apscheduler.executors.pool import ThreadPoolExecutor
+            from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+            from apscheduler.schedulers.background import BackgroundScheduler
+
+            _scheduler = BackgroundScheduler(
+                jobstores={"default": SQLAlchemyJobStore(engine=get_engine(), tablename="apscheduler_jobs")},
+                executors={"default": ThreadPoolExecutor(max_workers=config.scheduler.max_workers)},
+                job_defaults={
+                    "coalesce": config.scheduler.coalesce,
+                    "max_instances": config.scheduler.max_instances,
+                    "misfire_grace_time": config.scheduler.misfire_grace_time,
+                },
+                timezone=config.timezone,
+            )
+        return _scheduler
+
+
+def start_scheduler(paused: bool = False, poll_seconds: Optional[float] = None) -> "BackgroundScheduler":
+    """Start the shared scheduler.
+
+    Bot worker processes start it paused: their jobs are written to the job store and run by
+    the front process, which polls the store every `poll_seconds` to pick up jobs added elsewhere.
+    """
+    scheduler = get_scheduler()
+    if not scheduler.running:
+        scheduler.start(paused=paused)
+        logger.info("Scheduler started with %s persisted jobs", len(scheduler.get_jobs()))
+        if poll_seconds:
+            _stop_polling.clear()
+            threading.Thread(
+                target=_poll_job_store, args=(scheduler, poll_seconds), name="scheduler-poll", daemon=True
+            ).start()
+    return scheduler
+
+
+def _poll_job_store(scheduler: "BackgroundScheduler", poll_seconds: float) -> None:
+    while not _stop_polling.wait(poll_seconds):
+        scheduler.wakeup()
+
+
+def shutdown_scheduler(wait: bool = True) -> None:
+    _stop_polling.set()
+    if _scheduler is not None and _scheduler.running:
+        _scheduler.shutdown(wait=wait)
+        logger.info("Scheduler stopped")
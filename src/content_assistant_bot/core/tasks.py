@@ -0,0 +1,230 @@
+"""Bounded worker pool for slow blocking work (Instagram, LLM) with per-user limits and fair scheduling."""
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from content_assistant_bot.core.log import log_context
+from content_assistant_bot.core.tracing import activate, start_span
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task after its owner cancelled it."""
+
+
+class TaskRejected(Exception):
+    """Raised by `TaskQueue.submit` when the user or the queue is at capacity."""
+
+    def __init__(self, reason: str):  # noqa: D107
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Task:
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        user_id: int,
+        fn: Callable,
+        args: tuple,
+        kwargs: dict,
+        name: Optional[str] = None,
+        weight: float = 1,
+        cost: float = 1,
+    ):
+        """ Unit of background work owned by a user
+
+        Args:
+            user_id (int): Owner, used for concurrency limits and cancellation
+            fn (Callable): Called as `fn(task, *args, **kwargs)`
+            args (tuple): Positional arguments for `fn`
+            kwargs (dict): Keyword arguments for `fn`
+            name (str): Name used in logs and metrics
+            weight (float): Share of the workers the owner gets while others wait, e.g. higher for admins
+            cost (float): Relative size of the work, e.g. the number of videos to analyse
+        """
+        self.id = next(self._ids)
+        self.user_id = user_id
+        self.span = None
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name or getattr(fn, "__name__", "task")
+        self.weight = weight
+        self.cost = cost
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.status = "queued"
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    def check_cancelled(self) -> None:
+        """Call between blocking steps to stop early once the user pressed cancel."""
+        if self.cancelled:
+            raise TaskCancelled(self.name)
+
+
+class FairQueue(queue.Queue):
+    """Weighted fair queue of tasks: start-time fair queuing across users.
+
+    A task is tagged with a virtual start time, the later of the queue's virtual time and its
+    owner's previous finish tag, and finishes `cost / weight` after it. Tasks are served in
+    order of their start tags, so a user who just ran a 30-video analysis waits behind everyone
+    who has used less, while a user alone on the queue is served at once.
+    """
+
+    def _init(self, maxsize: int) -> None:
+        self.heap: list[tuple[float, int, Task]] = []
+        self.virtual_time = 0.0
+        self.finish_tags: dict[int, float] = {}
+        self.seq = itertools.count()
+
+    def _qsize(self) -> int:
+        return len(self.heap)
+
+    def _put(self, task: Task) -> None:
+        start = max(self.virtual_time, self.finish_tags.get(task.user_id, 0.0))
+        self.finish_tags[task.user_id] = start + task.cost / task.weight
+        heapq.heappush(self.heap, (start, next(self.seq), task))
+
+    def _get(self) -> Task:
+        start, _, task = heapq.heappop(self.heap)
+        self.virtual_time = start
+        if len(self.finish_tags) > 2 * len(self.heap) + 64:
+            # A tag the virtual time has passed is replaced by the virtual time anyway
+            self.finish_tags = {
+                user_id: finish for user_id, finish in self.finish_tags.items() if finish > self.virtual_time
+            }
+        return task
+
+
+class TaskQueue:
+    def __init__(self, workers: int = 4, max_queue_size: int = 50, max_per_user: int = 1, name: str = "tasks"):
+        """ Dedicated worker pool so slow work does not block the bot update threads
+
+        Args:
+            workers (int): Number of worker threads
+            max_queue_size (int): Tasks waiting for a worker before new ones are rejected
+            max_per_user (int): Queued plus running tasks allowed per user
+            name (str): Thread name prefix
+        """
+        self.workers = workers
+        self.max_per_user = max_per_user
+        self.name = name
+        self.queue: FairQueue = FairQueue(maxsize=max_queue_size)
+        self.lock = threading.Lock()
+        self.user_tasks: dict[int, list[Task]] = {}
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+        self.running = 0
+        self.threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        with self.lock:
+            if self.threads:
+                return
+            for idx in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"{self.name}-{idx}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(
+        self,
+        user_id: int,
+        fn: Callable,
+        *args,
+        name: Optional[str] = None,
+        weight: float = 1,
+        cost: float = 1,
+        **kwargs,
+    ) -> Task:
+        self.start()
+        task = Task(user_id, fn, args, kwargs, name=name, weight=weight, cost=cost)
+        with self.lock:
+            active = self.user_tasks.setdefault(user_id, [])
+            if len(active) >= self.max_per_user:
+                self.counters["rejected"] += 1
+                raise TaskRejected("user_limit")
+            # Submits hold the lock, so the queue can not fill up between the check and the put
+            if self.queue.full():
+                self.counters["rejected"] += 1
+                raise TaskRejected("queue_full")
+            # Child of the span that queued the task, from queueing to completion
+            task.span = start_span(f"task.{task.name}", user_id=user_id)
+            self.queue.put_nowait(task)
+            active.append(task)
+            self.counters["submitted"] += 1
+        logger.info("Task %s '%s' queued for user %s, queue depth %s", task.id, task.name, user_id, self.queue.qsize())
+        return task
+
+    def cancel_user(self, user_id: int) -> int:
+        """Cancel every queued or running task of a user, returns how many were cancelled."""
+        with self.lock:
+            tasks = list(self.user_tasks.get(user_id, []))
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def metrics(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "queued": self.queue.qsize(),
+                "running": self.running,
+                "users": sum(1 for tasks in self.user_tasks.values() if tasks),
+                **self.counters,
+            }
+
+    def _worker(self) -> None:
+        while True:
+            task: Task = self.queue.get()
+            try:
+                self._run(task)
+            finally:
+                self.queue.task_done()
+
+    def _run(self, task: Task) -> None:
+        with self.lock:
+            self.running += 1
+        task.started_at = time.monotonic()
+        error = None
+        try:
+            task.check_cancelled()
+            with activate(task.span), log_context(user_id=task.user_id, task_id=task.id):
+                task.fn(task, *task.args, **task.kwargs)
+            task.status = "completed"
+        except TaskCancelled:
+            task.status = "cancelled"
+            logger.info("Task %s '%s' cancelled", task.id, task.name)
+        except Exception as e:
+            task.status = "failed"
+            error = e
+            logger.exception("Task %s '%s' failed: %s", task.id, task.name, e)
+        finally:
+            if task.span is not None:
+                task.span.set_attribute("status", task.status)
+                task.span.end(error)
+            task.finished_at = time.monotonic()
+            with self.lock:
+                self.running -= 1
+                self.counters[task.status] += 1
+                active = self.user_tasks.get(task.user_id, [])
+                if task in active:
+                    active.remove(task)
+                if not active:
+                    self.user_tasks.pop(task.user_id, None)
+            logger.info(
+                "Task %s '%s' %s: waited %.2f s, ran %.2f s", task.id, task.name, task.status,
+                task.started_at - task.created_at, task.finished_at - task.started_at,
+            )
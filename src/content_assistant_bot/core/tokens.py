@@ -0,0 +1,52 @@
+"""Token counts of prompts for each provider."""
+import logging
+import re
+from functools import lru_cache
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+TokenCounter = Callable[[str], int]
+
+# Providers without a local tokenizer are counted with an encoding of a similar vocabulary
+PROVIDER_ENCODINGS = {"fireworksai": "cl100k_base"}
+
+_cyrillic = re.compile(r"[Ѐ-ӿ]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokenizer-free estimate: BPE vocabularies spend about 2.5 characters per token on Cyrillic, 4 on Latin."""
+    cyrillic = len(_cyrillic.findall(text))
+    return int(cyrillic / 2.5 + (len(text) - cyrillic) / 4) + 1
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(provider: str, model_name: str) -> TokenCounter:
+    """Counter of the model's tokenizer, or `estimate_tokens` when it is unavailable."""
+    try:
+        import tiktoken
+
+        if provider in PROVIDER_ENCODINGS:
+            encoding = tiktoken.get_encoding(PROVIDER_ENCODINGS[provider])
+        else:
+            encoding = tiktoken.encoding_for_model(model_name)
+    except Exception as e:
+        # tiktoken downloads encodings on first use, which fails offline
+        logger.warning("No tokenizer for %s/%s, estimating token counts: %s", provider, model_name, e)
+        return estimate_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, count: TokenCounter) -> str:
+    """Cut text to at most `max_tokens`, at a line or word boundary where possible."""
+    if count(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = max(text.rfind("\n", 0, low), text.rfind(" ", 0, low))
+    return text[: cut if cut > low // 2 else low].rstrip()
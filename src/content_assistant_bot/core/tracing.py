@@ -0,0 +1,359 @@
+"""Spans per update, from the user middlewares through handlers, background tasks and the core modules.
+
+A trace starts when a middleware calls `start_trace` and ends once its last span ended, so a
+background task started by a handler keeps the trace of its update open. Traces slower than
+`slow_seconds` are logged with their span breakdown, and exported with a `sample_rate` share of
+the others as OTLP JSON, one `ExportTraceServiceRequest` per line, which collectors and
+Jaeger's file importer read without a network connection.
+
+Outside a trace `span` and `traced` only read a context variable.
+
+    with span("instagram.fetch", username=username):
+        ...
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from content_assistant_bot.core.utils import redact_secrets
+
+logger = logging.getLogger(__name__)
+
+MAX_ERROR_LENGTH = 200
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Trace:
+    def __init__(self, tracer: "Tracer", max_spans: int) -> None:
+        """ Spans of one update, finished when none of them is open
+
+        Args:
+            tracer (Tracer): Tracer deciding what happens to the trace once finished
+            max_spans (int): Spans kept, later ones are counted as dropped
+        """
+        self.tracer = tracer
+        self.trace_id = secrets.token_hex(16)
+        self.max_spans = max_spans
+        self.spans: list[Span] = []
+        self.dropped = 0
+        self.open = 0
+        self.finished = False
+        self.lock = threading.Lock()
+
+    @property
+    def root(self) -> "Span":
+        return self.spans[0]
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the update to the end of the last span, background tasks included."""
+        return (max(item.end_ns or time.time_ns() for item in self.spans) - self.root.start_ns) / 1e9
+
+    def _add(self, span: "Span") -> bool:
+        with self.lock:
+            if self.finished:
+                return False
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                return False
+            self.spans.append(span)
+            self.open += 1
+            return True
+
+    def _close(self) -> None:
+        with self.lock:
+            self.open -= 1
+            finished = self.open == 0 and not self.finished
+            self.finished = self.finished or finished
+        if finished:
+            self.tracer.finish(self)
+
+
+class Span:
+    def __init__(self, trace: Trace, name: str, parent: Optional["Span"], attributes: dict) -> None:
+        """ Timed operation within a trace
+
+        Args:
+            trace (Trace): Trace the span belongs to
+            name (str): Operation, e.g. "db.get_user"
+            parent (Span): Enclosing span, None for the root
+            attributes (dict): Values describing the operation
+        """
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        # Spans over the limit or after the trace finished are handed out but not recorded
+        self.recording = trace._add(self)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.end_ns is not None:
+            return
+        if error is not None:
+            self.status = "error"
+            message = redact_secrets(str(error))[:MAX_ERROR_LENGTH]
+            self.attributes["error"] = f"{type(error).__name__}: {message}"
+        self.end_ns = time.time_ns()
+        if self.recording:
+            self.trace._close()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """Start a child of the current span without making it current, for work handed to another thread.
+
+    Returns:
+        Span: The span, to be ended by the caller, or None outside a trace
+    """
+    parent = _current.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, parent, attributes)
+
+
+@contextmanager
+def activate(span: Optional[Span]):
+    """Make `span` current in this thread or task for the block."""
+    token = _current.set(span)
+    try:
+        yield span
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record the block as a child of the current span, does nothing outside a trace."""
+    child = start_span(name, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(e)
+        raise
+    else:
+        child.end()
+    finally:
+        _current.reset(token)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator recording calls of a function or coroutine function like `span`."""
+    def decorator(function: Callable) -> Callable:
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await function(*args, **kwargs)
+                with span(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def format_trace(trace: Trace) -> str:
+    """Span tree of a trace with offsets from its start and durations in milliseconds."""
+    root = trace.root
+    children = defaultdict(list)
+    for child in trace.spans[1:]:
+        children[child.parent_id].append(child)
+    dropped = f", {trace.dropped} more dropped" if trace.dropped else ""
+    lines = [
+        f"Slow trace {trace.trace_id}: {root.name} took {trace.duration * 1000:.0f} ms, "
+        f"{len(trace.spans)} spans{dropped}"
+    ]
+
+    def walk(node: Span, depth: int) -> None:
+        offset = (node.start_ns - root.start_ns) / 1e6
+        attributes = " ".join(f"{key}={value}" for key, value in node.attributes.items())
+        lines.append(
+            f"{'  ' * depth}+{offset:.0f} ms {node.name} {node.duration * 1000:.1f} ms"
+            f"{' ERROR' if node.status == 'error' else ''}{' ' + attributes if attributes else ''}"
+        )
+        for child in sorted(children.get(node.span_id, []), key=lambda child: child.start_ns):
+            walk(child, depth + 1)
+
+    walk(root, 1)
+    return "\n".join(lines)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # int64 is a string in the protobuf JSON mapping
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otlp(trace: Trace, service_name: str) -> dict:
+    """The trace as an OTLP/JSON `ExportTraceServiceRequest`."""
+    spans = []
+    for item in trace.spans:
+        span_json = {
+            "traceId": trace.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            # SERVER for the update, INTERNAL for the rest
+            "kind": 2 if item.parent_id is None else 1,
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns or item.start_ns),
+            "attributes": _otlp_attributes(item.attributes),
+            "status": {"code": 2 if item.status == "error" else 1},
+        }
+        if item.parent_id is not None:
+            span_json["parentSpanId"] = item.parent_id
+        spans.append(span_json)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name, "process.pid": os.getpid()})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+
+class OtlpJsonExporter:
+    def __init__(self, output: str, service_name: str) -> None:
+        """ Writes traces as OTLP JSON lines
+
+        Args:
+            output (str): File to append to, or "stdout"
+            service_name (str): `service.name` resource attribute
+        """
+        self.output = output
+        self.service_name = service_name
+        self.lock = threading.Lock()
+        self.fd: Optional[int] = None
+        if output != "stdout":
+            os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+            # One write per line on an O_APPEND file keeps the lines of the cluster's processes whole
+            self.fd = os.open(output, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def export(self, trace: Trace) -> None:
+        line = json.dumps(to_otlp(trace, self.service_name), separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self.lock:
+            if self.fd is None:
+                sys.stdout.write(line)
+                sys.stdout.flush()
+            else:
+                os.write(self.fd, line.encode())
+
+
+class Tracer:
+    def __init__(
+        self,
+        exporter,
+        slow_seconds: float = 10.0,
+        sample_rate: float = 0.01,
+        max_spans: int = 500,
+        sample: Callable[[], float] = random.random,
+    ) -> None:
+        """ Starts traces and decides which finished ones are logged and exported
+
+        Args:
+            exporter: Has `export(trace)`
+            slow_seconds (float): Traces taking longer are logged with their spans and always exported
+            sample_rate (float): Share of the other traces exported
+            max_spans (int): Spans kept per trace
+            sample (Callable): Uniform random numbers in [0, 1), replaceable in tests
+        """
+        self.exporter = exporter
+        self.slow_seconds = slow_seconds
+        self.sample_rate = sample_rate
+        self.max_spans = max_spans
+        self.sample = sample
+
+    def start_trace(self, name: str, **attributes) -> Span:
+        root = Span(Trace(self, self.max_spans), name, None, attributes)
+        # Not reset by a token: the thread's next update replaces it, `finish_trace` clears it
+        _current.set(root)
+        return root
+
+    def finish(self, trace: Trace) -> None:
+        slow = trace.duration >= self.slow_seconds
+        if slow:
+            logger.warning(format_trace(trace))
+        if slow or self.sample() < self.sample_rate:
+            try:
+                self.exporter.export(trace)
+            except Exception as e:
+                logger.warning("Failed to export trace %s: %s", trace.trace_id, e)
+
+
+tracer: Optional[Tracer] = None
+
+
+def configure_tracing(tracing_config, service_name: str) -> Optional[Tracer]:
+    """Set up this process's tracer from the `tracing` section of config.yaml."""
+    global tracer
+    if not tracing_config.enabled:
+        tracer = None
+        return None
+    if tracer is None:
+        tracer = Tracer(
+            OtlpJsonExporter(tracing_config.output, service_name),
+            slow_seconds=tracing_config.slow_seconds,
+            sample_rate=tracing_config.sample_rate,
+            max_spans=tracing_config.max_spans,
+        )
+    return tracer
+
+
+def start_trace(name: str, **attributes) -> Optional[Span]:
+    """Start the trace of an update in the current thread or task, None if tracing is off."""
+    if tracer is None:
+        return None
+    return tracer.start_trace(name, **attributes)
+
+
+def finish_trace(error: Optional[BaseException] = None) -> None:
+    """End the root span of the current trace, which finishes it unless background work is still running."""
+    current = _current.get()
+    if current is None:
+        return
+    _current.set(None)
+    current.trace.root.end(error)
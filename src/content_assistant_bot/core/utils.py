@@ -1,12 +1,16 @@
 import logging
+import re
 
-import openpyxl
-from openpyxl.styles import Alignment
-
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Request errors quote the API URL, which holds the bot token and the text sent
+BOT_TOKEN = re.compile(r"bot\d+:[\w-]+")
+
+
+def redact_secrets(text: str) -> str:
+    """Replace bot tokens in a log line or error message."""
+    return BOT_TOKEN.sub("bot<token>", text)
+
 
 def format_excel_file(filepath: str) -> str:
     """ Apply formatting to an Excel file
@@ -18,6 +22,9 @@ def format_excel_file(filepath: str) -> str:
         filepath: Path to the formatted Excel file
 
     """
+    import openpyxl
+    from openpyxl.styles import Alignment
+
     # Load the Excel file to apply formatting
     wb = openpyxl.load_workbook(filepath)
     ws = wb.active
@@ -36,7 +43,7 @@ def format_excel_file(filepath: str) -> str:
                 if len(str(cell.value)) > max_length:
                     max_length = len(str(cell.value))
             except Exception as e:
-                logger.error(f"Error formatting Excel file: {e}")
+                logger.error("Error formatting Excel file: %s", e)
         adjusted_width = (max_length + 2)  # Add extra padding
         ws.column_dimensions[column].width = adjusted_width
 
@@ -1,20 +1,30 @@
 import csv
 import logging
 import os
+from collections.abc import Iterator
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Optional
 
-from sqlalchemy import inspect, text
+from sqlalchemy import case, delete, func, inspect, select, text, update
 from sqlalchemy.orm import Session
 
+from content_assistant_bot.core.metrics import histogram
+from content_assistant_bot.core.tracing import traced
+
 from .database import get_session
-from .models import Message, User
+from .models import Broadcast, BroadcastDelivery, ChatState, LLMCacheEntry, Message, RateLimitBucket, UsageRecord, User
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+query_seconds = histogram("bot_db_query_seconds", "Duration of crud functions", ["function", "status"])
+
+
+def query(function: Callable) -> Callable:
+    """Time and trace a query function as `db.<name>`."""
+    return traced(f"db.{function.__name__}")(query_seconds.timed(function.__name__)(function))
 
+
+@query
 def get_user(username: str) -> User:
     db: Session = get_session()
     result = db.query(User).filter(User.name == username).first()
@@ -22,6 +32,7 @@ def get_user(username: str) -> User:
     return result
 
 
+@query
 def get_users() -> list[User]:
     db: Session = get_session()
     result = db.query(User).all()
@@ -29,6 +40,16 @@ def get_users() -> list[User]:
     return result
 
 
+@query
+def count_users() -> int:
+    db: Session = get_session()
+    try:
+        return db.execute(select(func.count(func.distinct(User.id)))).scalar()
+    finally:
+        db.close()
+
+
+@query
 def upsert_user(
     name: str,
     id: Optional[int] = None,
@@ -58,6 +79,7 @@ def upsert_user(
     return user
 
 
+@query
 def add_message(username: str, text: str) -> Message:
     message = Message(username=username, text=text, timestamp=datetime.now())
     db: Session = get_session()
@@ -67,6 +89,7 @@ def add_message(username: str, text: str) -> Message:
     return message
 
 
+@query
 def get_message(message_id: int) -> Optional[Message]:
     db: Session = get_session()
     try:
@@ -75,6 +98,7 @@ def get_message(message_id: int) -> Optional[Message]:
         db.close()
 
 
+@query
 def get_messages_by_user(username: str) -> list[Message]:
     db: Session = get_session()
     try:
@@ -83,6 +107,7 @@ def get_messages_by_user(username: str) -> list[Message]:
         db.close()
 
 
+@query
 def export_all_tables(export_dir: str):
     db = get_session()
     inspector = inspect(db.get_bind())
@@ -99,3 +124,339 @@ def export_all_tables(export_dir: str):
                 writer.writerow(record)
 
     db.close()
+
+
+# Not decorated with `query`: a generator returns before its queries run, callers time the iteration
+def iter_user_ids(chunk_size: int = 500, after_id: Optional[int] = None) -> Iterator[list[int]]:
+    """Yield the ids of all known users in ascending chunks, one short session per chunk."""
+    while True:
+        db: Session = get_session()
+        try:
+            query = select(User.id).where(User.id.isnot(None)).distinct().order_by(User.id).limit(chunk_size)
+            if after_id is not None:
+                query = query.where(User.id > after_id)
+            chunk = [int(user_id) for user_id in db.execute(query).scalars()]
+        finally:
+            db.close()
+        if not chunk:
+            return
+        yield chunk
+        after_id = chunk[-1]
+
+
+@query
+def create_broadcast(
+    author_id: int,
+    media_type: str,
+    scheduled_at: datetime,
+    text: Optional[str] = None,
+    photo: Optional[str] = None,
+    author_lang: str = "ru",
+) -> Broadcast:
+    broadcast = Broadcast(
+        author_id=author_id,
+        author_lang=author_lang,
+        media_type=media_type,
+        text=text,
+        photo=photo,
+        scheduled_at=scheduled_at,
+        created_at=datetime.now(),
+        status="scheduled",
+    )
+    db: Session = get_session()
+    db.add(broadcast)
+    db.commit()
+    db.refresh(broadcast)
+    db.close()
+    return broadcast
+
+
+@query
+def get_broadcast(broadcast_id: int) -> Optional[Broadcast]:
+    db: Session = get_session()
+    try:
+        return db.get(Broadcast, broadcast_id)
+    finally:
+        db.close()
+
+
+@query
+def get_unfinished_broadcasts() -> list[Broadcast]:
+    db: Session = get_session()
+    try:
+        return db.query(Broadcast).filter(Broadcast.status != "done").all()
+    finally:
+        db.close()
+
+
+@query
+def update_broadcast(broadcast_id: int, **fields) -> None:
+    db: Session = get_session()
+    db.execute(update(Broadcast).where(Broadcast.id == broadcast_id).values(**fields))
+    db.commit()
+    db.close()
+
+
+@query
+def get_last_recipient_id(broadcast_id: int) -> Optional[int]:
+    db: Session = get_session()
+    try:
+        return db.execute(
+            select(func.max(BroadcastDelivery.user_id)).where(BroadcastDelivery.broadcast_id == broadcast_id)
+        ).scalar()
+    finally:
+        db.close()
+
+
+@query
+def add_broadcast_recipients(broadcast_id: int, user_ids: list[int]) -> None:
+    db: Session = get_session()
+    db.add_all(BroadcastDelivery(broadcast_id=broadcast_id, user_id=user_id, status="pending") for user_id in user_ids)
+    db.commit()
+    db.close()
+
+
+@query
+def get_pending_recipients(broadcast_id: int, limit: int, after_id: Optional[int] = None) -> list[int]:
+    db: Session = get_session()
+    try:
+        query = (
+            select(BroadcastDelivery.user_id)
+            .where(BroadcastDelivery.broadcast_id == broadcast_id, BroadcastDelivery.status == "pending")
+            .order_by(BroadcastDelivery.user_id)
+            .limit(limit)
+        )
+        if after_id is not None:
+            query = query.where(BroadcastDelivery.user_id > after_id)
+        return [int(user_id) for user_id in db.execute(query).scalars()]
+    finally:
+        db.close()
+
+
+@query
+def set_delivery_status(broadcast_id: int, user_id: int, status: str, error: Optional[str] = None) -> None:
+    db: Session = get_session()
+    db.execute(
+        update(BroadcastDelivery)
+        .where(BroadcastDelivery.broadcast_id == broadcast_id, BroadcastDelivery.user_id == user_id)
+        .values(status=status, error=error, sent_at=datetime.now() if status == "sent" else None)
+    )
+    db.commit()
+    db.close()
+
+
+@query
+def count_deliveries(broadcast_id: int) -> dict[str, int]:
+    """Return the number of recipients per delivery status."""
+    db: Session = get_session()
+    try:
+        rows = db.execute(
+            select(BroadcastDelivery.status, func.count())
+            .where(BroadcastDelivery.broadcast_id == broadcast_id)
+            .group_by(BroadcastDelivery.status)
+        ).all()
+        return {status: count for status, count in rows}
+    finally:
+        db.close()
+
+
+@query
+def get_chat_state(key: str) -> Optional[ChatState]:
+    db: Session = get_session()
+    try:
+        return db.get(ChatState, key)
+    finally:
+        db.close()
+
+
+@query
+def set_chat_state(key: str, state: str) -> None:
+    """Set the state of a chat, keeping its data."""
+    db: Session = get_session()
+    chat_state = db.get(ChatState, key)
+    if chat_state is None:
+        chat_state = ChatState(key=key)
+        db.add(chat_state)
+    chat_state.state = state
+    chat_state.updated_at = datetime.now()
+    db.commit()
+    db.close()
+
+
+@query
+def set_chat_data(key: str, data: bytes) -> bool:
+    db: Session = get_session()
+    result = db.execute(
+        update(ChatState).where(ChatState.key == key).values(data=data, updated_at=datetime.now())
+    )
+    db.commit()
+    db.close()
+    return result.rowcount > 0
+
+
+@query
+def count_chat_states() -> int:
+    db: Session = get_session()
+    try:
+        return db.execute(select(func.count()).select_from(ChatState)).scalar()
+    finally:
+        db.close()
+
+
+@query
+def delete_chat_state(key: str) -> bool:
+    db: Session = get_session()
+    chat_state = db.get(ChatState, key)
+    if chat_state is not None:
+        db.delete(chat_state)
+        db.commit()
+    db.close()
+    return chat_state is not None
+
+
+@query
+def take_rate_limit_tokens(key: str, rate: float, capacity: float, cost: float, now: float) -> float:
+    """Take `cost` tokens from a shared bucket. Returns 0 if taken, otherwise seconds until they would be."""
+    db: Session = get_session()
+    try:
+        # Locks the row on PostgreSQL, so two workers can not spend the same tokens
+        bucket = db.query(RateLimitBucket).filter(RateLimitBucket.key == key).with_for_update().first()
+        if bucket is None:
+            bucket = RateLimitBucket(key=key, tokens=capacity, updated_at=now)
+            db.add(bucket)
+        tokens = min(capacity, bucket.tokens + max(0.0, now - bucket.updated_at) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        bucket.tokens = tokens
+        bucket.updated_at = now
+        db.commit()
+        return wait
+    finally:
+        db.close()
+
+
+@query
+def delete_idle_rate_limit_buckets(updated_before: float) -> int:
+    db: Session = get_session()
+    try:
+        deleted = db.query(RateLimitBucket).filter(RateLimitBucket.updated_at < updated_before).delete()
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+@query
+def add_usage(user_id: int, resource: str, amount: int, created_at: datetime) -> None:
+    db: Session = get_session()
+    try:
+        db.add(UsageRecord(user_id=user_id, resource=resource, amount=amount, created_at=created_at))
+        db.commit()
+    finally:
+        db.close()
+
+
+@query
+def get_usage(user_id: int, resource: str, windows: dict[str, datetime]) -> dict[str, int]:
+    """Amount of `resource` the user spent since the start of each window, in one query."""
+    db: Session = get_session()
+    try:
+        row = db.execute(
+            select(*[
+                func.coalesce(func.sum(case((UsageRecord.created_at >= since, UsageRecord.amount), else_=0)), 0)
+                for since in windows.values()
+            ]).where(
+                UsageRecord.user_id == user_id,
+                UsageRecord.resource == resource,
+                UsageRecord.created_at >= min(windows.values()),
+            )
+        ).one()
+        return {name: int(amount) for name, amount in zip(windows, row)}
+    finally:
+        db.close()
+
+
+@query
+def get_top_usage(resource: str, since: datetime, limit: int) -> list[tuple[int, Optional[str], int]]:
+    """(user id, username, amount) of the users who spent the most of `resource` since `since`."""
+    db: Session = get_session()
+    try:
+        total = func.sum(UsageRecord.amount).label("total")
+        rows = db.execute(
+            select(UsageRecord.user_id, total)
+            .where(UsageRecord.resource == resource, UsageRecord.created_at >= since)
+            .group_by(UsageRecord.user_id)
+            .order_by(total.desc())
+            .limit(limit)
+        ).all()
+        names = dict(db.execute(select(User.id, User.name).where(User.id.in_([row[0] for row in rows]))).all())
+        return [(user_id, names.get(user_id), int(amount)) for user_id, amount in rows]
+    finally:
+        db.close()
+
+
+@query
+def delete_usage(created_before: datetime) -> int:
+    db: Session = get_session()
+    try:
+        deleted = db.execute(delete(UsageRecord).where(UsageRecord.created_at < created_before)).rowcount
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+@query
+def get_cache_entries(key: str, created_after: datetime) -> list[LLMCacheEntry]:
+    db: Session = get_session()
+    try:
+        return db.query(LLMCacheEntry).filter(
+            LLMCacheEntry.key == key, LLMCacheEntry.created_at > created_after
+        ).order_by(LLMCacheEntry.id).all()
+    finally:
+        db.close()
+
+
+@query
+def touch_cache_entry(entry_id: int) -> None:
+    db: Session = get_session()
+    db.execute(
+        update(LLMCacheEntry)
+        .where(LLMCacheEntry.id == entry_id)
+        .values(last_used_at=datetime.now(), hits=LLMCacheEntry.hits + 1)
+    )
+    db.commit()
+    db.close()
+
+
+@query
+def add_cache_entry(key: str, query: str, response: str) -> LLMCacheEntry:
+    now = datetime.now()
+    entry = LLMCacheEntry(key=key, query=query, response=response, created_at=now, last_used_at=now, hits=0)
+    db: Session = get_session()
+    db.add(entry)
+    db.commit()
+    db.refresh(entry)
+    db.close()
+    return entry
+
+
+@query
+def evict_cache_entries(created_before: datetime, max_entries: int) -> int:
+    """Delete expired entries, then the least recently used ones above `max_entries`."""
+    db: Session = get_session()
+    try:
+        deleted = db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.created_at <= created_before)).rowcount
+        overflow = db.execute(select(func.count()).select_from(LLMCacheEntry)).scalar() - max_entries
+        if overflow > 0:
+            stale_ids = select(LLMCacheEntry.id).order_by(LLMCacheEntry.last_used_at).limit(overflow)
+            deleted += db.execute(
+                delete(LLMCacheEntry).where(LLMCacheEntry.id.in_(stale_ids))
+            ).rowcount
+        db.commit()
+        return deleted
+    finally:
+        db.close()
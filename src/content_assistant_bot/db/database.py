@@ -1,15 +1,18 @@
 import logging.config
 import os
+import threading
+from typing import Optional
 
 from dotenv import find_dotenv, load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy import Engine, create_engine, inspect, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from content_assistant_bot.core.config import settings
 
 from .models import Base
 
-# Load logging configuration with OmegaConf
-logging.basicConfig(level=logging.INFO)
+config = settings.view("config")
+
 logger = logging.getLogger(__name__)
 
 load_dotenv(find_dotenv(usecwd=True))
@@ -30,13 +33,39 @@ else:
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?sslmode=require"
 
 
-def get_engine():
-    """Get a new engine for the database."""
-    return create_engine(
-        DATABASE_URL,
-        connect_args={"connect_timeout": 5, "application_name": "content_assistant_bot"} if "postgresql" in DATABASE_URL else {},
-        poolclass=NullPool if "postgresql" in DATABASE_URL else None,
-    )
+_engine: Optional[Engine] = None
+_engine_url: Optional[str] = None
+_session_factory: Optional[sessionmaker] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """Return the shared engine of `DATABASE_URL`, creating it and its connection pool on first use."""
+    global _engine, _engine_url, _session_factory
+    with _engine_lock:
+        # Tests and benchmarks point DATABASE_URL at their own database, which gets a new engine
+        if _engine is None or _engine_url != DATABASE_URL:
+            if _engine is not None:
+                _engine.dispose()
+            postgresql = "postgresql" in DATABASE_URL
+            _engine = create_engine(
+                DATABASE_URL,
+                connect_args={"connect_timeout": 5, "application_name": "content_assistant_bot"} if postgresql else {},
+                pool_size=config.database.pool_size,
+                max_overflow=config.database.max_overflow,
+                pool_recycle=config.database.pool_recycle,
+                # Connections the server closed while idle are replaced instead of failing the query
+                pool_pre_ping=True,
+            )
+            _engine_url = DATABASE_URL
+            _session_factory = sessionmaker(bind=_engine)
+        return _engine
+
+
+def warm_up_pool() -> None:
+    """Open the first pooled connection, so the first update does not wait for the connection handshake."""
+    with get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
 
 
 def create_tables():
@@ -46,6 +75,51 @@ def create_tables():
     logger.info("Tables created")
 
 
+def migrate_schema(engine=None) -> list[str]:
+    """
+    Bring the database up to the models without losing data: create missing tables, add missing
+    columns and indexes. Existing tables and columns are never dropped or altered.
+
+    Args:
+        engine (Engine): Database to migrate, the configured one if None
+
+    Returns:
+        list[str]: Tables and `table.column`s that were added.
+    """
+    engine = engine or get_engine()
+    existing = set(inspect(engine).get_table_names())
+    changes = [table.name for table in Base.metadata.sorted_tables if table.name not in existing]
+    Base.metadata.create_all(engine)
+
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if column.primary_key or (not column.nullable and column.server_default is None):
+                    raise RuntimeError(
+                        f"Column {table.name}.{column.name} needs a value for existing rows, migrate it manually"
+                    )
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(
+                    text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}")
+                )
+                changes.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+    if changes:
+        logger.info("Schema migrated, added: %s", ', '.join(changes))
+    else:
+        logger.info("Schema is up to date")
+    return changes
+
+
 def drop_tables():
     """Drop tables in the database."""
     engine = get_engine()
@@ -53,7 +127,7 @@ def drop_tables():
     logger.info("Tables dropped")
 
 
-def get_session():
-    """Get a new session from the database engine."""
-    engine = get_engine()
-    return sessionmaker(bind=engine)()
+def get_session() -> Session:
+    """Get a new session on a connection from the shared pool."""
+    get_engine()
+    return _session_factory()
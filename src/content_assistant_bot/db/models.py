@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String
 from sqlalchemy.orm import DeclarativeBase, relationship
 
 
@@ -31,3 +31,84 @@ class User(Base):
 
     messages = relationship("Message", back_populates="user")
 
+
+class Broadcast(Base):
+    __tablename__ = "broadcasts"
+
+    id = Column(Integer, primary_key=True)
+    author_id = Column(BigInteger)
+    author_lang = Column(String, default="ru")
+    media_type = Column(String)
+    text = Column(String)
+    photo = Column(String)
+    scheduled_at = Column(DateTime)
+    created_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # scheduled -> sending -> done
+    status = Column(String, default="scheduled")
+
+    deliveries = relationship("BroadcastDelivery", back_populates="broadcast")
+
+
+class BroadcastDelivery(Base):
+    __tablename__ = "broadcast_deliveries"
+
+    broadcast_id = Column(Integer, ForeignKey("broadcasts.id"), primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    # pending -> sent | failed
+    status = Column(String, default="pending", index=True)
+    error = Column(String)
+    sent_at = Column(DateTime)
+
+    broadcast = relationship("Broadcast", back_populates="deliveries")
+
+
+class ChatState(Base):
+    """FSM state and data of a chat, shared by all bot workers"""
+
+    __tablename__ = "chat_states"
+
+    key = Column(String, primary_key=True)
+    state = Column(String)
+    # Pickled dict, handlers store datetimes and chat history objects in it
+    data = Column(LargeBinary)
+    updated_at = Column(DateTime)
+
+
+class RateLimitBucket(Base):
+    """Token bucket of one user and rate limit scope, shared by all bot workers"""
+
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float)
+    # Unix time of the last refill, idle buckets are deleted
+    updated_at = Column(Float, index=True)
+
+
+class UsageRecord(Base):
+    """Quota usage of a user: Instagram requests or LLM tokens, with the time they were spent"""
+
+    __tablename__ = "usage"
+    __table_args__ = (Index("ix_usage_user_resource_time", "user_id", "resource", "created_at"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger)
+    resource = Column(String)
+    amount = Column(Integer)
+    # UTC
+    created_at = Column(DateTime, index=True)
+
+
+class LLMCacheEntry(Base):
+    """One cached completion; a key holds several variants so repeated queries get different ideas"""
+
+    __tablename__ = "llm_cache"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String, index=True)
+    query = Column(String)
+    response = Column(String)
+    created_at = Column(DateTime)
+    last_used_at = Column(DateTime, index=True)
+    hits = Column(Integer, default=0)
@@ -2,13 +2,21 @@ import os
 import logging
 from dotenv import find_dotenv, load_dotenv
 
-from content_assistant_bot.api.bot import start_bot
+from content_assistant_bot.api.bot import start_async_bot, start_bot, warm_up_identity
+from content_assistant_bot.api.handlers.ideas import get_llm
+from content_assistant_bot.api.health import HealthServer
+from content_assistant_bot.core.boot import BootSequence
+from content_assistant_bot.core.config import settings
+from content_assistant_bot.core.instagram import get_instagram_client
+from content_assistant_bot.core.log import configure_logging
 from content_assistant_bot.db import crud
-from content_assistant_bot.db.database import create_tables, drop_tables
+from content_assistant_bot.db.database import migrate_schema, warm_up_pool
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+config = settings.view("config")
+configure_logging(config.logging)
+
 # Load and get environment variables
 load_dotenv(find_dotenv(usecwd=True))
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
@@ -16,18 +24,45 @@ ADMIN_USER_ID = os.getenv("ADMIN_USER_ID")
 
 def init_db():
     """Initialize the database."""
-    # Create tables
-    create_tables()
+    # Connect first: the pooled connection is returned and reused by the first update
+    warm_up_pool()
+    # Create missing tables and columns, existing users and history are kept
+    migrate_schema()
 
     # Add admin to user table
     if ADMIN_USERNAME:
         user = crud.upsert_user(id=ADMIN_USER_ID, name=ADMIN_USERNAME, role="admin")
-        logger.info(f"Admin user '{ADMIN_USERNAME}' ({ADMIN_USER_ID}) added to the database")
+        logger.info("Admin user '%s' (%s) added to the database", ADMIN_USERNAME, ADMIN_USER_ID)
 
     logger.info("Database initialized")
 
 
+def warm_up_llm():
+    """Build the ideas model and its clients, so the first request does not import the provider SDKs."""
+    get_llm().warm_up()
+
+
+def boot_bot() -> BootSequence:
+    """Prepare everything the first update needs. Independent warm-ups run at once."""
+    boot = BootSequence()
+    if config.health.enabled:
+        HealthServer(boot, host=config.health.host, port=config.health.port).start()
+    boot.run_parallel(
+        {
+            "database": init_db,
+            "identity": warm_up_identity,
+            "instagram": get_instagram_client,
+            "llm": warm_up_llm,
+        },
+        # Without these the bot still answers, the first request that needs them sets them up
+        optional=["instagram", "llm"],
+    )
+    return boot
+
+
 if __name__ == "__main__":
-    drop_tables()
-    init_db()
-    start_bot()
+    boot = boot_bot()
+    if config.runtime == "asyncio":
+        start_async_bot(boot)
+    else:
+        start_bot(boot)
@@ -0,0 +1,15 @@
+"""A clock tests move by hand, for code that takes a `clock` callable."""
+from typing import Any
+
+
+class FakeClock:
+    def __init__(self, now: Any = 0.0) -> None:
+        """ Returns `now` until a test changes it
+
+        Args:
+            now (Any): Start time, seconds for monotonic clocks or a datetime for wall clocks
+        """
+        self.now = now
+
+    def __call__(self) -> Any:
+        return self.now
@@ -0,0 +1,83 @@
+"""A stand-in for `InstagramWrapper` answering with generated reels, used by tests and benchmarks."""
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from content_assistant_bot.core import instagram
+
+
+class FakeInstagram:
+    def __init__(
+        self, latency: float = 0.0, reels: int = 30, missing: Optional[set[str]] = None, seed: int = 0
+    ) -> None:
+        """ Answers the `InstagramWrapper` calls the handlers make, without a network or an account
+
+        Args:
+            latency (float): Seconds every call takes, as the instagrapi requests behind it would
+            reels (int): Reels returned per account or hashtag
+            missing (set[str]): Usernames and hashtags answered as not found
+            seed (int): Seed of the generated numbers, the same seed gives the same reels
+        """
+        self.latency = latency
+        self.reels = reels
+        self.missing = missing or set()
+        self.seed = seed
+        self.calls: list[tuple[str, str]] = []
+        self.lock = threading.Lock()
+
+    def _call(self, method: str, name: str) -> None:
+        with self.lock:
+            self.calls.append((method, name))
+        if self.latency:
+            time.sleep(self.latency)
+
+    def make_reels(self, name: str, owner: Optional[str] = None) -> list[dict]:
+        """Reels shaped like those `InstagramWrapper` builds from instagrapi media."""
+        generator = random.Random(f"{self.seed}:{name}")
+        posted = datetime(2024, 1, 1)
+        reels = []
+        for idx in range(self.reels):
+            plays = generator.randint(1_000, 2_000_000)
+            likes = generator.randint(0, plays // 10)
+            comments = generator.randint(0, likes // 10 + 1)
+            code = f"{name[:8]}{idx:04d}"
+            reels.append({
+                "pk": str(idx),
+                "title": f"Reel {idx}",
+                "caption_text": f"Reel {idx} by {owner or name} #{name}",
+                "likes": likes,
+                "comments": comments,
+                "post_date": posted + timedelta(hours=idx),
+                "link": f"https://www.instagram.com/reel/{code}/",
+                "video_url": f"https://example.com/{code}.mp4",
+                "play_count": plays,
+                "id": f"{idx}_{name}",
+                "er": (likes + comments) / plays,
+                "owner": owner or f"author{idx}",
+            })
+        return reels
+
+    def user_exists(self, username: str) -> bool:
+        self._call("user_exists", username)
+        return username not in self.missing
+
+    def fetch_user_reels(self, username: str, n_media_items: int = 100, estimate_view_count: bool = False) -> dict:
+        self._call("fetch_user_reels", username)
+        if username in self.missing:
+            return {"status": 404, "message": "User not found"}
+        return {"status": 200, "data": self.make_reels(username, owner=username)[:n_media_items]}
+
+    def fetch_hashtag_reels(self, hashtag: str, n_media_items: int = 100, estimate_view_count: bool = False) -> dict:
+        self._call("fetch_hashtag_reels", hashtag)
+        if hashtag in self.missing:
+            return {"status": 404, "message": "Hashtag not found"}
+        return {"status": 200, "data": self.make_reels(hashtag)[:n_media_items]}
+
+
+def install_fake_instagram(fake: FakeInstagram) -> FakeInstagram:
+    """Make `get_instagram_client` return `fake` in this process instead of logging in."""
+    with instagram._client_lock:
+        instagram._client = fake
+    return fake
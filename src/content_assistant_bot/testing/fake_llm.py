@@ -0,0 +1,125 @@
+"""A stand-in for the provider chat models, used by tests and benchmarks."""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from content_assistant_bot.core import llm
+
+IDEA = (
+    "**Идея {idx}. Говорящая голова.** Расскажи о трёх ошибках, "
+    "которые делают новички в теме, и покажи, как их избежать: "
+    "короткий хук в первые две секунды, затем каждая ошибка "
+    "отдельным планом с подписью, в конце призыв сохранить ролик "
+    "и написать в комментариях свою ошибку. Подойдёт трендовый "
+    "звук без слов, субтитры крупным шрифтом, длительность 20-30 "
+    "секунд. Снимай при дневном свете у окна, держи камеру на "
+    "уровне глаз и меняй план каждые три секунды, чтобы зритель "
+    "досмотрел до конца."
+)
+
+
+class FakeChatModel:
+    """Answers like a langchain chat model after `latency` seconds, streaming in `chunks` pieces.
+
+    The provider classes are created by `get_client(provider, model_name, max_tokens, temperature)`,
+    so the behaviour is set on a subclass made by `make_fake_chat_model`.
+    """
+
+    latency = 0.0
+    first_chunk_latency = 0.0
+    chunks = 20
+    ideas = 5
+
+    def __init__(self, model_name: str, max_tokens: Optional[int] = None, temperature: float = 0.7) -> None:
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def _text(self) -> str:
+        return "\n\n".join(IDEA.format(idx=idx) for idx in range(1, self.ideas + 1))
+
+    def _usage(self, messages: list, text: str) -> dict:
+        # About four characters per token, as the providers would report
+        prompt = sum(len(str(message.content)) for message in messages)
+        return {"input_tokens": prompt // 4, "output_tokens": len(text) // 4, "total_tokens": (prompt + len(text)) // 4}
+
+    def _pieces(self, text: str) -> list[str]:
+        size = -(-len(text) // self.chunks)
+        return [text[start:start + size] for start in range(0, len(text), size)]
+
+    def _count(self) -> None:
+        with self.lock:
+            self.calls += 1
+
+    def invoke(self, messages: list):
+        from langchain_core.messages import AIMessage
+
+        self._count()
+        time.sleep(self.latency)
+        text = self._text()
+        return AIMessage(content=text, usage_metadata=self._usage(messages, text))
+
+    async def ainvoke(self, messages: list):
+        from langchain_core.messages import AIMessage
+
+        self._count()
+        await asyncio.sleep(self.latency)
+        text = self._text()
+        return AIMessage(content=text, usage_metadata=self._usage(messages, text))
+
+    def stream(self, messages: list):
+        from langchain_core.messages import AIMessageChunk
+
+        self._count()
+        text = self._text()
+        pieces = self._pieces(text)
+        time.sleep(self.first_chunk_latency)
+        for idx, piece in enumerate(pieces):
+            if idx:
+                time.sleep(max(self.latency - self.first_chunk_latency, 0) / (len(pieces) - 1))
+            # The providers report usage on the last chunk
+            usage = self._usage(messages, text) if idx == len(pieces) - 1 else None
+            yield AIMessageChunk(content=piece, usage_metadata=usage)
+
+    async def astream(self, messages: list):
+        from langchain_core.messages import AIMessageChunk
+
+        self._count()
+        text = self._text()
+        pieces = self._pieces(text)
+        await asyncio.sleep(self.first_chunk_latency)
+        for idx, piece in enumerate(pieces):
+            if idx:
+                await asyncio.sleep(max(self.latency - self.first_chunk_latency, 0) / (len(pieces) - 1))
+            usage = self._usage(messages, text) if idx == len(pieces) - 1 else None
+            yield AIMessageChunk(content=piece, usage_metadata=usage)
+
+
+def make_fake_chat_model(
+    latency: float = 0.0, first_chunk_latency: Optional[float] = None, chunks: int = 20, ideas: int = 5
+) -> type:
+    """ Chat model class answering in `latency` seconds
+
+    Args:
+        latency (float): Seconds until the whole answer, the last chunk when streamed
+        first_chunk_latency (float): Seconds until the first streamed chunk, a tenth of `latency` if None
+        chunks (int): Pieces a streamed answer is split into
+        ideas (int): Ideas in the answer, five are about 2400 characters: the bot treats under 2000 as no ideas
+    """
+    return type("FakeChatModel", (FakeChatModel,), {
+        "latency": latency,
+        "first_chunk_latency": latency / 10 if first_chunk_latency is None else first_chunk_latency,
+        "chunks": chunks,
+        "ideas": ideas,
+    })
+
+
+def install_fake_llm(model_class: type) -> type:
+    """Answer every provider with `model_class` in this process, the routes and fallbacks included."""
+    for provider in list(llm.CLIENTS):
+        llm.CLIENTS[provider] = model_class
+    llm.clear_clients()
+    return model_class
@@ -0,0 +1,182 @@
+"""A local stand-in for the Telegram Bot API, used by tests and benchmarks."""
+import json
+import threading
+import time
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlparse
+
+
+def parse_multipart(content_type: str, body: bytes) -> dict:
+    """Fields of a multipart upload, files as their size in bytes."""
+    message = BytesParser(policy=policy.HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True) or b""
+        fields[name] = len(payload) if part.get_filename() else payload.decode()
+    return fields
+
+
+class FakeBotAPI:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0) -> None:
+        """ Minimal Bot API server that records every call
+
+        Point telebot at it with `apihelper.API_URL = fake.api_url`.
+
+        Args:
+            host (str): Interface to bind
+            port (int): Port to bind, 0 picks a free one
+            latency (float): Artificial delay added to every response, in seconds
+        """
+        self.latency = latency
+        self.calls: list[tuple[str, dict]] = []
+        self.blocked_chats: set[int] = set()
+        self.flood_responses = 0
+        self.retry_after = 1
+        self.parse_error_responses = 0
+        self.message_id = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def api_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    def start(self) -> "FakeBotAPI":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="FakeBotAPI", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeBotAPI":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def fail_with_flood(self, times: int, retry_after: int = 1) -> None:
+        """Answer the next `times` send calls with 429 Too Many Requests."""
+        with self.lock:
+            self.flood_responses = times
+            self.retry_after = retry_after
+
+    def fail_with_parse_error(self, times: int) -> None:
+        """Answer the next `times` calls with a `parse_mode` with 400 Bad Request, as for invalid Markdown."""
+        with self.lock:
+            self.parse_error_responses = times
+
+    def calls_to(self, method: str) -> list[dict]:
+        with self.lock:
+            return [params for name, params in self.calls if name == method]
+
+    def wait_for(
+        self, predicate: Callable[[str, dict], bool], start: int = 0, timeout: float = 30
+    ) -> Optional[tuple[int, str, dict]]:
+        """ Wait for a call matching `predicate(method, params)`
+
+        Args:
+            predicate (Callable): Tells the awaited call
+            start (int): Index in `calls` to search from, e.g. `len(fake.calls)` before sending an update
+            timeout (float): Seconds to wait
+
+        Returns:
+            tuple: Index, method and parameters of the first matching call, None on timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while True:
+                for idx in range(start, len(self.calls)):
+                    method, params = self.calls[idx]
+                    if predicate(method, params):
+                        return idx, method, params
+                start = len(self.calls)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.changed.wait(remaining)
+
+    def handle(self, method: str, params: dict) -> tuple[int, dict]:
+        chat_id = int(params["chat_id"]) if "chat_id" in params else None
+        with self.lock:
+            if method.startswith("send") and self.flood_responses > 0:
+                self.flood_responses -= 1
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            if params.get("parse_mode") and self.parse_error_responses > 0:
+                self.parse_error_responses -= 1
+                return 400, {
+                    "ok": False,
+                    "error_code": 400,
+                    "description": "Bad Request: can't parse entities: Can't find end of the entity",
+                }
+            if chat_id in self.blocked_chats:
+                return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+            self.calls.append((method, params))
+            self.changed.notify_all()
+            self.message_id += 1
+            message_id = self.message_id
+
+        if method == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}}
+        if method.startswith("send") or method.startswith("edit"):
+            message = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text") or params.get("caption") or "",
+            }
+            if method == "sendMediaGroup":
+                media = params.get("media") or "[]"
+                count = len(json.loads(media) if isinstance(media, str) else media)
+                return 200, {"ok": True, "result": [dict(message, message_id=message_id + idx) for idx in range(count)]}
+            return 200, {"ok": True, "result": message}
+        return 200, {"ok": True, "result": True}
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self) -> None:
+                url = urlparse(self.path)
+                method = url.path.rsplit("/", 1)[-1]
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                if body and content_type.startswith("application/x-www-form-urlencoded"):
+                    params.update(parse_qsl(body.decode()))
+                elif body and content_type.startswith("application/json"):
+                    params.update(json.loads(body))
+                elif body and content_type.startswith("multipart/form-data"):
+                    params.update(parse_multipart(content_type, body))
+                if fake.latency:
+                    time.sleep(fake.latency)
+                status, payload = fake.handle(method, params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, format, *args):  # noqa: A002
+                pass
+
+        return Handler
@@ -0,0 +1,67 @@
+"""Synthetic Telegram updates from simulated users, for tests and benchmarks."""
+import itertools
+import threading
+import time
+from typing import Optional
+
+from telebot.types import Update
+
+
+class UpdateFactory:
+    def __init__(self, first_update_id: int = 1) -> None:
+        """ Builds updates of private chats, whose chat id is the user id, with increasing update ids
+
+        Args:
+            first_update_id (int): Id of the first update built
+        """
+        self._ids = itertools.count(first_update_id)
+        self._lock = threading.Lock()
+
+    def _next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    @staticmethod
+    def user(user_id: int) -> dict:
+        return {
+            "id": user_id,
+            "is_bot": False,
+            "first_name": "User",
+            "last_name": str(user_id),
+            "username": f"user{user_id}",
+            "language_code": "ru",
+        }
+
+    def message(self, user_id: int, text: str) -> Update:
+        """A text message, a command if it starts with "/"."""
+        update_id = self._next_id()
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self.user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return Update.de_json({"update_id": update_id, "message": message})
+
+    def callback(self, user_id: int, data: str, message_id: Optional[int] = None) -> Update:
+        """A press of an inline button with `data` under the bot's message `message_id`."""
+        update_id = self._next_id()
+        return Update.de_json({
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "from": self.user(user_id),
+                "message": {
+                    "message_id": message_id or update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"},
+                    "text": "",
+                },
+            },
+        })
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+import telebot
+from telebot import apihelper
+
+from content_assistant_bot.api import outbound
+from content_assistant_bot.api.broadcast import BroadcastSender
+from content_assistant_bot.db import crud
+
+
+@pytest.fixture
+def db(db):
+    """The shared empty database with twenty users to broadcast to."""
+    for user_id in range(1, 21):
+        crud.upsert_user(id=user_id, name=f"user{user_id}")
+
+
+@pytest.fixture
+def bot():
+    return telebot.TeleBot("123:TEST", threaded=False)
+
+
+def create_broadcast():
+    return crud.create_broadcast(author_id=999, media_type="text", text="Hello", scheduled_at=datetime.now())
+
+
+def test_broadcast_delivers_once_to_every_user(db, fake_api, bot):
+    broadcast = create_broadcast()
+
+    result = BroadcastSender(bot, rate_per_second=100, chunk_size=7).run(broadcast.id)
+
+    recipients = [int(params["chat_id"]) for params in fake_api.calls_to("sendMessage") if params["text"] == "Hello"]
+    assert sorted(recipients) == list(range(1, 21))
+    assert result["sent"] == 20 and result["failed"] == 0
+    assert crud.count_deliveries(broadcast.id) == {"sent": 20}
+    assert crud.get_broadcast(broadcast.id).status == "done"
+
+
+def test_broadcast_honours_retry_after(db, fake_api, bot):
+    broadcast = create_broadcast()
+    fake_api.fail_with_flood(times=3, retry_after=1)
+
+    result = BroadcastSender(bot, rate_per_second=100, workers=1).run(broadcast.id)
+
+    assert result["sent"] == 20
+    assert result["elapsed"] >= 1
+
+
+def test_broadcast_records_blocked_users(db, fake_api, bot):
+    broadcast = create_broadcast()
+    fake_api.blocked_chats = {3, 4}
+
+    result = BroadcastSender(bot, rate_per_second=100).run(broadcast.id)
+
+    assert result["sent"] == 18 and result["failed"] == 2
+    assert crud.count_deliveries(broadcast.id) == {"sent": 18, "failed": 2}
+
+
+def test_broadcast_resumes_after_crash(db, fake_api, bot):
+    broadcast = create_broadcast()
+    # Simulate a run that stopped after delivering to the first five users
+    crud.add_broadcast_recipients(broadcast.id, list(range(1, 21)))
+    for user_id in range(1, 6):
+        crud.set_delivery_status(broadcast.id, user_id, "sent")
+    crud.update_broadcast(broadcast.id, status="sending")
+
+    BroadcastSender(bot, rate_per_second=100).run(broadcast.id)
+
+    recipients = [int(params["chat_id"]) for params in fake_api.calls_to("sendMessage") if params["text"] == "Hello"]
+    assert sorted(recipients) == list(range(6, 21))
+    assert crud.count_deliveries(broadcast.id) == {"sent": 20}
+
+
+def test_broadcast_leaves_pacing_and_flood_retries_to_the_gateway(db, fake_api, bot, monkeypatch):
+    gateway = outbound.OutboundGateway(rate_per_second=100, max_retries=1)
+    monkeypatch.setattr(outbound, "gateway", gateway)
+    monkeypatch.setattr(apihelper, "CUSTOM_REQUEST_SENDER", gateway.request)
+    broadcast = create_broadcast()
+    # The progress message and the first recipient are answered 429 twice: retried once by the gateway, not again
+    fake_api.fail_with_flood(times=4, retry_after=0)
+
+    sender = BroadcastSender(bot, workers=1, max_retries=5)
+    result = sender.run(broadcast.id)
+
+    assert sender.bucket is None
+    assert result["sent"] == 19 and result["failed"] == 1
@@ -0,0 +1,78 @@
+import queue
+import time
+from datetime import datetime
+
+import pytest
+import pytz
+
+from content_assistant_bot.api.cluster import ClusterRouter, HashRing, serve_updates
+from content_assistant_bot.api.storage import DatabaseStateStorage
+from content_assistant_bot.core.rate_limit import DatabaseBucketStore
+from content_assistant_bot.db import crud
+
+from .test_dispatcher import make_callback_update, make_update
+
+
+def test_hash_ring_moves_few_keys_when_a_worker_is_added():
+    ring = HashRing(range(4))
+    before = {key: ring.node_for(key) for key in range(2000)}
+    ring.add_node(4)
+    moved = [key for key in before if ring.node_for(key) != before[key]]
+
+    # Only keys taken over by the new worker change owner, roughly a fifth of them
+    assert all(ring.node_for(key) == 4 for key in moved)
+    assert 200 < len(moved) < 600
+
+
+def test_router_sends_a_chat_to_one_worker():
+    queues = [queue.Queue() for _ in range(3)]
+    router = ClusterRouter(queues)
+    router.route([make_update(idx, chat_id=idx % 5) for idx in range(20)] + [make_callback_update(21, 3)])
+
+    owners = {}
+    for worker_id, updates in enumerate(queues):
+        while not updates.empty():
+            update = updates.get()
+            chat_id = update.message.chat.id if update.message else update.callback_query.message.chat.id
+            owners.setdefault(chat_id, set()).add(worker_id)
+    assert all(len(workers) == 1 for workers in owners.values())
+    assert len(owners) == 5
+
+
+def test_serve_updates_stops_after_the_queued_updates():
+    updates = queue.Queue()
+    for idx in range(3):
+        updates.put(make_update(idx, 1))
+    updates.put(None)
+    handled = []
+
+    serve_updates(updates, handled.extend)
+    assert [update.update_id for update in handled] == [0, 1, 2]
+
+
+def test_database_state_storage_is_shared_between_instances(db):
+    scheduled = pytz.timezone("Europe/Moscow").localize(datetime(2030, 1, 1, 12, 0))
+    first, second = DatabaseStateStorage(), DatabaseStateStorage()
+
+    first.set_state(1, 1, "PublicMessageStates:waiting_for_datetime")
+    first.set_data(1, 1, "datetime", scheduled)
+    with second.get_interactive_data(1, 1) as data:
+        data["text"] = "hello"
+
+    assert first.get_state(1, 1) == "PublicMessageStates:waiting_for_datetime"
+    assert first.get_data(1, 1) == {"datetime": scheduled, "text": "hello"}
+    assert second.delete_state(1, 1)
+    assert first.get_state(1, 1) is None and first.get_data(1, 1) == {}
+    with pytest.raises(RuntimeError):
+        first.set_data(1, 1, "text", "missing")
+
+
+def test_shared_rate_limit_buckets(db):
+    first, second = DatabaseBucketStore(ttl_seconds=60), DatabaseBucketStore(ttl_seconds=60)
+
+    # Two workers spend the same bucket
+    assert first.take("ui:1", rate=1, capacity=2, cost=1) == 0
+    assert second.take("ui:1", rate=1, capacity=2, cost=1) == 0
+    assert first.take("ui:1", rate=1, capacity=2, cost=1) > 0
+    assert second.take("ui:2", rate=1, capacity=2, cost=1) == 0
+    assert crud.delete_idle_rate_limit_buckets(updated_before=time.time() + 1) == 2
\ No newline at end of file
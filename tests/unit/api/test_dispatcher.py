@@ -0,0 +1,92 @@
+import threading
+import time
+
+import telebot
+from telebot.types import Update
+
+from content_assistant_bot.api.dispatcher import UpdateDispatcher, get_update_chat_id, install_dispatcher
+
+
+def make_update(update_id: int, chat_id: int, text: str = "hi") -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+            "text": text,
+        },
+    })
+
+
+def make_callback_update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "1",
+            "data": "menu",
+            "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+            "message": {"message_id": 1, "date": 0, "chat": {"id": chat_id, "type": "private"}},
+        },
+    })
+
+
+def test_get_update_chat_id():
+    assert get_update_chat_id(make_update(1, 42)) == 42
+    assert get_update_chat_id(make_callback_update(2, 43)) == 43
+
+
+def test_updates_of_one_chat_keep_their_order():
+    handled = []
+    lock = threading.Lock()
+
+    def process(updates):
+        update = updates[0]
+        # Later updates finish faster, so any reordering would show up
+        time.sleep(0.01 * (5 - update.update_id % 5))
+        with lock:
+            handled.append((update.message.chat.id, update.update_id))
+
+    dispatcher = UpdateDispatcher(process, lanes=4)
+    dispatcher.dispatch([make_update(idx, chat_id=idx % 3) for idx in range(30)])
+    dispatcher.stop()
+
+    for chat_id in range(3):
+        update_ids = [update_id for chat, update_id in handled if chat == chat_id]
+        assert update_ids == sorted(update_ids)
+    assert len(handled) == 30
+
+
+def test_slow_chat_does_not_block_other_chats():
+    release = threading.Event()
+    fast_done = threading.Event()
+
+    def process(updates):
+        if updates[0].message.chat.id == 1:
+            release.wait(2)
+        else:
+            fast_done.set()
+
+    dispatcher = UpdateDispatcher(process, lanes=4)
+    slow_chat, fast_chat = 1, 2
+    assert dispatcher.lane_for(slow_chat) != dispatcher.lane_for(fast_chat)
+    dispatcher.dispatch([make_update(1, slow_chat), make_update(2, fast_chat)])
+
+    assert fast_done.wait(1)
+    release.set()
+    dispatcher.stop()
+
+
+def test_install_dispatcher_advances_polling_offset():
+    bot = telebot.TeleBot("123:TEST", threaded=False)
+    handled = []
+    bot.message_handler(func=lambda message: True)(lambda message: handled.append(message.text))
+
+    dispatcher = install_dispatcher(bot, lanes=2)
+    bot.process_new_updates([make_update(7, 1, "a"), make_update(8, 2, "b")])
+    assert bot.last_update_id == 8
+    dispatcher.stop()
+
+    assert sorted(handled) == ["a", "b"]
@@ -0,0 +1,122 @@
+import threading
+import time
+
+from content_assistant_bot.api.outbound import OutboundGateway, Priority, outbound_priority
+
+URL = "https://api.telegram.org/bot123:TEST/"
+
+
+class FakeResponse:
+    def __init__(self, status_code: int = 200, retry_after: float = None):
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def json(self):
+        if self.retry_after is None:
+            return {"ok": True, "result": {}}
+        return {"ok": False, "error_code": 429, "parameters": {"retry_after": self.retry_after}}
+
+
+class RecordingSender:
+    def __init__(self, responses=()):
+        self.calls = []
+        self.responses = list(responses)
+        self.lock = threading.Lock()
+
+    def __call__(self, method, url, params=None, files=None, **kwargs):
+        with self.lock:
+            self.calls.append((url.rsplit("/", 1)[-1], dict(params or {})))
+            return self.responses.pop(0) if self.responses else FakeResponse()
+
+
+def send_in_threads(gateway, sends):
+    """Queue `sends` of (method, params, priority) one after another and wait for all of them."""
+    results = [None] * len(sends)
+
+    def run(idx, method, params, priority):
+        with outbound_priority(priority):
+            results[idx] = gateway.request("post", URL + method, params=params)
+
+    threads = []
+    for idx, (method, params, priority) in enumerate(sends):
+        thread = threading.Thread(target=run, args=(idx, method, params, priority))
+        thread.start()
+        threads.append(thread)
+        # Every send is waiting before the next one arrives
+        time.sleep(0.02)
+    return threads, results
+
+
+def test_higher_priority_sends_go_first():
+    sender = RecordingSender()
+    gateway = OutboundGateway(rate_per_second=50, send=sender)
+    # Nothing is admitted until every send is queued
+    gateway.global_bucket.pause(0.3)
+    threads, _ = send_in_threads(gateway, [
+        ("sendPhoto", {"chat_id": 1}, Priority.MEDIA),
+        ("sendMessage", {"chat_id": 2, "text": "news"}, Priority.BROADCAST),
+        ("sendMessage", {"chat_id": 3, "text": "reply"}, Priority.INTERACTIVE),
+        ("sendMessage", {"chat_id": 4, "text": "news"}, Priority.BROADCAST),
+    ])
+    for thread in threads:
+        thread.join(5)
+
+    assert [params["chat_id"] for _, params in sender.calls] == [3, 2, 4, 1]
+    metrics = gateway.metrics()
+    assert metrics["broadcast"]["sent"] == 2
+    assert metrics["interactive"]["max_queue_ms"] > 0
+
+
+def test_retry_after_pauses_the_chat_and_retries():
+    sender = RecordingSender([FakeResponse(429, retry_after=0.1)])
+    gateway = OutboundGateway(send=sender)
+
+    started = time.monotonic()
+    response = gateway.request("post", URL + "sendMessage", params={"chat_id": 1, "text": "hi"})
+
+    assert response.status_code == 200
+    assert len(sender.calls) == 2
+    assert time.monotonic() - started >= 0.1
+    assert gateway.metrics()["interactive"]["throttled"] == 1
+
+
+def test_other_requests_are_not_queued():
+    sender = RecordingSender()
+    gateway = OutboundGateway(send=sender)
+    gateway.global_bucket.pause(10)
+
+    gateway.request("get", URL + "getMe")
+
+    assert sender.calls == [("getMe", {})]
+
+
+def test_throttled_chat_does_not_hold_back_others():
+    sender = RecordingSender()
+    gateway = OutboundGateway(chat_rate_per_second=2, chat_burst=1, send=sender)
+    threads, _ = send_in_threads(gateway, [
+        ("sendMessage", {"chat_id": 1, "text": "first"}, Priority.INTERACTIVE),
+        ("sendMessage", {"chat_id": 1, "text": "second"}, Priority.INTERACTIVE),
+        ("sendMessage", {"chat_id": 2, "text": "other"}, Priority.INTERACTIVE),
+    ])
+    for thread in threads:
+        thread.join(5)
+
+    assert [params["text"] for _, params in sender.calls] == ["first", "other", "second"]
+
+
+def test_coalesce_merges_texts_to_one_chat():
+    sender = RecordingSender()
+    gateway = OutboundGateway(coalesce=True, send=sender)
+    gateway.global_bucket.pause(0.2)
+    threads, results = send_in_threads(gateway, [
+        ("sendMessage", {"chat_id": 1, "text": "one"}, Priority.INTERACTIVE),
+        ("sendMessage", {"chat_id": 1, "text": "two"}, Priority.INTERACTIVE),
+        ("sendMessage", {"chat_id": 1, "text": "three", "reply_markup": "{}"}, Priority.INTERACTIVE),
+    ])
+    for thread in threads:
+        thread.join(5)
+
+    # The message with a keyboard is sent on its own
+    assert [params["text"] for _, params in sender.calls] == ["one\n\ntwo", "three"]
+    assert results[0] is results[1]
+    assert gateway.metrics()["interactive"]["coalesced"] == 1
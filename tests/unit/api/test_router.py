@@ -0,0 +1,78 @@
+import pytest
+import telebot
+from telebot.states import State, StatesGroup
+from telebot.states.sync.middleware import StateMiddleware
+from telebot.storage.memory_storage import StateMemoryStorage
+from telebot.types import Update
+
+from content_assistant_bot.api.router import CallbackRouter, callback_data, get_router
+
+
+class CountStates(StatesGroup):
+    waiting_for_count = State()
+
+
+def make_callback_update(update_id: int, data: str) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "1",
+            "data": data,
+            "from": {"id": 7, "is_bot": False, "first_name": "User"},
+            "message": {"message_id": 1, "date": 1, "chat": {"id": 7, "type": "private"}},
+        },
+    })
+
+
+def test_routes_resolve_by_namespace_action_and_state():
+    router = CallbackRouter()
+    router.handler("account", "count", state=CountStates.waiting_for_count)(lambda call, args: "in state")
+    router.handler("account", "count")(lambda call, args: "any state")
+
+    route, args = router.resolve("account:count:10", CountStates.waiting_for_count.name)
+    assert route.function(None, args) == "in state" and args == ["10"]
+    assert router.resolve("account:count:10")[0].function(None, []) == "any state"
+    assert router.resolve("hashtag:count:10")[0] is None
+    # Buttons sent before the scheme still work
+    assert router.resolve("GET report.xlsx")[1] == ["report.xlsx"]
+
+    with pytest.raises(ValueError):
+        router.handler("account", "count")(lambda call: None)
+
+
+def test_callback_data_fits_telegram_limit():
+    assert callback_data("account", "count", 5) == "account:count:5"
+    with pytest.raises(ValueError):
+        callback_data("files", "get", "x" * 60)
+
+
+def test_bot_dispatches_with_injected_state_and_args():
+    bot = telebot.TeleBot("123:TEST", threaded=False, use_class_middlewares=True, state_storage=StateMemoryStorage())
+    bot.setup_middleware(StateMiddleware(bot))
+    router = get_router(bot)
+    handled = []
+
+    @router.handler("account", "count", state=CountStates.waiting_for_count)
+    def get_count(call, state, args: list[str]):
+        handled.append(int(args[0]))
+        state.delete()
+
+    bot.process_new_updates([make_callback_update(1, "account:count:5")])
+    bot.set_state(7, CountStates.waiting_for_count, 7)
+    bot.process_new_updates([make_callback_update(2, "account:count:10")])
+
+    assert handled == [10]
+    assert get_router(bot) is router
+    assert len(bot.callback_query_handlers) == 1
+
+
+def test_reports_of_long_cyrillic_names_fit_in_the_download_button(tmp_path, monkeypatch):
+    from content_assistant_bot.api.handlers.common import create_resource
+
+    monkeypatch.chdir(tmp_path)
+    filename = create_resource(1, "фитнесмотивациядлявсех", [{"likes": 1}])
+
+    data = callback_data("files", "get", filename)
+    assert data.startswith("files:get:") and "фитнес" in data
+    assert (tmp_path / "tmp" / "1" / filename).exists()
@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+# Dependencies only some requests need, imported on first use
+DEFERRED = ("langchain_openai", "langchain_fireworks", "instagrapi", "pandas", "openpyxl", "hydra", "apscheduler")
+
+
+def test_bot_import_defers_heavy_dependencies():
+    code = f"import sys, content_assistant_bot.api.bot; print([name for name in {DEFERRED!r} if name in sys.modules])"
+    env = {**os.environ, "BOT_TOKEN": "123:TEST"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
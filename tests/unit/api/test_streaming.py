@@ -0,0 +1,66 @@
+import pytest
+import telebot
+from telebot.apihelper import ApiTelegramException
+
+from content_assistant_bot.api.background import TaskProgress
+from content_assistant_bot.api.streaming import StreamingMessage, split_text
+from content_assistant_bot.testing.clock import FakeClock
+
+
+@pytest.fixture
+def bot():
+    return telebot.TeleBot("123:TEST", threaded=False)
+
+
+def test_split_text_prefers_paragraphs_and_respects_the_limit():
+    text = "a" * 60 + "\n\n" + "b" * 60 + " " + "c" * 30
+    parts = split_text(text, limit=100)
+
+    assert parts == ["a" * 60, "b" * 60 + " " + "c" * 30]
+    assert all(len(part) <= 100 for part in split_text("x" * 250, limit=100))
+    assert "".join(split_text("x" * 250, limit=100)) == "x" * 250
+
+
+def test_edits_are_throttled(fake_api, bot):
+    clock = FakeClock()
+    streaming = StreamingMessage(bot, chat_id=1, message_id=10, edit_interval=1.0, clock=clock)
+
+    for idx in range(10):
+        streaming.append(f"token{idx} ")
+        clock.now += 0.25
+    streaming.finish()
+
+    edits = fake_api.calls_to("editMessageText")
+    # The first tokens show at once, then at most one edit per second, plus the final formatted one
+    assert edits[0]["text"].strip() == "token0"
+    assert len(edits) == 4
+    assert edits[-1]["parse_mode"] == "Markdown"
+    assert edits[-1]["text"].strip() == " ".join(f"token{idx}" for idx in range(10))
+
+
+def test_long_output_continues_in_new_messages(fake_api, bot):
+    streaming = StreamingMessage(bot, chat_id=1, message_id=10, edit_interval=0, limit=50)
+    for idx in range(20):
+        streaming.append(f"line {idx}\n")
+    streaming.finish(reply_markup=None)
+
+    sent = fake_api.calls_to("sendMessage")
+    assert len(streaming.message_ids) == len(sent) + 1
+    assert all(len(params["text"]) <= 50 for params in fake_api.calls_to("editMessageText") + sent)
+    final_texts = {int(params["message_id"]): params["text"] for params in fake_api.calls_to("editMessageText")}
+    assert "line 0" in final_texts[10]
+
+
+def test_progress_falls_back_to_plain_text_and_raises_other_errors(fake_api, bot):
+    progress = TaskProgress(bot, chat_id=1, message_id=10)
+    fake_api.fail_with_parse_error(1)
+
+    progress.update("**ideas", parse_mode="Markdown")
+
+    [edit] = fake_api.calls_to("editMessageText")
+    assert edit["text"] == "**ideas"
+    assert "parse_mode" not in edit
+
+    fake_api.blocked_chats.add(1)
+    with pytest.raises(ApiTelegramException):
+        progress.update("ideas")
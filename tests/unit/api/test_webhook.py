@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Optional
+
+import pytest
+import telebot
+
+from content_assistant_bot.api.dispatcher import install_dispatcher
+from content_assistant_bot.api.webhook import SECRET_TOKEN_HEADER, WebhookServer
+
+SECRET = "s3cret"
+
+
+def recorded_update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": chat_id, "type": "private", "first_name": "User"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "User", "language_code": "ru"},
+            "text": text,
+        },
+    }
+
+
+def post(url: str, payload: dict, secret: Optional[str] = SECRET) -> int:
+    headers = {"Content-Type": "application/json"}
+    if secret is not None:
+        headers[SECRET_TOKEN_HEADER] = secret
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_webhook_updates_reach_the_handlers(fake_api):
+    bot = telebot.TeleBot("123:TEST", threaded=False)
+
+    @bot.message_handler(func=lambda message: True)
+    def echo(message):
+        bot.send_message(message.chat.id, message.text.upper())
+
+    dispatcher = install_dispatcher(bot, lanes=2)
+    with WebhookServer(bot.process_new_updates, secret_token=SECRET, host="127.0.0.1", port=0) as server:
+        statuses = [post(server.url, recorded_update(idx, chat_id=idx % 2, text=f"m{idx}")) for idx in range(6)]
+    dispatcher.stop()
+
+    assert statuses == [200] * 6
+    replies = {params["text"] for params in fake_api.calls_to("sendMessage")}
+    assert replies == {f"M{idx}" for idx in range(6)}
+
+
+def test_webhook_rejects_requests_without_the_secret():
+    handled = []
+    with WebhookServer(handled.extend, secret_token=SECRET, host="127.0.0.1", port=0) as server:
+        assert post(server.url, recorded_update(1, 1, "hi"), secret="wrong") == 403
+        assert post(server.url, recorded_update(2, 1, "hi"), secret=None) == 403
+        assert post(server.url.replace("/webhook", "/other"), recorded_update(3, 1, "hi")) == 404
+    assert handled == []
+    assert server.stats["rejected"] == 2
+
+
+@pytest.mark.parametrize("secret", [None, ""])
+def test_webhook_server_needs_a_secret(secret):
+    with pytest.raises(ValueError):
+        WebhookServer(lambda updates: None, secret_token=secret, host="127.0.0.1", port=0)
+
+
+def test_webhook_answers_before_processing_and_sheds_load_when_full():
+    release = threading.Event()
+
+    def process(updates):
+        release.wait(5)
+
+    with WebhookServer(process, secret_token=SECRET, host="127.0.0.1", port=0, queue_size=1) as server:
+        started = time.monotonic()
+        first = post(server.url, recorded_update(1, 1, "a"))
+        assert first == 200 and time.monotonic() - started < 1
+
+        # The consumer is busy with the first update: one more fits in the queue, the next is shed
+        time.sleep(0.1)
+        statuses = [post(server.url, recorded_update(idx, 1, "b")) for idx in (2, 3)]
+        release.set()
+
+    assert statuses == [200, 503]
+    assert server.stats["dropped"] == 1
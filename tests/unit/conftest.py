@@ -0,0 +1,20 @@
+import pytest
+from telebot import apihelper
+
+from content_assistant_bot.db import database
+from content_assistant_bot.testing.fake_telegram import FakeBotAPI
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """An empty database with the current schema, used by every session of the test."""
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path}/test.db")
+    database.migrate_schema()
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """A local Bot API server receiving the requests of every bot in the test."""
+    with FakeBotAPI() as fake:
+        monkeypatch.setattr(apihelper, "API_URL", fake.api_url)
+        yield fake
@@ -0,0 +1,44 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from content_assistant_bot.api.health import HealthServer
+from content_assistant_bot.core.boot import BootSequence
+
+
+def fail():
+    raise ConnectionError("unreachable")
+
+
+def test_warm_ups_run_in_parallel_and_optional_ones_may_fail():
+    boot = BootSequence()
+    started = time.perf_counter()
+    results = boot.run_parallel(
+        {"database": lambda: time.sleep(0.2) or "db", "llm": lambda: time.sleep(0.2) or "llm", "instagram": fail},
+        optional=["instagram"],
+    )
+    assert time.perf_counter() - started < 0.35
+    assert results == {"database": "db", "llm": "llm", "instagram": None}
+    assert boot.status()["phases"]["instagram"]["status"] == "failed"
+
+    with pytest.raises(ConnectionError):
+        boot.run_parallel({"identity": fail, "cache": lambda: None})
+    assert boot.phases["cache"].status == "ok"
+
+
+def test_readiness_endpoint_follows_boot():
+    boot = BootSequence()
+    with HealthServer(boot, host="127.0.0.1", port=0) as server:
+        assert urllib.request.urlopen(f"{server.url}/healthz").status == 200
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{server.url}/readyz")
+        assert error.value.code == 503
+
+        boot.run("database", lambda: None)
+        boot.mark_ready()
+        response = urllib.request.urlopen(f"{server.url}/readyz")
+        assert response.status == 200
+        assert json.loads(response.read())["phases"]["database"]["status"] == "ok"
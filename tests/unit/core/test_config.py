@@ -0,0 +1,57 @@
+import os
+import shutil
+
+import pytest
+
+from content_assistant_bot.core.config import CONF_DIR, ConfigError, ConfigService, Template, Translations
+
+
+def copy_conf(tmp_path):
+    for name in ("common.yaml", "config.yaml"):
+        shutil.copy(CONF_DIR / name, tmp_path / name)
+    return ConfigService(tmp_path)
+
+
+def touch(path):
+    os.utime(path, (0, os.path.getmtime(path) + 10))
+
+
+def test_strings_compile_to_templates_per_language(tmp_path):
+    strings = copy_conf(tmp_path).view("common")
+
+    assert isinstance(strings.menu.options.analyze_account, Translations)
+    welcome = strings.welcome["en"]
+    assert isinstance(welcome, Template) and welcome.fields == {"name"}
+    assert welcome.format(name="Ann") == "Hello Ann!"
+    # Strings without a translation fall back to the default language
+    assert strings.start["en"] == strings.start["ru"]
+    assert strings.cancel["en"].format() == "Cancel"
+    with pytest.raises(AttributeError):
+        strings.missing_key
+
+
+def test_reload_swaps_snapshot_only_when_files_change(tmp_path):
+    service = copy_conf(tmp_path)
+    config = service.view("config")
+    first = config.snapshot()
+    assert service.reload() is False and config.snapshot() is first
+
+    path = tmp_path / "config.yaml"
+    path.write_text(path.read_text().replace('timezone: "Europe/Moscow"', 'timezone: "UTC"'))
+    touch(path)
+    assert service.reload() is True
+    assert config.timezone == "UTC" and first.timezone == "Europe/Moscow"
+
+
+def test_broken_file_keeps_previous_snapshot(tmp_path):
+    service = copy_conf(tmp_path)
+    before = service.get("common")
+
+    path = tmp_path / "common.yaml"
+    path.write_text(path.read_text() + '\nbroken:\n  en: "Hello {name"\n')
+    touch(path)
+    assert service.reload() is False
+    assert service.get("common") is before
+
+    with pytest.raises(ConfigError):
+        ConfigService(tmp_path).reload()
@@ -0,0 +1,48 @@
+import io
+
+from PIL import Image
+
+from content_assistant_bot.core.files import EncodedImage, ImageCache, encode_image, select_photo_size
+
+
+class PhotoSize:
+    def __init__(self, file_id: str, width: int, height: int) -> None:
+        self.file_id = file_id
+        self.width = width
+        self.height = height
+
+
+def make_photo() -> bytes:
+    image = Image.new("RGB", (4000, 3000), (200, 100, 50))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees
+    exif[0x010F] = "PhoneMaker"
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", exif=exif)
+    return buffered.getvalue()
+
+
+def test_photo_is_rotated_downscaled_and_stripped():
+    encoded = encode_image(make_photo(), max_side=1024, image_format="WEBP", quality=80)
+    image = Image.open(io.BytesIO(encoded.data))
+
+    assert encoded.size == image.size == (768, 1024)
+    assert encoded.to_data_url().startswith("data:image/webp;base64,")
+    assert not image.getexif()
+
+
+def test_smallest_sufficient_photo_size_is_selected():
+    sizes = [PhotoSize("s", 90, 67), PhotoSize("m", 800, 600), PhotoSize("l", 1280, 960), PhotoSize("x", 2560, 1920)]
+    assert select_photo_size(sizes, 1024).file_id == "l"
+    assert select_photo_size(sizes, 4096).file_id == "x"
+
+
+def test_image_cache_evicts_least_recently_used():
+    cache = ImageCache(max_bytes=10)
+    cache.put(("a",), EncodedImage(b"12345", "JPEG", (1, 1)))
+    cache.put(("b",), EncodedImage(b"12345", "JPEG", (1, 1)))
+    cache.get(("a",))
+    cache.put(("c",), EncodedImage(b"12345", "JPEG", (1, 1)))
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) is not None and cache.get(("c",)) is not None
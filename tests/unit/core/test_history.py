@@ -0,0 +1,53 @@
+from content_assistant_bot.api.schemas import Message
+from content_assistant_bot.core.history import SUMMARY_ROLE, HistoryCompactor
+from content_assistant_bot.core.tokens import estimate_tokens, truncate_tokens
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def ideas_reply(round_idx: int) -> str:
+    return "\n\n".join(f"Idea {round_idx}.{idx}\n" + "detail " * 40 for idx in range(5))
+
+
+def test_prompt_stays_within_the_budget_however_many_rounds():
+    compactor = HistoryCompactor(max_tokens=600, digest_tokens=100, count=count_words, digest_prefix="Seen: ")
+    folded = []
+
+    def summarize(messages, max_tokens):
+        folded.append(messages)
+        return " ".join(f"summary{idx}" for idx in range(max_tokens * 2))
+
+    history = [Message(role="user", content="fitness coach")]
+    for round_idx in range(20):
+        history = compactor.compact(history + [Message(role="user", content="more ideas")], summarize)
+        assert compactor.count_history(history) <= 600
+        history.append(Message(role="assistant", content=ideas_reply(round_idx)))
+
+    assert history[0].content == "fitness coach"
+    assert history[1].role == SUMMARY_ROLE and history[1].content.startswith("Seen: ")
+    # Every later digest folds the previous one with the replies that no longer fit
+    assert any(message.role == SUMMARY_ROLE for message in folded[-1])
+
+
+def test_failed_summary_falls_back_to_idea_titles():
+    compactor = HistoryCompactor(max_tokens=300, digest_tokens=100, count=count_words)
+    history = [Message(role="user", content="fitness coach")]
+    for round_idx in range(2):
+        history += [Message(role="user", content="more ideas"), Message(role="assistant", content=ideas_reply(round_idx))]
+
+    def summarize(messages, max_tokens):
+        raise TimeoutError()
+
+    compacted = compactor.compact(history + [Message(role="user", content="more ideas")], summarize)
+
+    assert compacted[1].content.splitlines()[:2] == ["Idea 0.0", "Idea 0.1"]
+    assert compactor.count_history(compacted) <= 300
+
+
+def test_truncate_tokens_cuts_at_a_word_boundary():
+    text = "word " * 100
+    assert truncate_tokens(text, 10, count_words) == " ".join(["word"] * 10)
+    assert truncate_tokens("short", 10, count_words) == "short"
+    assert estimate_tokens("привет") < estimate_tokens("привет, как дела?")
@@ -0,0 +1,90 @@
+import os
+import shutil
+
+import pytest
+
+from content_assistant_bot.api.handlers import ideas
+from content_assistant_bot.api.schemas import Message, ModelConfig
+from content_assistant_bot.core import llm
+from content_assistant_bot.core.config import CONF_DIR, ConfigService
+from content_assistant_bot.testing.fake_llm import install_fake_llm, make_fake_chat_model
+
+
+@pytest.fixture(autouse=True)
+def api_keys(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("FIREWORKS_API_KEY", "test")
+    llm.clear_clients()
+    yield
+    llm.clear_clients()
+
+
+def test_clients_are_reused_per_parameters():
+    config = ModelConfig(provider="openai", model_name="gpt-4o-mini", max_tokens=100, temperature=0.5)
+    _, first = llm.LLM(config)._resolve(None)
+    _, second = llm.LLM(config.model_copy())._resolve(None)
+    _, other = llm.LLM(config.model_copy(update={"temperature": 0.9}))._resolve(None)
+
+    assert first is second
+    assert other is not first
+
+
+def test_ideas_model_config_reloads_only_when_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "ideas.yaml"
+    shutil.copy(CONF_DIR / "ideas.yaml", path)
+    service = ConfigService(tmp_path)
+    monkeypatch.setattr(ideas, "settings", service)
+    monkeypatch.setattr(ideas, "_llm", None)
+
+    first = ideas.get_llm()
+    assert service.reload() is False
+    assert ideas.get_llm() is first
+
+    path.write_text(path.read_text().replace("temperature: 0.7", "temperature: 0.2"))
+    os.utime(path, (0, os.path.getmtime(path) + 10))
+    assert service.reload() is True
+    reloaded = ideas.get_llm()
+    assert reloaded is not first
+    assert reloaded.config.temperature == 0.2
+
+
+def test_ideas_llm_and_router_survive_changes_to_other_files(tmp_path, monkeypatch):
+    path = tmp_path / "ideas.yaml"
+    path.write_text((CONF_DIR / "ideas.yaml").read_text().replace("enabled: false", "enabled: true"))
+    other = tmp_path / "common.yaml"
+    other.write_text("name: bot\n")
+    service = ConfigService(tmp_path)
+    monkeypatch.setattr(ideas, "settings", service)
+    monkeypatch.setattr(ideas, "_llm", None)
+
+    first = ideas.get_llm()
+    assert first.router is not None
+
+    other.write_text("name: renamed\n")
+    os.utime(other, (0, os.path.getmtime(other) + 10))
+    assert service.reload() is True
+    assert ideas.get_llm() is first
+
+    path.write_text(path.read_text().replace("hedge_delay_seconds: 8", "hedge_delay_seconds: 4"))
+    os.utime(path, (0, os.path.getmtime(path) + 10))
+    assert service.reload() is True
+    reloaded = ideas.get_llm()
+    assert reloaded.router is not first.router
+    # Requests still in the old router may hedge or fail over
+    first.router._executor.submit(lambda: None).result()
+
+
+def test_fake_chat_model_answers_every_provider(monkeypatch):
+    monkeypatch.setattr(llm, "CLIENTS", dict(llm.CLIENTS))
+    model = install_fake_llm(make_fake_chat_model(chunks=4))
+    config = ModelConfig(provider="fireworksai", model_name="llama", stream=True)
+    history = [Message(role="user", content="Кофейня")]
+
+    chunks = list(llm.LLM(config).run(history))
+    answer = llm.LLM(config.model_copy(update={"provider": "openai", "stream": False})).run(history)
+
+    assert len(chunks) == 4
+    assert "".join(chunk.content for chunk in chunks) == answer.response_content
+    assert len(answer.response_content) > 2000
+    assert chunks[-1].usage_metadata["output_tokens"] > 0
+    assert all(isinstance(client, model) for client in llm._client_registry.values())
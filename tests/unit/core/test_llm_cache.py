@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from content_assistant_bot.api.schemas import ModelConfig
+from content_assistant_bot.core.llm_cache import LLMCache, make_cache_key, normalize_query
+from content_assistant_bot.db import database
+from content_assistant_bot.db.models import LLMCacheEntry
+
+
+def test_normalize_query_folds_case_punctuation_and_whitespace():
+    assert normalize_query("  Фитнес-ТРЕНЕР!! ") == normalize_query("фитнес тренер")
+    assert normalize_query("Ёлки,\tпалки") == "елки палки"
+
+
+def test_cache_key_depends_on_the_model():
+    config = ModelConfig(provider="fireworksai", model_name="m", max_tokens=100, temperature=0.7, system_prompt="p")
+    assert make_cache_key("Фитнес", config) == make_cache_key("фитнес.", config)
+    assert make_cache_key("Фитнес", config) != make_cache_key("Фитнес", config.model_copy(update={"system_prompt": "q"}))
+
+
+def test_variants_are_served_until_the_user_has_seen_them_all(db):
+    cache = LLMCache(ttl_seconds=3600, max_entries=100, max_variants=2)
+    first = cache.put("key", "fitness", "ideas 1")
+    second = cache.put("key", "fitness", "ideas 2")
+
+    assert cache.put("key", "fitness", "ideas 3") is None
+    assert cache.get("key", exclude=[first.id]).id == second.id
+    assert cache.get("key", exclude=[first.id, second.id]) is None
+    assert cache.get("other") is None
+
+
+def test_expired_and_least_recently_used_entries_are_evicted(db):
+    cache = LLMCache(ttl_seconds=3600, max_entries=2)
+    old = cache.put("old", "old", "stale")
+    session = database.get_session()
+    session.query(LLMCacheEntry).filter_by(id=old.id).update({"created_at": datetime.now() - timedelta(hours=2)})
+    session.commit()
+    session.close()
+
+    assert cache.get("old") is None
+    cache.put("a", "a", "a")
+    cache.put("b", "b", "b")
+    cache.get("a")
+    cache.put("c", "c", "c")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
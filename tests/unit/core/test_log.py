@@ -0,0 +1,73 @@
+import io
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from content_assistant_bot.core.log import (
+    ContextQueueHandler,
+    JsonFormatter,
+    SamplingFilter,
+    log_context,
+    preview,
+    records_dropped,
+)
+from content_assistant_bot.core.tracing import Tracer, finish_trace
+
+
+class NullExporter:
+    def export(self, trace):
+        pass
+
+
+def make_logger(name, records):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = ContextQueueHandler(records)
+    handler.addFilter(SamplingFilter({"user_event": 0.5}, sample=lambda: 0.9))
+    logger.handlers = [handler]
+    return logger
+
+
+def test_records_are_written_as_json_by_the_listener_with_context_and_redaction():
+    records, output = queue.Queue(), io.StringIO()
+    stream = logging.StreamHandler(output)
+    stream.setFormatter(JsonFormatter())
+    listener = QueueListener(records, stream)
+    logger = make_logger("test_log.json", records)
+
+    tracer = Tracer(NullExporter())
+    root = tracer.start_trace("update.message")
+    with log_context(update_id=7, user_id=1):
+        url = "https://api.telegram.org/bot123:ABC-def/sendMessage"
+        logger.info("Sent to %s", url, extra={"text": preview("x" * 100)})
+    finish_trace()
+    logger.warning("No context")
+
+    # Formatting and writing happen on the listener thread
+    assert output.getvalue() == ""
+    listener.start()
+    listener.stop()
+
+    first, second = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert first["message"] == "Sent to https://api.telegram.org/bot<token>/sendMessage"
+    assert first["update_id"] == 7 and first["user_id"] == 1
+    assert first["trace_id"] == root.trace.trace_id
+    assert first["text"] == "x" * 64 + "… (100 chars)"
+    assert second["level"] == "WARNING" and "update_id" not in second and "trace_id" not in second
+
+
+def test_sampled_events_and_full_queue_are_dropped_and_counted():
+    records = queue.Queue(maxsize=2)
+    logger = make_logger("test_log.sampling", records)
+    sampled, full = records_dropped.value("sampled"), records_dropped.value("queue_full")
+
+    logger.info("User event", extra={"event": "user_event"})
+    logger.warning("User event", extra={"event": "user_event"})
+    logger.info("Task queued")
+    logger.info("Task finished")
+
+    assert [record.getMessage() for record in records.queue] == ["User event", "Task queued"]
+    assert records_dropped.value("sampled") == sampled + 1
+    assert records_dropped.value("queue_full") == full + 1
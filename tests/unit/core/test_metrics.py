@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from content_assistant_bot.core.metrics import Counter, GaugeCallback, Histogram, Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    latency = Histogram("test_seconds", "Test latency", ["handler"], buckets=(0.1, 1))
+    latency.observe(0.05, "menu")
+    latency.observe(0.5, "menu")
+    latency.observe(5, "menu")
+    registry = Registry()
+    registry.register(latency)
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP test_seconds Test latency", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{handler="menu",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{handler="menu",le="1"} 2' in lines
+    assert 'test_seconds_bucket{handler="menu",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{handler="menu"} 5.55' in lines
+    assert 'test_seconds_count{handler="menu"} 3' in lines
+
+
+def test_timed_records_status_of_functions_and_coroutines():
+    latency = Histogram("test_seconds", "Test latency", ["handler", "status"])
+
+    @latency.timed("sync")
+    def fail():
+        raise ValueError
+
+    @latency.timed("async")
+    async def succeed():
+        return 1
+
+    with pytest.raises(ValueError):
+        fail()
+    assert asyncio.run(succeed()) == 1
+
+    assert latency.count("sync", "error") == 1
+    assert latency.count("async", "ok") == 1
+
+
+def test_registry_keeps_first_metric_and_skips_failing_gauges():
+    registry = Registry()
+    first = registry.register(Counter("test_total", "Test", ["kind"]))
+    assert registry.register(Counter("test_total", "Test", ["kind"])) is first
+    first.inc("a", amount=2)
+    registry.register(GaugeCallback("test_broken", "Broken", lambda: 1 / 0))
+    registry.register(GaugeCallback("test_depth", "Depth", lambda: {("0",): 3}, ["lane"]))
+
+    text = registry.render()
+
+    assert 'test_total{kind="a"} 2' in text
+    assert "test_broken" not in text
+    assert 'test_depth{lane="0"} 3' in text
@@ -0,0 +1,46 @@
+import threading
+
+from content_assistant_bot.core.profiling import MemoryProfiler, SamplingProfiler
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_finds_the_busy_thread_and_skips_idle_ones():
+    stop, idle = threading.Event(), threading.Event()
+    workers = [threading.Thread(target=busy_loop, args=(stop,)), threading.Thread(target=idle.wait)]
+    for worker in workers:
+        worker.start()
+    done = threading.Event()
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.start(0.3, on_done=lambda finished: done.set())
+    assert done.wait(5)
+    stop.set()
+    idle.set()
+
+    label, own, total = profiler.top(1)[0]
+    assert label.startswith("busy_loop (") and own > 0 and total >= own
+    assert profiler.idle > 0
+    assert any(line.split(";")[-1].startswith("busy_loop") for line in profiler.folded().splitlines())
+
+
+class CachedThing:
+    def __init__(self):
+        self.payload = bytearray(1024)
+
+
+def test_memory_diff_shows_growth_since_previous_snapshot():
+    memory = MemoryProfiler(frames=1)
+    memory.start()
+    try:
+        leak = [CachedThing() for _ in range(2000)]
+        report = memory.diff(limit=5)
+    finally:
+        memory.stop()
+
+    allocations = report.split("Allocations by line:")[1].split("Objects by type:")[0]
+    assert "test_profiling.py" in allocations
+    assert "+2000  CachedThing" in report.split("Objects by type:")[1]
+    assert len(leak) == 2000
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from content_assistant_bot.core.quota import Budget, QuotaService
+from content_assistant_bot.db import crud
+from content_assistant_bot.testing.clock import FakeClock
+
+
+def make_quotas(clock):
+    budgets = {"instagram": Budget("instagram", daily=50, rolling=30, rolling_hours=1)}
+    return QuotaService(budgets, timezone="Europe/Moscow", clock=clock)
+
+
+def test_daily_and_rolling_budgets(db):
+    # 08:00 in Moscow
+    clock = FakeClock(datetime(2024, 5, 1, 5, 0))
+    quotas = make_quotas(clock)
+
+    assert quotas.check(1, "user", "instagram", 30) is None
+    quotas.charge(1, "instagram", 30)
+    assert quotas.check(1, "user", "instagram", 5) == "rolling"
+    assert quotas.check(2, "user", "instagram", 5) is None
+    # Admins have no budgets
+    assert quotas.check(1, "admin", "instagram", 5) is None
+
+    clock.now += timedelta(hours=2)
+    assert quotas.check(1, "user", "instagram", 5) is None
+    quotas.charge(1, "instagram", 25)
+    assert quotas.check(1, "user", "instagram") == "daily"
+    assert quotas.usage(1, "instagram") == {"daily": 55, "rolling": 25}
+
+    # Midnight in Moscow is 21:00 UTC
+    clock.now = datetime(2024, 5, 1, 21, 30)
+    assert quotas.check(1, "user", "instagram", 30) is None
+    assert quotas.top_users("instagram") == []
+
+
+def test_purge_keeps_records_of_open_windows(db):
+    clock = FakeClock(datetime(2024, 5, 1, 12, 0))
+    quotas = make_quotas(clock)
+    crud.add_usage(1, "instagram", 10, clock.now - timedelta(days=3))
+    quotas.charge(1, "instagram", 5)
+
+    assert quotas.purge() == 1
+    assert quotas.top_users("instagram") == [(1, None, 5)]
@@ -0,0 +1,42 @@
+from content_assistant_bot.core.rate_limit import MemoryBucketStore, RateLimiter, Scope
+from content_assistant_bot.testing.clock import FakeClock
+
+
+def make_limiter(clock, ttl_seconds=60, max_keys=1000):
+    scopes = {
+        "ui": Scope("ui", rate_per_minute=60, burst=3),
+        "instagram": Scope("instagram", rate_per_minute=6, burst=30),
+    }
+    return RateLimiter(scopes, MemoryBucketStore(ttl_seconds, max_keys, clock=clock))
+
+
+def test_scopes_are_charged_separately_by_cost():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    assert limiter.check("instagram", 1, cost=30) == 0
+    assert limiter.check("instagram", 1, cost=5) == 50
+    # An exhausted analysis allowance leaves navigation alone
+    assert [limiter.check("ui", 1) for _ in range(4)] == [0, 0, 0, 1]
+    assert limiter.check("instagram", 2, cost=5) == 0
+
+    clock.now = 50
+    assert limiter.check("instagram", 1, cost=5) == 0
+    assert limiter.metrics()["ui"] == {"allowed": 3, "limited": 1}
+
+
+def test_idle_buckets_are_evicted():
+    clock = FakeClock()
+    limiter = make_limiter(clock, ttl_seconds=10, max_keys=100)
+
+    for user_id in range(50):
+        limiter.check("ui", user_id)
+    assert len(limiter.store) == 50
+
+    clock.now = 11
+    limiter.check("ui", 1000)
+    assert len(limiter.store) == 1
+
+    for user_id in range(500):
+        limiter.check("ui", user_id)
+    assert len(limiter.store) == 100
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from content_assistant_bot.api.schemas import Message, ModelConfig
+from content_assistant_bot.core import llm
+from content_assistant_bot.core.routing import LLMRouter, NoRouteAvailable
+from content_assistant_bot.testing.clock import FakeClock
+
+
+class StubChat:
+    """Local provider: `model_name` is "<seconds>" to answer after a delay or "fail" to raise."""
+
+    cancelled = []
+
+    def __init__(self, model_name, max_tokens, temperature) -> None:
+        self.model_name = model_name
+
+    def _answer(self) -> str:
+        if self.model_name == "fail":
+            raise ConnectionError("provider is down")
+        time.sleep(float(self.model_name))
+        return f"answer from {self.model_name}"
+
+    def invoke(self, messages):
+        return AIMessage(content=self._answer())
+
+    async def ainvoke(self, messages):
+        if self.model_name == "fail":
+            raise ConnectionError("provider is down")
+        try:
+            await asyncio.sleep(float(self.model_name))
+        except asyncio.CancelledError:
+            StubChat.cancelled.append(self.model_name)
+            raise
+        return AIMessage(content=f"answer from {self.model_name}")
+
+    def stream(self, messages):
+        yield from self._answer().split(" ")
+
+
+@pytest.fixture(autouse=True)
+def stub_provider(monkeypatch):
+    monkeypatch.setitem(llm.CLIENTS, "stub", StubChat)
+    llm.clear_clients()
+    StubChat.cancelled = []
+    yield
+    llm.clear_clients()
+
+
+def route(model_name: str) -> ModelConfig:
+    return ModelConfig(provider="stub", model_name=model_name, stream=False)
+
+
+def test_slow_route_is_hedged_and_the_faster_one_preferred_afterwards():
+    router = LLMRouter([route("0.5"), route("0.01")], hedge_delay=0.05)
+    model = llm.LLM(route("0.5"), router=router)
+
+    started = time.monotonic()
+    response = model.run([Message(role="user", content="fitness")])
+
+    assert response.response_content == "answer from 0.01"
+    assert time.monotonic() - started < 0.4
+    assert router.select()[0].model_name == "0.01"
+
+
+def test_failing_route_fails_over_and_its_breaker_opens():
+    clock = FakeClock()
+    router = LLMRouter([route("fail"), route("0")], hedge_delay=None, failure_threshold=2, open_seconds=30, clock=clock)
+    model = llm.LLM(route("fail"), router=router)
+
+    for _ in range(2):
+        assert model.run([Message(role="user", content="fitness")]).config.model_name == "0"
+    assert [r.model_name for r in router.select()] == ["0"]
+    assert router.snapshot()["stub/fail"]["open"]
+
+    # After the cooldown a single request probes the route first
+    clock.now = 31
+    assert [r.model_name for r in router.select()] == ["fail", "0"]
+    assert [r.model_name for r in router.select()] == ["0"]
+
+
+def test_no_route_available_when_every_breaker_is_open():
+    router = LLMRouter([route("fail")], failure_threshold=1)
+    with pytest.raises(ConnectionError):
+        llm.LLM(route("fail"), router=router).run([Message(role="user", content="fitness")])
+    with pytest.raises(NoRouteAvailable):
+        router.invoke(lambda r: None)
+
+
+def test_async_hedge_cancels_the_loser():
+    router = LLMRouter([route("1"), route("0.01")], hedge_delay=0.05)
+    model = llm.LLM(route("1"), router=router)
+
+    response = asyncio.run(model.arun([Message(role="user", content="fitness")]))
+
+    assert response.response_content == "answer from 0.01"
+    assert StubChat.cancelled == ["1"]
+
+
+def test_stream_fails_over_before_the_first_chunk():
+    router = LLMRouter([route("fail"), route("0")], hedge_delay=None)
+    model = llm.LLM(route("fail").model_copy(update={"stream": True}), router=router)
+
+    assert list(model.run([Message(role="user", content="fitness")])) == ["answer", "from", "0"]
@@ -0,0 +1,89 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from content_assistant_bot.core import scheduler
+from content_assistant_bot.db import database
+
+# APScheduler 3 wakes a paused scheduler once on shutdown and fails to run its due jobs, which stay stored
+pytestmark = pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+
+
+@pytest.fixture(autouse=True)
+def job_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'jobs.db'}")
+    monkeypatch.setattr(scheduler, "_scheduler", None)
+    started = []
+    yield started
+    for instance in started:
+        if instance.running:
+            instance.shutdown(wait=False)
+    scheduler.shutdown_scheduler(wait=False)
+
+
+def restart(started: list, **kwargs):
+    """A new process: a fresh scheduler on the same job store."""
+    scheduler._scheduler = None
+    instance = scheduler.start_scheduler(**kwargs)
+    started.append(instance)
+    return instance
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_jobs_persist_across_restarts(job_store, tmp_path):
+    first = restart(job_store, paused=True)
+    run_date = datetime.now(timezone.utc) + timedelta(hours=1)
+    first.add_job(os.makedirs, "date", run_date=run_date, args=[str(tmp_path / "later")], id="later")
+    first.shutdown(wait=False)
+
+    second = restart(job_store, paused=True)
+
+    [job] = second.get_jobs()
+    assert job.id == "later"
+    assert job.next_run_time == run_date
+
+
+def test_paused_worker_stores_jobs_without_running_them(job_store, tmp_path):
+    worker = restart(job_store, paused=True)
+    target = tmp_path / "due"
+    worker.add_job(os.makedirs, "date", run_date=datetime.now(timezone.utc), args=[str(target)], id="due")
+
+    time.sleep(0.5)
+
+    assert not target.exists()
+    assert [job.id for job in worker.get_jobs()] == ["due"]
+    worker.shutdown(wait=False)
+    assert [job.id for job in restart(job_store, paused=True).get_jobs()] == ["due"]
+
+
+def test_front_process_picks_up_jobs_added_by_a_worker(job_store, tmp_path):
+    restart(job_store, poll_seconds=0.1)
+    worker = restart(job_store, paused=True)
+    target = tmp_path / "from_worker"
+
+    # The front scheduler sleeps with no jobs of its own, only polling the store wakes it up
+    worker.add_job(os.makedirs, "date", run_date=datetime.now(timezone.utc), args=[str(target)], id="from_worker")
+
+    assert wait_until(target.exists)
+
+
+def test_jobs_command_lists_persisted_jobs(job_store, tmp_path):
+    from content_assistant_bot.api.handlers.admin.jobs import format_jobs
+
+    first = restart(job_store, paused=True)
+    run_date = datetime.now(timezone.utc) + timedelta(hours=1)
+    first.add_job(os.makedirs, "date", run_date=run_date, args=[str(tmp_path / "later")], id="later")
+    first.shutdown(wait=False)
+    restart(job_store, paused=True)
+
+    assert "later: makedirs" in format_jobs("en")
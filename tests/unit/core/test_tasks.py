@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from content_assistant_bot.core.tasks import TaskQueue, TaskRejected
+
+
+def test_tasks_run_off_the_calling_thread():
+    queue = TaskQueue(workers=2)
+    done = threading.Event()
+    threads = []
+
+    def work(task):
+        threads.append(threading.current_thread().name)
+        done.set()
+
+    queue.submit(1, work)
+
+    assert done.wait(2)
+    assert threads[0].startswith("tasks-")
+
+
+def test_per_user_limit_and_metrics():
+    queue = TaskQueue(workers=1, max_per_user=1)
+    release = threading.Event()
+    queue.submit(1, lambda task: release.wait(2))
+
+    with pytest.raises(TaskRejected) as e:
+        queue.submit(1, lambda task: None)
+    assert e.value.reason == "user_limit"
+
+    # Another user is still accepted and waits in the queue
+    queue.submit(2, lambda task: None)
+    assert queue.metrics()["rejected"] == 1
+
+    release.set()
+    queue.queue.join()
+    assert queue.metrics()["completed"] == 2
+    assert queue.metrics()["users"] == 0
+
+
+def test_queue_full_is_rejected():
+    queue = TaskQueue(workers=1, max_queue_size=1, max_per_user=5)
+    release = threading.Event()
+    started = threading.Event()
+    queue.submit(1, lambda task: (started.set(), release.wait(2)))
+    started.wait(2)
+    queue.submit(2, lambda task: None)
+
+    with pytest.raises(TaskRejected) as e:
+        queue.submit(3, lambda task: None)
+    assert e.value.reason == "queue_full"
+    release.set()
+
+
+def test_cancel_user_stops_cooperative_task():
+    queue = TaskQueue(workers=1)
+    started = threading.Event()
+    proceed = threading.Event()
+    steps = []
+
+    def work(task):
+        started.set()
+        proceed.wait(2)
+        task.check_cancelled()
+        steps.append("after cancel")
+
+    queue.submit(1, work)
+    started.wait(2)
+    assert queue.cancel_user(1) == 1
+    proceed.set()
+    queue.queue.join()
+
+    assert steps == []
+    assert queue.metrics()["cancelled"] == 1
+
+
+def test_fair_queue_serves_light_users_before_a_heavy_one():
+    queue = TaskQueue(workers=1, max_per_user=5)
+    release = threading.Event()
+    started = threading.Event()
+    order = []
+    queue.submit(0, lambda task: (started.set(), release.wait(2)))
+    started.wait(2)
+
+    # A heavy user queues three big analyses before two others ask for something small
+    for _ in range(3):
+        queue.submit(1, lambda task: order.append("heavy"), cost=30)
+    queue.submit(2, lambda task: order.append("light"), cost=5)
+    queue.submit(3, lambda task: order.append("admin"), cost=30, weight=4)
+    release.set()
+    queue.queue.join()
+
+    assert order == ["heavy", "light", "admin", "heavy", "heavy"]
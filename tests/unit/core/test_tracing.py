@@ -0,0 +1,75 @@
+import json
+import logging
+import time
+
+from content_assistant_bot.core import tracing
+from content_assistant_bot.core.tasks import TaskQueue
+from content_assistant_bot.core.tracing import OtlpJsonExporter, Tracer, span, traced
+
+
+class RecordingExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+
+def test_background_task_keeps_trace_open_and_slow_trace_is_logged(caplog):
+    exporter = RecordingExporter()
+    tracer = Tracer(exporter, slow_seconds=0.05, sample_rate=0)
+    queue = TaskQueue(workers=1)
+
+    @traced("db.query")
+    def query():
+        time.sleep(0.06)
+
+    def analyse(task):
+        with span("instagram.fetch", username="someone"):
+            query()
+
+    tracer.start_trace("update.message", user_id=1)
+    with span("handler.account"):
+        queue.submit(1, analyse, name="analyse")
+    with caplog.at_level(logging.WARNING, logger=tracing.__name__):
+        tracing.finish_trace()
+        # The handler returned, the trace waits for the task
+        assert exporter.traces == []
+        queue.queue.join()
+
+    assert tracing.current_span() is None
+    [trace] = exporter.traces
+    names = {item.name: item for item in trace.spans}
+    assert list(names) == ["update.message", "handler.account", "task.analyse", "instagram.fetch", "db.query"]
+    assert names["task.analyse"].parent_id == names["handler.account"].span_id
+    assert names["db.query"].parent_id == names["instagram.fetch"].span_id
+    assert "Slow trace" in caplog.text and "    +" in caplog.text
+
+
+def test_fast_traces_are_sampled_and_exported_as_otlp(tmp_path):
+    output = tmp_path / "traces.jsonl"
+    samples = iter([0.5, 0.005])
+    tracer = Tracer(OtlpJsonExporter(str(output), "bot"), slow_seconds=10, sample_rate=0.01, sample=lambda: next(samples))
+
+    for _ in range(2):
+        tracer.start_trace("update.callback_query", callback="menu:open")
+        try:
+            with span("db.get_user"):
+                raise KeyError("missing")
+        except KeyError as e:
+            tracing.finish_trace(e)
+
+    [line] = output.read_text().splitlines()
+    resource_spans = json.loads(line)["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"][0] == {"key": "service.name", "value": {"stringValue": "bot"}}
+    root, child = resource_spans["scopeSpans"][0]["spans"]
+    assert child["parentSpanId"] == root["spanId"] and child["traceId"] == root["traceId"]
+    assert child["status"] == {"code": 2}
+    assert {"key": "callback", "value": {"stringValue": "menu:open"}} in root["attributes"]
+    assert int(root["endTimeUnixNano"]) >= int(child["endTimeUnixNano"])
+
+
+def test_spans_outside_a_trace_are_not_recorded():
+    with span("db.get_user") as outside:
+        assert outside is None
+    assert traced("db.get_user")(lambda: 1)() == 1
@@ -0,0 +1,38 @@
+from sqlalchemy import create_engine, inspect, text
+
+from content_assistant_bot.db import database
+from content_assistant_bot.db.database import migrate_schema
+
+
+def test_migrate_schema_keeps_rows_and_adds_what_is_missing(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bot.db'}")
+    with engine.begin() as connection:
+        # users as created by an older version, without lang and role
+        connection.execute(text("CREATE TABLE users (id BIGINT, name VARCHAR PRIMARY KEY, first_name VARCHAR, last_name VARCHAR)"))
+        connection.execute(text("INSERT INTO users (id, name) VALUES (1, 'admin')"))
+
+    changes = migrate_schema(engine)
+
+    assert "users.lang" in changes and "users.role" in changes and "messages" in changes
+    assert {"lang", "role"} <= {column["name"] for column in inspect(engine).get_columns("users")}
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT name FROM users")).scalars().all() == ["admin"]
+    assert migrate_schema(engine) == []
+
+
+def test_sessions_share_one_pooled_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'bot.db'}")
+
+    database.warm_up_pool()
+    engine = database.get_engine()
+    # The boot connection went back to the pool for the first update
+    assert engine.pool.checkedin() == 1
+
+    with database.get_session() as session:
+        session.execute(text("SELECT 1"))
+        assert session.get_bind() is engine
+    assert database.get_engine() is engine
+    assert engine.pool.checkedin() == 1
+
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'other.db'}")
+    assert database.get_engine() is not engine